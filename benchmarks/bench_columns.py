@@ -0,0 +1,85 @@
+"""
+Benchmarks reading wide delimited files, comparing building a dict of every column per
+row with only extracting the columns the mapping references, and with scanning TSV
+files as raw bytes.
+
+Run with pymids installed: python benchmarks/bench_columns.py [rows] [extra columns]
+"""
+
+import csv
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from mids.lib import init
+from mids.model import Discipline
+from mids.shard import FileFormat, check_file, read_columns
+
+
+def write_wide_csv(path: Path, rows: int, extra_columns: int, delimiter: str = ","):
+    """
+    Writes a CSV (or with a tab delimiter, TSV) file with a column for every term the
+    biology mapping references plus the given number of unreferenced columns, with the
+    columns shuffled together.
+    """
+    rng = random.Random(42)
+    header = init(Discipline.biology).plan.terms + [
+        f"extra{i}" for i in range(extra_columns)
+    ]
+    rng.shuffle(header)
+    with path.open("w", newline="") as f:
+        writer = csv.writer(f, delimiter=delimiter)
+        writer.writerow(header)
+        for _ in range(rows):
+            writer.writerow(
+                "value" if rng.random() < 0.8 else "" for _ in range(len(header))
+            )
+
+
+def timed(func) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def check_dict_reader(path: Path):
+    mids = init(Discipline.biology)
+    with path.open(newline="") as f:
+        for record in csv.DictReader(f):
+            mids.check(record)
+
+
+def check_pruned(path: Path, file_format: FileFormat = FileFormat.csv):
+    for _ in check_file(path, file_format):
+        pass
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    extra_columns = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "wide.csv"
+        write_wide_csv(path, rows, extra_columns)
+        tsv_path = Path(tmp) / "wide.tsv"
+        write_wide_csv(tsv_path, rows, extra_columns, "\t")
+        columns, _ = read_columns(path, FileFormat.csv, init(Discipline.biology).plan)
+        dict_reader = timed(lambda: check_dict_reader(path))
+        pruned = timed(lambda: check_pruned(path))
+        scanned = timed(lambda: check_pruned(tsv_path, FileFormat.tsv))
+    results = {
+        "rows": rows,
+        "columns_read": len(columns.indexes),
+        "columns_skipped": len(columns.skipped),
+        "dict_reader_rows_per_second": rows / dict_reader,
+        "pruned_rows_per_second": rows / pruned,
+        "tsv_scan_rows_per_second": rows / scanned,
+    }
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
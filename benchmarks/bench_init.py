@@ -0,0 +1,63 @@
+"""
+Benchmarks the cost of initialising MIDS and of starting the CLI.
+
+Run with pymids installed: python benchmarks/bench_init.py
+"""
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+from mids.io import compile_mapping, compiled_path
+from mids.lib import init
+from mids.model import Discipline
+
+
+def timed(func, repeat: int) -> float:
+    """
+    Calls the function repeat times and returns the median time taken in seconds.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def init_uncached():
+    init.cache_clear()
+    init(Discipline.biology)
+
+
+def init_rebuild():
+    # the compiled mapping is missing so it's rebuilt from the source files
+    compiled_path(Discipline.biology).unlink(missing_ok=True)
+    init.cache_clear()
+    init(Discipline.biology)
+
+
+def cli_start():
+    subprocess.run(
+        [sys.executable, "-m", "mids.cli", "--help"],
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+def main():
+    compile_mapping(Discipline.biology)
+    results = {
+        "init_compiled": timed(init_uncached, 50),
+        "init_cached": timed(lambda: init(Discipline.biology), 1000),
+        "init_rebuild": timed(init_rebuild, 20),
+        "cli_cold_start": timed(cli_start, 5),
+    }
+    compile_mapping(Discipline.biology)
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Benchmarks initialising MIDS, checking and reporting on records, bulk file throughput
+and peak memory use against deterministic synthetic records. The results are written as
+JSON and can be compared against a stored baseline to flag regressions.
+
+Run with pymids installed:
+
+    python benchmarks/bench_suite.py --output baseline.json
+    python benchmarks/bench_suite.py --baseline baseline.json
+
+The second command exits with a non-zero status if any result is worse than the
+baseline by more than the threshold (10% by default).
+"""
+
+import argparse
+import importlib.util
+import json
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable
+
+from mids.lib import init
+from mids.model import Discipline, MIDSLevel
+from mids.shard import FileFormat, check_file, summarise_file
+from mids.summary import MIDSSummary
+from mids.synthetic import RecordGenerator
+
+# the per level pass rates of the generated records
+LEVEL_PASS_RATES = {
+    MIDSLevel.mids0: 0.95,
+    MIDSLevel.mids1: 0.7,
+    MIDSLevel.mids2: 0.5,
+    MIDSLevel.mids3: 0.5,
+}
+
+
+def best_time(func: Callable, repeat: int) -> float:
+    """
+    Calls the function repeat times and returns the fastest time taken in seconds.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def peak_memory(func: Callable) -> float:
+    """
+    Calls the function and returns the peak memory allocated while it ran in MiB.
+    """
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+
+def result(value: float, unit: str, higher_is_better: bool) -> dict:
+    return {"value": value, "unit": unit, "higher_is_better": higher_is_better}
+
+
+def run(records: int, repeat: int, extra_fields: int) -> dict:
+    """
+    Runs the benchmarks and returns the results.
+    """
+    mids = init(Discipline.biology)
+    generator = RecordGenerator(
+        mids.plan, extra_fields=extra_fields, level_pass_rates=LEVEL_PASS_RATES
+    )
+    data = list(generator.records(records))
+
+    def init_uncached():
+        init.cache_clear()
+        init(Discipline.biology)
+
+    def summarise():
+        summary = MIDSSummary.for_plan(mids.plan)
+        for record in data:
+            summary.add_record(mids.plan, record)
+
+    def rate(func: Callable) -> dict:
+        return result(records / best_time(func, repeat), "records/s", True)
+
+    results = {
+        "init": result(best_time(init_uncached, repeat * 5), "s", False),
+        "check": rate(lambda: [mids.check(record) for record in data]),
+        "report": rate(lambda: [mids.report(record) for record in data]),
+        "compact_report": rate(lambda: [mids.compact_report(r) for r in data]),
+        "summarise": rate(summarise),
+        "memory_reports": result(
+            peak_memory(lambda: [mids.report(record) for record in data]), "MiB", False
+        ),
+        "memory_compact_reports": result(
+            peak_memory(lambda: mids.compact_reports(data)), "MiB", False
+        ),
+    }
+    if importlib.util.find_spec("numpy") is not None:
+        import numpy as np
+
+        # the NumPy batch path, from record dicts (compare with check) and from a term
+        # table of string columns
+        results["check_many"] = rate(lambda: mids.check_many(data))
+        table = {
+            term: np.array([record.get(term) or "" for record in data])
+            for term in mids.plan.terms
+        }
+        results["check_many_table"] = rate(lambda: mids.check_many(table))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for file_format in (FileFormat.ndjson, FileFormat.csv, FileFormat.tsv):
+            path = Path(tmp) / f"records.{file_format}"
+            generator.write(path, records, file_format)
+            results[f"check_file_{file_format}"] = rate(
+                lambda: sum(1 for _ in check_file(path, file_format))
+            )
+        path = Path(tmp) / "records.ndjson"
+        results["memory_summarise_file"] = result(
+            peak_memory(lambda: summarise_file(path, FileFormat.ndjson)), "MiB", False
+        )
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    Prints a comparison of the results with the baseline results to stderr and returns
+    the names of the results which are worse than the baseline by more than the
+    threshold.
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None or not previous["value"]:
+            continue
+        change = current["value"] / previous["value"] - 1
+        worse = -change if current["higher_is_better"] else change
+        flag = ""
+        if worse > threshold:
+            regressions.append(name)
+            flag = " REGRESSION"
+        print(
+            f"{name}: {previous['value']:.4g} -> {current['value']:.4g} "
+            f"{current['unit']} ({change:+.1%}){flag}",
+            file=sys.stderr,
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("-n", "--records", type=int, default=20000)
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    parser.add_argument(
+        "-x",
+        "--extra-fields",
+        type=int,
+        default=50,
+        help="The number of unreferenced fields in each record",
+    )
+    parser.add_argument("-o", "--output", type=Path, help="Save the results here")
+    parser.add_argument("-b", "--baseline", type=Path, help="Compare with this file")
+    parser.add_argument(
+        "-t",
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="The relative change beyond which a result is a regression",
+    )
+    args = parser.parse_args()
+
+    output = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "records": args.records,
+            "extra_fields": args.extra_fields,
+        },
+        "results": run(args.records, args.repeat, args.extra_fields),
+    }
+    text = json.dumps(output, indent=2)
+    if args.output:
+        args.output.write_text(text)
+    print(text)
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())["results"]
+        regressions = compare(output["results"], baseline, args.threshold)
+        if regressions:
+            print(f"Regressions: {', '.join(regressions)}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
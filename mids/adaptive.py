@@ -0,0 +1,232 @@
+import json
+from copy import copy
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable
+
+from mids.lib import MIDS
+from mids.model import MIDSLevel
+from mids.plan import Plan
+
+
+@dataclass
+class EvaluationOrder:
+    """
+    An order in which to evaluate the elements at each level and the matchers of each
+    element, see Plan.set_order. Elements are referenced by name and matchers by their
+    position in the mapping so that an order can be exported and reloaded for the same
+    mapping.
+    """
+
+    # level name -> the names of the level's elements in evaluation order
+    elements: dict[str, list[str]]
+    # element name -> the positions of the element's matchers in evaluation order
+    matchers: dict[str, list[int]]
+
+    @classmethod
+    def default(cls, plan: Plan) -> "EvaluationOrder":
+        """
+        :param plan: the compiled plan
+        :return: the mapping order of the plan's elements and matchers
+        """
+        return cls(
+            {
+                level.name: [plan.elements[index].name for index in indexes]
+                for level, indexes in plan.level_elements.items()
+            },
+            {
+                element.name: list(range(len(element.matchers)))
+                for element in plan.elements
+            },
+        )
+
+    def apply(self, mids: MIDS) -> MIDS:
+        """
+        Returns a copy of the given MIDS object which evaluates in this order. The given
+        object, and its plan, are left unchanged, so this is safe to use on the shared
+        objects returned by init. A ValueError is raised if the order doesn't match the
+        plan's elements and matchers.
+
+        :param mids: the MIDS object
+        :return: a new MIDS object
+        """
+        plan = mids.plan
+        positions = {element.name: index for index, element in enumerate(plan.elements)}
+        try:
+            element_order = {
+                MIDSLevel[level]: [positions[name] for name in names]
+                for level, names in self.elements.items()
+            }
+            matcher_order = [self.matchers[element.name] for element in plan.elements]
+        except KeyError as e:
+            raise ValueError(f"Order doesn't match the plan: unknown {e}")
+        # a shallow copy so the plan isn't compiled again
+        ordered = copy(mids)
+        ordered.plan = plan.with_order(element_order, matcher_order)
+        return ordered
+
+    def to_dict(self) -> dict:
+        """
+        :return: the order as a JSON serialisable dict
+        """
+        return {"elements": self.elements, "matchers": self.matchers}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "EvaluationOrder":
+        """
+        :param data: a dict created by to_dict
+        :return: a new EvaluationOrder
+        """
+        return cls(data["elements"], data["matchers"])
+
+    def save(self, path: Path):
+        """
+        Writes the order to the given path as JSON.
+
+        :param path: the path to write to
+        """
+        path.write_text(json.dumps(self.to_dict(), indent=2))
+
+    @classmethod
+    def load(cls, path: Path) -> "EvaluationOrder":
+        """
+        Reads an order written by save.
+
+        :param path: the path to read from
+        :return: a new EvaluationOrder
+        """
+        return cls.from_dict(json.loads(path.read_text()))
+
+
+class MatchProfile:
+    """
+    Records how often each element and matcher of a plan matches records, from which an
+    EvaluationOrder that minimises the expected number of term lookups per record can be
+    derived. Records can be observed from a sample up front or continuously.
+    """
+
+    def __init__(self, plan: Plan):
+        """
+        :param plan: the compiled plan to profile
+        """
+        self.plan = plan
+        self.records = 0
+        self.element_hits = [0] * len(plan.elements)
+        self.matcher_hits = [[0] * len(masks) for masks in plan.element_masks]
+
+    def observe(self, presence: int):
+        """
+        Records which elements and matchers the given presence bitmask matches.
+
+        :param presence: a presence bitmask (see Plan.presence)
+        """
+        self.records += 1
+        for index, masks in enumerate(self.plan.element_masks):
+            hits = self.matcher_hits[index]
+            hit = False
+            for position, mask in enumerate(masks):
+                if presence & mask == mask:
+                    hits[position] += 1
+                    hit = True
+            if hit:
+                self.element_hits[index] += 1
+
+    def observe_record(self, data: dict):
+        """
+        Records which elements and matchers the given record data matches.
+
+        :param data: the record data
+        """
+        self.observe(self.plan.presence(data))
+
+    def _rate(self, hits: int) -> float:
+        # smooth the rates so unobserved elements and matchers aren't treated as
+        # certainties
+        return (hits + 1) / (self.records + 2)
+
+    def order(self) -> EvaluationOrder:
+        """
+        Derives an evaluation order from the observations so far. Matchers are ordered
+        by their term count over their hit rate, so cheap and likely matchers are tried
+        first, and the elements at each level by their expected cost over their miss
+        rate, so cheap and likely to fail elements are tried first.
+
+        :return: an EvaluationOrder
+        """
+        plan = self.plan
+        matchers = {}
+        costs = []
+        for index, element in enumerate(plan.elements):
+            hits = self.matcher_hits[index]
+            order = sorted(
+                range(len(element.matchers)),
+                key=lambda p: len(element.matchers[p].terms) / self._rate(hits[p]),
+            )
+            matchers[element.name] = order
+            # the expected number of term lookups to evaluate the element in this order,
+            # assuming the matchers are independent
+            cost = 0
+            reach = 1
+            for position in order:
+                cost += reach * len(element.matchers[position].terms)
+                reach *= 1 - self._rate(hits[position])
+            costs.append(cost)
+
+        elements = {}
+        for level, indexes in plan.level_elements.items():
+            order = sorted(
+                indexes,
+                key=lambda i: costs[i] / (1 - self._rate(self.element_hits[i])),
+            )
+            elements[level.name] = [plan.elements[index].name for index in order]
+        return EvaluationOrder(elements, matchers)
+
+
+def learn_order(mids: MIDS, records: Iterable[dict]) -> EvaluationOrder:
+    """
+    Profiles the given sample of records and returns the evaluation order derived from
+    the profile. Use EvaluationOrder.apply to use it.
+
+    :param mids: the MIDS object
+    :param records: the sample of record data dicts
+    :return: an EvaluationOrder
+    """
+    profile = MatchProfile(mids.plan)
+    for record in records:
+        profile.observe_record(record)
+    return profile.order()
+
+
+class AdaptiveChecker:
+    """
+    Checks records with a MIDS object while continuously adapting its evaluation order.
+    Every sample_every-th record is profiled and every relearn_every records the order
+    is re-derived from the profile and the checker switches to a copy of the MIDS
+    object using it (see EvaluationOrder.apply).
+    """
+
+    def __init__(self, mids: MIDS, sample_every: int = 100, relearn_every: int = 10000):
+        """
+        :param mids: the MIDS object to check with, it isn't changed
+        :param sample_every: how often to profile a record (default: 100)
+        :param relearn_every: how often to re-derive the order (default: 10000)
+        """
+        self.mids = mids
+        self.profile = MatchProfile(mids.plan)
+        self.sample_every = sample_every
+        self.relearn_every = relearn_every
+        self.count = 0
+
+    def check(self, data: dict) -> MIDSLevel | None:
+        """
+        Checks the given record data, see MIDS.check.
+
+        :param data: the record data
+        :return: the MIDSLevel or None
+        """
+        self.count += 1
+        if self.count % self.sample_every == 0:
+            self.profile.observe_record(data)
+        if self.count % self.relearn_every == 0:
+            self.mids = self.profile.order().apply(self.mids)
+        return self.mids.check(data)
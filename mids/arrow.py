@@ -0,0 +1,204 @@
+from pathlib import Path
+from typing import Iterator
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from mids.model import MIDSLevel, NO_LEVEL
+from mids.plan import Plan
+from mids.summary import MIDSSummary
+
+# the default number of rows to read from Parquet files at a time
+BATCH_SIZE = 65536
+
+# a table or record batch of records, one column per field
+Columns = pa.Table | pa.RecordBatch
+
+
+def present(column: pa.Array | pa.ChunkedArray) -> pa.BooleanArray:
+    """
+    Computes whether each value in the given column is present and not a value from the
+    EMPTY_VALUES set, i.e. not null and, for string columns, not an empty string.
+
+    :param column: the column
+    :return: a bool column
+    """
+    if pa.types.is_dictionary(column.type):
+        column = column.cast(column.type.value_type)
+    presence = pc.is_valid(column)
+    if pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+        not_empty = pc.fill_null(pc.not_equal(column, ""), False)
+        presence = pc.and_(presence, not_empty)
+    return presence
+
+
+def presence_columns(plan: Plan, columns: Columns) -> dict[str, pa.BooleanArray]:
+    """
+    Computes the presence of each of the plan's terms which has a column in the given
+    table or record batch. Terms without a column are never present.
+
+    :param plan: the compiled plan
+    :param columns: the table or record batch
+    :return: a dict of term name -> bool column
+    """
+    names = set(columns.schema.names)
+    return {term: present(columns.column(term)) for term in plan.terms if term in names}
+
+
+def element_columns(plan: Plan, columns: Columns) -> list[pa.BooleanArray]:
+    """
+    Evaluates every element of the plan against the given table or record batch. An
+    element is matched if any of its matchers are matched and a matcher is matched if
+    all of its terms are present.
+
+    :param plan: the compiled plan
+    :param columns: the table or record batch
+    :return: a bool column for each element in the element table
+    """
+    presence = presence_columns(plan, columns)
+    none = pa.repeat(False, columns.num_rows)
+    every = pa.repeat(True, columns.num_rows)
+    # the same matcher is often used by several elements
+    matched = {}
+    elements = []
+    for element in plan.elements:
+        result = none
+        for matcher in element.matchers:
+            if matcher.terms not in matched:
+                if all(term in presence for term in matcher.terms):
+                    column = every
+                    for term in matcher.terms:
+                        column = pc.and_(column, presence[term])
+                else:
+                    column = none
+                matched[matcher.terms] = column
+            result = pc.or_(result, matched[matcher.terms])
+        elements.append(result)
+    return elements
+
+
+def level_passes(plan: Plan, elements: list[pa.BooleanArray]) -> list[pa.BooleanArray]:
+    """
+    Evaluates every level of the plan against the given element columns. A level is
+    passed if all of its elements are matched.
+
+    :param plan: the compiled plan
+    :param elements: a bool column for each element in the element table
+    :return: a bool column for each level, in MIDSLevel order
+    """
+    levels = []
+    for level in MIDSLevel:
+        passes = pa.repeat(True, len(elements[0]) if elements else 0)
+        for index in plan.level_elements[level]:
+            passes = pc.and_(passes, elements[index])
+        levels.append(passes)
+    return levels
+
+
+def final_levels(levels: list[pa.BooleanArray]) -> pa.Int8Array:
+    """
+    Works out the MIDS level of each record from the level columns. A record's level is
+    the last level it passes without failing any of the levels before it.
+
+    :param levels: a bool column for each level, in MIDSLevel order
+    :return: an int8 column of MIDS levels, NO_LEVEL if no level was met
+    """
+    length = len(levels[0])
+    final = pa.repeat(pa.scalar(NO_LEVEL, pa.int8()), length)
+    passing = pa.repeat(True, length)
+    for level, passes in zip(MIDSLevel, levels):
+        passing = pc.and_(passing, passes)
+        final = pc.if_else(passing, pa.scalar(int(level), pa.int8()), final)
+    return final
+
+
+def check_columns(plan: Plan, columns: Columns) -> pa.Int8Array:
+    """
+    Checks the records in the given table or record batch, returning the MIDS level of
+    each. The results are the same as MIDS.check on each record.
+
+    :param plan: the compiled plan
+    :param columns: the table or record batch
+    :return: an int8 column of MIDS levels, NO_LEVEL if no level was met
+    """
+    elements = element_columns(plan, columns)
+    return final_levels(level_passes(plan, elements))
+
+
+def summarise_columns(
+    plan: Plan, columns: Columns, summary: MIDSSummary | None = None
+) -> MIDSSummary:
+    """
+    Checks the records in the given table or record batch and adds their results to a
+    summary.
+
+    :param plan: the compiled plan
+    :param columns: the table or record batch
+    :param summary: the summary to add to (default: a new summary)
+    :return: the summary
+    """
+    if summary is None:
+        summary = MIDSSummary.for_plan(plan)
+    rows = columns.num_rows
+    elements = element_columns(plan, columns)
+    levels = level_passes(plan, elements)
+    summary.total += rows
+    for index, element in enumerate(elements):
+        summary.element_fails[index] += rows - (pc.sum(element).as_py() or 0)
+    for level, passes in zip(MIDSLevel, levels):
+        summary.level_passes[level] += pc.sum(passes).as_py() or 0
+    for count in pc.value_counts(final_levels(levels)).to_pylist():
+        summary.final_levels[count["values"] + 1] += count["counts"]
+    return summary
+
+
+def read_parquet(
+    path: Path, plan: Plan, batch_size: int = BATCH_SIZE
+) -> Iterator[pa.RecordBatch]:
+    """
+    Reads the given Parquet file batch by batch, only reading the columns which are
+    referenced by the plan's terms.
+
+    :param path: the path to the Parquet file
+    :param plan: the compiled plan
+    :param batch_size: the number of rows to read at a time (default: BATCH_SIZE)
+    :return: a generator of record batches
+    """
+    parquet_file = pq.ParquetFile(path)
+    names = set(parquet_file.schema_arrow.names)
+    columns = [term for term in plan.terms if term in names]
+    yield from parquet_file.iter_batches(batch_size=batch_size, columns=columns)
+
+
+def check_parquet(
+    path: Path, plan: Plan, batch_size: int = BATCH_SIZE
+) -> Iterator[pa.Int8Array]:
+    """
+    Checks every record in the given Parquet file, yielding the level column of each
+    batch in file order.
+
+    :param path: the path to the Parquet file
+    :param plan: the compiled plan
+    :param batch_size: the number of rows to read at a time (default: BATCH_SIZE)
+    :return: a generator of int8 columns of MIDS levels, NO_LEVEL if no level was met
+    """
+    for batch in read_parquet(path, plan, batch_size):
+        yield check_columns(plan, batch)
+
+
+def summarise_parquet(
+    path: Path, plan: Plan, batch_size: int = BATCH_SIZE
+) -> MIDSSummary:
+    """
+    Checks every record in the given Parquet file and returns a summary of the results.
+
+    :param path: the path to the Parquet file
+    :param plan: the compiled plan
+    :param batch_size: the number of rows to read at a time (default: BATCH_SIZE)
+    :return: a MIDSSummary
+    """
+    summary = MIDSSummary.for_plan(plan)
+    for batch in read_parquet(path, plan, batch_size):
+        summarise_columns(plan, batch, summary)
+    return summary
@@ -0,0 +1,225 @@
+import hashlib
+import sqlite3
+from dataclasses import dataclass
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+from mids.plan import Plan
+from mids.shard import DIALECTS, FileFormat, iter_lines, line_presence, read_columns
+
+# the maximum number of keys looked up in a single query, this is kept below SQLite's
+# default limit on the number of variables in a statement
+LOOKUP_BATCH_SIZE = 500
+# the default number of records processed at a time by evaluate
+DEFAULT_BATCH_SIZE = 10000
+# the default maximum number of results kept in a cache
+DEFAULT_MAX_ENTRIES = 1_000_000
+
+
+@dataclass
+class CacheStats:
+    """
+    Counts of the operations performed by a ResultCache.
+    """
+
+    # the number of records whose cached result was used
+    hits: int = 0
+    # the number of records which had to be parsed and checked
+    misses: int = 0
+    # the number of results added to the cache
+    inserts: int = 0
+    # the number of results evicted from the cache to keep it within its size bound
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        :return: the proportion of lookups which were hits
+        """
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class ResultCache:
+    """
+    A persistent, SQLite backed cache of the element bitmasks (see Plan.evaluate) of raw
+    records.
+
+    Results are keyed by a hash of the record's raw bytes, keyed with the plan's
+    fingerprint (and the file's header, for delimited files) so results from a
+    different mapping or column layout are never used. A record whose bytes have been
+    seen before is therefore neither parsed nor evaluated, wherever it appears in
+    whichever file, while new or changed records are checked and their results added.
+    The cache holds at most max_entries results, when it grows beyond that the oldest
+    results are evicted. Eviction follows the order results were added in rather than
+    when they were last used so that hits never write to the database, an evicted
+    result which is still needed is just checked and added again. Lookups and inserts
+    are done in bulk.
+    """
+
+    def __init__(self, path: Path, plan: Plan, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """
+        :param path: the path to the SQLite database, it's created if it doesn't exist
+        :param plan: the compiled plan the results are for
+        :param max_entries: the maximum number of results to keep (default:
+                            DEFAULT_MAX_ENTRIES)
+        """
+        self.plan = plan
+        self.max_entries = max_entries
+        self.stats = CacheStats()
+        self._width = (len(plan.elements) + 7) // 8
+        self._connection = sqlite3.connect(path)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        # the id gives the order results were added in, which is the eviction order
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "id INTEGER PRIMARY KEY, key BLOB UNIQUE NOT NULL, "
+            "element_bits BLOB NOT NULL"
+            ")"
+        )
+        # the number of results in the cache, tracked here so that it isn't counted for
+        # every batch
+        (self._size,) = self._connection.execute(
+            "SELECT COUNT(*) FROM results"
+        ).fetchone()
+
+    def __enter__(self) -> "ResultCache":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """
+        Commits any pending changes and closes the database.
+        """
+        self._connection.commit()
+        self._connection.close()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def hash_key(self, context: bytes = b"") -> bytes:
+        """
+        :param context: anything else the meaning of a record's bytes depends on, e.g.
+                        the header of a delimited file (default: nothing)
+        :return: the key used to hash the raw bytes of records
+        """
+        digest = hashlib.blake2b(self.plan.fingerprint().encode("ascii"))
+        digest.update(context)
+        return digest.digest()
+
+    def get_many(self, keys: Iterable[bytes]) -> dict[bytes, int]:
+        """
+        Looks up the cached results of the given keys.
+
+        :param keys: the record hashes to look up
+        :return: a dict of key -> element bitmask of the keys which are cached
+        """
+        keys = list(set(keys))
+        found = {}
+        for start in range(0, len(keys), LOOKUP_BATCH_SIZE):
+            chunk = keys[start : start + LOOKUP_BATCH_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._connection.execute(
+                f"SELECT key, element_bits FROM results WHERE key IN ({placeholders})",
+                chunk,
+            )
+            found.update(rows)
+        return {
+            key: int.from_bytes(element_bits, "little")
+            for key, element_bits in found.items()
+        }
+
+    def put_many(self, results: dict[bytes, int]):
+        """
+        Adds results which aren't in the cache to it, evicting the oldest results if
+        the cache grows beyond its size bound.
+
+        :param results: a dict of key -> element bitmask
+        """
+        width = self._width
+        cursor = self._connection.executemany(
+            "INSERT OR IGNORE INTO results (key, element_bits) VALUES (?, ?)",
+            (
+                (key, element_bits.to_bytes(width, "little"))
+                for key, element_bits in results.items()
+            ),
+        )
+        self.stats.inserts += cursor.rowcount
+        self._size += cursor.rowcount
+        excess = self._size - self.max_entries
+        if excess > 0:
+            self._connection.execute(
+                "DELETE FROM results WHERE id IN ("
+                "SELECT id FROM results ORDER BY id LIMIT ?"
+                ")",
+                (excess,),
+            )
+            self.stats.evictions += excess
+            self._size -= excess
+        self._connection.commit()
+
+    def evaluate(
+        self,
+        lines: Iterable[bytes],
+        presence: Callable[[bytes], int],
+        context: bytes = b"",
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> Iterator[int]:
+        """
+        Evaluates the given raw records, in batches, using the cached result of each
+        record whose bytes have been seen before and parsing, evaluating and caching
+        the rest.
+
+        :param lines: the raw bytes of each record
+        :param presence: a function returning the presence bitmask of a record's bytes
+        :param context: anything else the meaning of a record's bytes depends on (see
+                        hash_key, default: nothing)
+        :param batch_size: the number of records to look up at a time (default:
+                           DEFAULT_BATCH_SIZE)
+        :return: a generator of element bitmasks, in the same order as the lines
+        """
+        key = self.hash_key(context)
+        blake2b = hashlib.blake2b
+        evaluate = self.plan.evaluate
+        lines = iter(lines)
+        while batch := list(islice(lines, batch_size)):
+            keys = [blake2b(line, digest_size=16, key=key).digest() for line in batch]
+            cached = self.get_many(keys)
+            missing = {}
+            results = []
+            for line, row_key in zip(batch, keys):
+                element_bits = cached.get(row_key)
+                if element_bits is None:
+                    element_bits = missing.get(row_key)
+                    if element_bits is None:
+                        element_bits = evaluate(presence(line))
+                        missing[row_key] = element_bits
+                    self.stats.misses += 1
+                else:
+                    self.stats.hits += 1
+                results.append(element_bits)
+            if missing:
+                self.put_many(missing)
+            yield from results
+
+    def evaluate_file(self, path: Path, file_format: FileFormat) -> Iterator[int]:
+        """
+        Evaluates every record in the given NDJSON, CSV or TSV file, in file order,
+        using the cache (see evaluate).
+
+        :param path: the path to the file
+        :param file_format: the format of the file
+        :return: a generator of element bitmasks
+        """
+        columns = None
+        start = 0
+        context = b""
+        if file_format in DIALECTS:
+            columns, start = read_columns(path, file_format, self.plan)
+            context = "\t".join(columns.header).encode("utf-8")
+        lines = iter_lines(path, start, path.stat().st_size)
+        presence = line_presence(file_format, self.plan, columns)
+        yield from self.evaluate(lines, presence, context)
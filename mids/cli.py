@@ -1,14 +1,53 @@
 import json
+from itertools import chain
 from pathlib import Path
+from typing import TextIO
 
 import click
 
-from mids.cli_utils import print_check, print_report, get_gbif_data, get_data_from_url
+from mids.cli_utils import (
+    print_gaps_file,
+    print_estimate_file,
+    print_batch,
+    print_check,
+    print_report,
+    get_gbif_data,
+    get_data_from_url,
+    print_dwca_check,
+    print_file_check,
+    print_file_report,
+    print_compile_mappings,
+    print_gbif_checks,
+    print_gbif_survey,
+    print_merged_summaries,
+    print_parquet_check,
+    print_profile,
+    print_sql,
+    start_profiler,
+)
+from mids.shard import FileFormat
+from mids.sql import SQLDialect
+from mids.stream import OutputFormat
 
 
 @click.group("mids")
-def cli():
-    pass
+@click.option(
+    "--profile",
+    is_flag=True,
+    default=False,
+    help="Profile the evaluation of the mapping and print the results to stderr, only "
+    "work done in this process is profiled so use a single worker",
+)
+@click.option(
+    "--profile-output",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Save the profile to this file as JSON, implies --profile",
+)
+@click.pass_context
+def cli(ctx: click.Context, profile: bool = False, profile_output: Path | None = None):
+    if profile or profile_output:
+        profiler = start_profiler()
+        ctx.call_on_close(lambda: print_profile(profiler, profile_output))
 
 
 @cli.command("report-url")
@@ -19,20 +58,237 @@ def report_url(url: str, verbose: bool = False):
     print_report(data, verbose=verbose)
 
 
+def file_options(command):
+    """
+    Decorator adding the options used by the commands which operate on local files.
+    """
+    command = click.option(
+        "-w",
+        "--workers",
+        type=click.IntRange(min=1),
+        default=1,
+        help="The number of worker processes to use with ndjson, csv and tsv files",
+    )(command)
+    command = click.option(
+        "-f",
+        "--format",
+        "file_format",
+        type=click.Choice(["json", *FileFormat]),
+        default="json",
+        help="The file format, json files must contain a single record",
+    )(command)
+    return command
+
+
+def summary_file_option(command):
+    """
+    Decorator adding the option used to save a summary of the results to a file.
+    """
+    return click.option(
+        "--summary-file",
+        type=click.Path(dir_okay=False, path_type=Path),
+        help="Save the summary to this file, as JSON if it ends in .json, otherwise "
+        "in binary form",
+    )(command)
+
+
 @cli.command("report-file")
-@click.argument("file", type=click.File())
+@click.argument("file", type=click.Path(exists=True, dir_okay=False, path_type=Path))
 @click.option("-v", "--verbose", is_flag=True, default=False)
-def report_file(path: Path, verbose: bool = False):
-    with path.open() as f:
-        print_report(json.load(f), verbose=verbose)
+@file_options
+def report_file(
+    file: Path, file_format: str = "json", workers: int = 1, verbose: bool = False
+):
+    if file_format == "json":
+        with file.open() as f:
+            print_report(json.load(f), verbose=verbose)
+    else:
+        print_file_report(file, FileFormat(file_format), workers, verbose=verbose)
+
+
+@cli.command("batch")
+@click.argument("input_file", type=click.File(encoding="utf-8"), default="-")
+@click.option(
+    "-f",
+    "--format",
+    "file_format",
+    type=click.Choice(["json", *FileFormat]),
+    default=FileFormat.ndjson,
+    show_default=True,
+    help="The input format, json input must be an array of records",
+)
+@click.option(
+    "-o",
+    "--output",
+    "output_file",
+    type=click.File("w", encoding="utf-8"),
+    default="-",
+    help="The file to write the results to, defaults to stdout",
+)
+@click.option(
+    "-t",
+    "--output-format",
+    type=click.Choice(list(OutputFormat)),
+    default=OutputFormat.ndjson,
+    show_default=True,
+    help="The format to write the results in",
+)
+@click.option(
+    "--id-field",
+    help="The field to identify records by, defaults to their position in the input",
+)
+@click.option(
+    "--fails",
+    is_flag=True,
+    default=False,
+    help="Include the names of the elements each record fails",
+)
+@click.option(
+    "--aliases",
+    is_flag=True,
+    default=False,
+    help="Resolve fields named by term name, CURIE or IRI and include nested records "
+    "such as GBIF media",
+)
+@click.option(
+    "--summary",
+    is_flag=True,
+    default=False,
+    help="Print a summary of the results to stderr at the end",
+)
+@summary_file_option
+def batch(
+    input_file: TextIO,
+    file_format: str = FileFormat.ndjson,
+    output_file: TextIO | None = None,
+    output_format: str = OutputFormat.ndjson,
+    id_field: str | None = None,
+    fails: bool = False,
+    aliases: bool = False,
+    summary: bool = False,
+    summary_file: Path | None = None,
+):
+    print_batch(
+        input_file,
+        file_format,
+        output_file,
+        OutputFormat(output_format),
+        id_field,
+        fails,
+        aliases,
+        summary,
+        summary_file,
+    )
+
+
+@cli.command("estimate-file")
+@click.argument("file", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option(
+    "-f",
+    "--format",
+    "file_format",
+    type=click.Choice(list(FileFormat)),
+    default=FileFormat.ndjson,
+    show_default=True,
+    help="The file format",
+)
+@click.option(
+    "-p",
+    "--precision",
+    type=click.FloatRange(min=0, max=1, min_open=True),
+    default=0.01,
+    show_default=True,
+    help="Stop sampling once the level estimates are within this margin",
+)
+@click.option(
+    "-c",
+    "--confidence",
+    type=click.FloatRange(min=0, max=1, min_open=True, max_open=True),
+    default=0.95,
+    show_default=True,
+    help="The confidence level of the intervals",
+)
+@click.option(
+    "--stratify",
+    help="A field to also estimate each value of separately, e.g. institutionCode",
+)
+@click.option("--seed", type=click.INT, help="The random seed")
+@click.option(
+    "-n",
+    "--max-samples",
+    type=click.IntRange(min=1),
+    default=100_000,
+    show_default=True,
+    help="The maximum number of records to sample",
+)
+def estimate_file(
+    file: Path,
+    file_format: str = FileFormat.ndjson,
+    precision: float = 0.01,
+    confidence: float = 0.95,
+    stratify: str | None = None,
+    seed: int | None = None,
+    max_samples: int = 100_000,
+):
+    print_estimate_file(
+        file,
+        FileFormat(file_format),
+        precision,
+        confidence,
+        stratify,
+        seed,
+        max_samples,
+    )
+
+
+@cli.command("gaps-file")
+@click.argument("file", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option(
+    "-f",
+    "--format",
+    "file_format",
+    type=click.Choice(list(FileFormat)),
+    default=FileFormat.ndjson,
+    show_default=True,
+    help="The file format",
+)
+@click.option(
+    "-n",
+    "--top",
+    type=click.IntRange(min=1),
+    default=20,
+    show_default=True,
+    help="The number of sets of missing fields to show",
+)
+@click.option("--json", "json_output", is_flag=True, default=False, help="Output JSON")
+def gaps_file(
+    file: Path,
+    file_format: str = FileFormat.ndjson,
+    top: int = 20,
+    json_output: bool = False,
+):
+    print_gaps_file(file, FileFormat(file_format), top, json_output)
+
+
+def gbif_url_option(command):
+    """
+    Decorator adding the option used to set the GBIF API base URL.
+    """
+    return click.option(
+        "--base-url",
+        envvar="MIDS_GBIF_URL",
+        show_default="the public GBIF API",
+        help="The base URL of the GBIF API",
+    )(command)
 
 
 @cli.command("report-gbif")
 @click.argument("gbif_id", type=click.INT)
 @click.option("-v", "--verbose", is_flag=True, default=False)
-def report_gbif(gbif_id: int, verbose: bool = False):
-    data = get_gbif_data(gbif_id)
-    print_report(data, verbose=verbose)
+@gbif_url_option
+def report_gbif(gbif_id: int, verbose: bool = False, base_url: str | None = None):
+    data = get_gbif_data(gbif_id, base_url)
+    print_report(data, verbose=verbose, aliases=True)
 
 
 @cli.command("check-url")
@@ -46,20 +302,254 @@ def check_url(url: str):
 
 
 @cli.command("check-file")
-@click.argument("file", type=click.File())
-def check_file(path: Path):
-    with path.open() as f:
-        print_check(json.load(f))
+@click.argument("file", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option(
+    "--summary",
+    is_flag=True,
+    default=False,
+    help="Only print a summary of the results",
+)
+@click.option(
+    "--cache",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Cache results in this SQLite database, records which have been seen on "
+    "earlier runs aren't parsed or checked again, can't be used with --workers",
+)
+@click.option(
+    "--cache-size",
+    type=click.IntRange(min=1),
+    default=1_000_000,
+    show_default=True,
+    help="The maximum number of results to keep in the cache",
+)
+@summary_file_option
+@file_options
+def check_file(
+    file: Path,
+    file_format: str = "json",
+    workers: int = 1,
+    summary: bool = False,
+    summary_file: Path | None = None,
+    cache: Path | None = None,
+    cache_size: int = 1_000_000,
+):
+    if cache is not None and (file_format == "json" or workers > 1):
+        raise click.UsageError(
+            "--cache can only be used with a single worker and a line based format"
+        )
+    if file_format == "json":
+        with file.open() as f:
+            print_check(json.load(f))
+    else:
+        print_file_check(
+            file,
+            FileFormat(file_format),
+            workers,
+            summary,
+            summary_file,
+            cache,
+            cache_size,
+        )
 
 
 @cli.command("check-gbif")
-@click.argument("gbif_id", type=click.INT)
-def check_gbif(gbif_id: int):
-    gbif_data = get_gbif_data(gbif_id)
-    if gbif_data is None:
-        print(f"No occurrence with ID {gbif_id} found")
+@click.argument("gbif_ids", type=click.INT, nargs=-1)
+@click.option(
+    "-i",
+    "--ids-file",
+    type=click.File(),
+    help="A file of GBIF IDs, one per line, use - for stdin",
+)
+@click.option(
+    "-c",
+    "--concurrency",
+    type=click.IntRange(min=1),
+    default=10,
+    show_default=True,
+    help="The maximum number of concurrent requests",
+)
+@click.option(
+    "-r",
+    "--rate",
+    type=click.FloatRange(min=0, min_open=True),
+    help="The maximum number of requests per second",
+)
+@gbif_url_option
+def check_gbif(
+    gbif_ids: tuple[int, ...],
+    ids_file: TextIO | None = None,
+    concurrency: int = 10,
+    rate: float | None = None,
+    base_url: str | None = None,
+):
+    if len(gbif_ids) == 1 and ids_file is None:
+        gbif_id = gbif_ids[0]
+        gbif_data = get_gbif_data(gbif_id, base_url)
+        if gbif_data is None:
+            print(f"No occurrence with ID {gbif_id} found")
+        else:
+            print_check(gbif_data, aliases=True)
     else:
-        print_check(gbif_data)
+        ids = gbif_ids
+        if ids_file is not None:
+            from_file = (int(line) for line in ids_file if line.strip())
+            ids = chain(gbif_ids, from_file)
+        print_gbif_checks(ids, base_url, concurrency, rate)
+
+
+@cli.command("survey-gbif")
+@click.option("--dataset-key", help="Only survey occurrences from this dataset")
+@click.option(
+    "--publishing-org", help="Only survey occurrences from this publishing organization"
+)
+@click.option(
+    "-p",
+    "--param",
+    "extra_params",
+    multiple=True,
+    help="Extra occurrence search parameters as key=value, can be used multiple times",
+)
+@click.option(
+    "-s",
+    "--state",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="A file to save progress to, and resume from if it already exists",
+)
+@click.option(
+    "-m",
+    "--max-records",
+    type=click.IntRange(min=1),
+    help="Stop after surveying this many occurrences",
+)
+@gbif_url_option
+def survey_gbif(
+    dataset_key: str | None = None,
+    publishing_org: str | None = None,
+    extra_params: tuple[str, ...] = (),
+    state: Path | None = None,
+    max_records: int | None = None,
+    base_url: str | None = None,
+):
+    params = {}
+    if dataset_key:
+        params["datasetKey"] = dataset_key
+    if publishing_org:
+        params["publishingOrg"] = publishing_org
+    for param in extra_params:
+        key, sep, value = param.partition("=")
+        if not sep:
+            raise click.BadParameter(f"{param} is not in key=value form")
+        params.setdefault(key, []).append(value)
+    print_gbif_survey(params, base_url, state, max_records)
+
+
+@cli.command("check-dwca")
+@click.argument("archive", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option(
+    "-q", "--quiet", is_flag=True, default=False, help="Only print the summary"
+)
+@summary_file_option
+def check_dwca(archive: Path, quiet: bool = False, summary_file: Path | None = None):
+    print_dwca_check(archive, quiet=quiet, summary_path=summary_file)
+
+
+@cli.command("check-parquet")
+@click.argument("file", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.option(
+    "--summary",
+    is_flag=True,
+    default=False,
+    help="Only print a summary of the results",
+)
+@click.option(
+    "-b",
+    "--batch-size",
+    type=click.IntRange(min=1),
+    help="The number of rows to read at a time",
+)
+@summary_file_option
+def check_parquet(
+    file: Path,
+    summary: bool = False,
+    summary_file: Path | None = None,
+    batch_size: int | None = None,
+):
+    print_parquet_check(file, summary, summary_file, batch_size)
+
+
+@cli.command("serve")
+@click.option("--host", default="127.0.0.1", show_default=True)
+@click.option(
+    "-p", "--port", type=click.IntRange(0, 65535), default=8000, show_default=True
+)
+@click.option("-v", "--verbose", is_flag=True, default=False, help="Log each request")
+def serve(host: str = "127.0.0.1", port: int = 8000, verbose: bool = False):
+    from mids.server import serve
+
+    serve(host, port, verbose)
+
+
+@cli.command("to-sql")
+@click.option(
+    "-d",
+    "--dialect",
+    type=click.Choice(list(SQLDialect)),
+    default=SQLDialect.sqlite,
+    show_default=True,
+)
+@click.option(
+    "-t",
+    "--table",
+    help="Output a SELECT statement for this table rather than just the level "
+    "expression",
+)
+@click.option(
+    "-e",
+    "--elements",
+    is_flag=True,
+    default=False,
+    help="Select a boolean column per element too, requires --table",
+)
+@click.option(
+    "-c",
+    "--columns",
+    help="A comma separated list of the columns the table has, terms without a column "
+    "are treated as empty",
+)
+def to_sql(
+    dialect: str = SQLDialect.sqlite,
+    table: str | None = None,
+    elements: bool = False,
+    columns: str | None = None,
+):
+    if elements and table is None:
+        raise click.UsageError("--elements requires --table")
+    print_sql(
+        SQLDialect(dialect), table, elements, columns.split(",") if columns else None
+    )
+
+
+@cli.command("merge-summaries")
+@click.argument(
+    "summaries",
+    nargs=-1,
+    required=True,
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+)
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Save the merged summary to this file, as JSON if it ends in .json, "
+    "otherwise in binary form",
+)
+def merge_summaries(summaries: tuple[Path, ...], output: Path | None = None):
+    print_merged_summaries(summaries, output)
+
+
+@cli.command("compile-mapping")
+def compile_mapping():
+    print_compile_mappings()
 
 
 if __name__ == "__main__":
@@ -1,28 +1,55 @@
 import json
-import urllib.request
-from urllib.error import HTTPError
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Iterable, TextIO, TYPE_CHECKING
 
+from mids.dwca import evaluate_dwca
+from mids.estimate import estimate_file, MIDSEstimate, Proportion
+from mids.gaps import analyse_file
+from mids.instrument import Profiler
+from mids.io import compile_mapping
 from mids.lib import init
-from mids.model import Discipline
+from mids.model import Discipline, MIDSLevel, MIDSResult, NO_LEVEL
+from mids.shard import (
+    DIALECTS,
+    FileFormat,
+    check_file,
+    read_columns,
+    report_file,
+    summarise_file,
+)
+from mids.sql import SQLDialect
+from mids.stream import check_stream, iter_stream, OutputFormat, ResultWriter
+from mids.summary import MIDSSummary
 
+if TYPE_CHECKING:
+    from mids.cache import CacheStats
 
-def print_report(data: dict, verbose: bool = False):
+
+def print_report(data: dict, verbose: bool = False, aliases: bool = False):
     """
     Given some data, check it against MIDS and print a report to stdout.
 
     :param data: the data to report
     :param verbose: whether to print a verbose report or not (default: False)
+    :param aliases: whether to resolve the data's keys as term names, CURIEs or IRIs
+                    and include nested records (see MIDS.report, default: False)
     """
-    report = init(Discipline.biology).report(data)
+    report = init(Discipline.biology).report(data, aliases=aliases)
+    _print_results(report, verbose)
+
 
+def _print_results(results: Iterable[MIDSResult], verbose: bool):
     if verbose:
         messages = {True: "PASS", False: "FAIL"}
-        for result in report:
+        for result in results:
             print(f"Level {result.level}: {messages[result.passed]}")
             for element, passed in result:
                 print(f"\t{element.name}: {messages[passed]}")
     else:
-        for result in report:
+        for result in results:
             if result.passed:
                 print(f"Level {result.level} passed")
             else:
@@ -30,25 +57,536 @@ def print_report(data: dict, verbose: bool = False):
                 print(f"Level {result.level} failed on {failed}")
 
 
-def print_check(data: dict):
+def print_check(data: dict, aliases: bool = False):
     """
     Given some data, check it against MIDS and print the MIDS level of the data to
     stdout.
 
     :param data: the data to report
+    :param aliases: whether to resolve the data's keys as term names, CURIEs or IRIs
+                    and include nested records (see MIDS.check, default: False)
     """
-    level = init(Discipline.biology).check(data)
+    level = init(Discipline.biology).check(data, aliases=aliases)
     print(f"Matched to MIDS level {level}")
 
 
-def get_gbif_data(gbif_id: int) -> dict | None:
+def print_summary(summary: MIDSSummary, file: TextIO = sys.stdout):
+    """
+    Print the number of records at each MIDS level, passing each level and failing each
+    element in the given summary.
+
+    :param summary: the summary to print
+    :param file: the file to print to (default: stdout)
+    """
+    print(f"Records: {summary.total}", file=file)
+    for level in [None, *MIDSLevel]:
+        print(f"Level {level}: {summary.level_count(level)}", file=file)
+    for level in MIDSLevel:
+        passes = summary.level_passes[level]
+        print(f"Level {level} passed: {passes}", file=file)
+    fails = sorted(zip(summary.element_fails, summary.elements), reverse=True)
+    for count, name in fails:
+        print(f"{name} failed: {count}", file=file)
+
+
+def print_file_check(
+    path: Path,
+    file_format: FileFormat,
+    workers: int = 1,
+    summary: bool = False,
+    summary_path: Path | None = None,
+    cache_path: Path | None = None,
+    cache_size: int = 1_000_000,
+):
+    """
+    Check every record in the given NDJSON, CSV or TSV file against MIDS using the given
+    number of worker processes. Either each record's index and MIDS level are printed to
+    stdout as a tab separated line, in file order, or just a summary of the results if
+    summary is True.
+
+    If a cache path is given, the file is checked in this process using the result
+    cache at that path (see ResultCache), so records which have been seen on a previous
+    run aren't parsed again, and the cache's stats are printed to stderr at the end of
+    the run.
+
+    :param path: the path to the file
+    :param file_format: the format of the file
+    :param workers: the number of worker processes to use (default: 1)
+    :param summary: whether to only print a summary of the results
+    :param summary_path: a path to save the summary to (optional, only used when
+                         summary is True), see MIDSSummary.save
+    :param cache_path: a path to a result cache database to use (optional)
+    :param cache_size: the maximum number of results to keep in the cache
+    """
+    print_columns(path, file_format)
+    if cache_path is not None:
+        from mids.cache import ResultCache
+
+        plan = init(Discipline.biology).plan
+        with ResultCache(cache_path, plan, cache_size) as cache:
+            results = cache.evaluate_file(path, file_format)
+            if summary:
+                totals = MIDSSummary.for_plan(plan)
+                for element_bits in results:
+                    totals.add(element_bits)
+                if summary_path is not None:
+                    totals.save(summary_path)
+                print_summary(totals)
+            else:
+                for index, element_bits in enumerate(results):
+                    print(f"{index}\t{plan.level(element_bits)}")
+            print_cache_stats(cache.stats)
+    elif summary:
+        results = summarise_file(path, file_format, workers)
+        if summary_path is not None:
+            results.save(summary_path)
+        print_summary(results)
+    else:
+        for index, level in enumerate(check_file(path, file_format, workers)):
+            print(f"{index}\t{_level_name(level)}")
+
+
+def print_file_report(
+    path: Path, file_format: FileFormat, workers: int = 1, verbose: bool = False
+):
+    """
+    Report on every record in the given NDJSON, CSV or TSV file using the given number
+    of worker processes, printing each record's index followed by its report to stdout,
+    in file order.
+
+    :param path: the path to the file
+    :param file_format: the format of the file
+    :param workers: the number of worker processes to use (default: 1)
+    :param verbose: whether to print verbose reports or not (default: False)
+    """
+    print_columns(path, file_format)
+    mids = init(Discipline.biology)
+    for index, element_bits in enumerate(report_file(path, file_format, workers)):
+        results = mids.results(element_bits)
+        print(f"Record {index}")
+        _print_results(map(results.__getitem__, MIDSLevel), verbose)
+
+
+def print_batch(
+    input_file: TextIO,
+    file_format: str,
+    output_file: TextIO,
+    output_format: OutputFormat,
+    id_field: str | None = None,
+    fails: bool = False,
+    aliases: bool = False,
+    summary: bool = False,
+    summary_path: Path | None = None,
+):
+    """
+    Check every record in the given stream against MIDS one at a time, writing each
+    record's ID and MIDS level (and optionally the elements it fails) to the output
+    stream as NDJSON or CSV. The number of records checked, and optionally a summary of
+    the results, is printed to stderr at the end so the output can be piped to other
+    tools. If the output is closed early, e.g. when piped to head, the run stops
+    quietly.
+
+    :param input_file: the stream to read records from
+    :param file_format: json for a JSON array of records, or a FileFormat
+    :param output_file: the stream to write the results to
+    :param output_format: the format to write the results in
+    :param id_field: the field records are identified by (optional, by default each
+                     record's position in the input is used)
+    :param fails: whether to write the names of the elements each record fails
+    :param aliases: whether to resolve record keys as term names, CURIEs or IRIs and
+                    include nested records (see MIDS.check)
+    :param summary: whether to print a summary of the results to stderr
+    :param summary_path: a path to save the summary to (optional, only used when
+                         summary is True), see MIDSSummary.save
+    """
+    plan = init(Discipline.biology).plan
+    records = iter_stream(input_file, file_format, plan, id_field, aliases)
+    totals = MIDSSummary.for_plan(plan) if summary else None
+    try:
+        with ResultWriter(output_file, output_format, fails) as writer:
+            count = check_stream(records, plan, writer, id_field, aliases, totals)
+    except BrokenPipeError:
+        # the reader has gone away, point stdout at devnull so that Python doesn't
+        # complain when it flushes stdout on exit
+        if output_file is sys.stdout:
+            devnull = os.open(os.devnull, os.O_WRONLY)
+            os.dup2(devnull, sys.stdout.fileno())
+        sys.exit(1)
+    print(f"Records checked: {count}", file=sys.stderr)
+    if totals is not None:
+        if summary_path is not None:
+            totals.save(summary_path)
+        print_summary(totals, file=sys.stderr)
+
+
+def print_estimate_file(
+    path: Path,
+    file_format: FileFormat,
+    precision: float = 0.01,
+    confidence: float = 0.95,
+    stratify: str | None = None,
+    seed: int | None = None,
+    max_samples: int = 100_000,
+):
+    """
+    Estimate the MIDS level distribution and element failure rates of the records in
+    the given NDJSON, CSV or TSV file from a random sample (see estimate_file) and print
+    the estimates with their confidence intervals to stdout.
+
+    :param path: the path to the file
+    :param file_format: the format of the file
+    :param precision: the confidence interval half width to stop sampling at
+    :param confidence: the confidence level of the intervals
+    :param stratify: the field to also estimate each value of separately (optional)
+    :param seed: the random seed (optional)
+    :param max_samples: the maximum number of records to sample
+    """
+    estimate = estimate_file(
+        path,
+        file_format,
+        precision,
+        confidence,
+        stratify,
+        seed,
+        max_samples=max_samples,
+    )
+    print_estimate(estimate)
+    for stratum, stratum_estimate in sorted(estimate.strata.items()):
+        print(f"\n{stratify}: {stratum}")
+        print_estimate(stratum_estimate)
+
+
+def print_estimate(estimate: MIDSEstimate, file: TextIO = sys.stdout):
+    """
+    Print the estimated proportion of records at each MIDS level and failing each
+    element in the given estimate, with their confidence intervals.
+
+    :param estimate: the estimate to print
+    :param file: the file to print to (default: stdout)
+    """
+
+    def percentages(proportion: Proportion) -> str:
+        return (
+            f"{proportion.value:.1%} " f"({proportion.low:.1%} - {proportion.high:.1%})"
+        )
+
+    print(
+        f"Records sampled: {estimate.samples} "
+        f"({estimate.confidence:.0%} confidence, ±{estimate.precision:.1%})",
+        file=file,
+    )
+    for level in [None, *MIDSLevel]:
+        print(f"Level {level}: {percentages(estimate.level(level))}", file=file)
+    fails = sorted(
+        (
+            (estimate.element_fails(index), name)
+            for index, name in enumerate(estimate.elements)
+        ),
+        key=lambda fail: fail[0].value,
+        reverse=True,
+    )
+    for proportion, name in fails:
+        print(f"{name} failed: {percentages(proportion)}", file=file)
+
+
+def print_gaps_file(
+    path: Path, file_format: FileFormat, top: int = 20, json_output: bool = False
+):
+    """
+    Analyse the gaps of every record in the given NDJSON, CSV or TSV file (see
+    analyse_file), printing the sets of missing terms which would lift the most records
+    to their next MIDS level, and the number of records each term is missing from, to
+    stdout.
+
+    :param path: the path to the file
+    :param file_format: the format of the file
+    :param top: the number of sets of missing terms to print (default: 20)
+    :param json_output: whether to print the analysis as JSON (default: False)
+    """
+    analysis = analyse_file(path, file_format)
+    if json_output:
+        print(json.dumps(analysis.to_dict(top), indent=2))
+        return
+    print(f"Records: {analysis.total}, at the last level: {analysis.complete}")
+    for gap in analysis.top(top):
+        terms = ", ".join(gap.terms)
+        print(f"Level {gap.level}: {gap.records} records missing {terms}")
+    for term, records in analysis.term_counts().most_common():
+        print(f"{term} missing: {records}")
+
+
+def print_cache_stats(stats: "CacheStats"):
+    """
+    Print the stats of a result cache to stderr.
+
+    :param stats: the cache stats
+    """
+    print(
+        f"Cache hits: {stats.hits}, misses: {stats.misses} "
+        f"({stats.hit_rate:.1%} hit rate), inserts: {stats.inserts}, "
+        f"evictions: {stats.evictions}",
+        file=sys.stderr,
+    )
+
+
+def print_columns(path: Path, file_format: FileFormat):
+    """
+    Print the number of columns of the given delimited file which are read and skipped
+    to stderr. Nothing is printed for other file formats.
+
+    :param path: the path to the file
+    :param file_format: the format of the file
+    """
+    if file_format not in DIALECTS:
+        return
+    columns, _ = read_columns(path, file_format, init(Discipline.biology).plan)
+    print(
+        f"Columns read: {len(columns.indexes)}, skipped: {len(columns.skipped)}",
+        file=sys.stderr,
+    )
+
+
+def print_sql(
+    dialect: SQLDialect,
+    table: str | None = None,
+    elements: bool = False,
+    columns: list[str] | None = None,
+):
+    """
+    Print the SQL computing the MIDS level, see MIDS.to_sql.
+
+    :param dialect: the SQL dialect to use
+    :param table: the name of the table to select from (optional)
+    :param elements: whether to select a column per element, requires a table
+    :param columns: the columns the table has (optional)
+    """
+    mids = init(Discipline.biology)
+    print(mids.to_sql(dialect, table, elements, columns))
+
+
+def start_profiler() -> Profiler:
+    """
+    Start profiling the biology MIDS object used by the commands.
+
+    :return: the started Profiler
+    """
+    return Profiler(init(Discipline.biology).plan).start()
+
+
+def print_profile(profiler: Profiler, output: Path | None = None):
+    """
+    Stop the given profiler and print its results to stderr as a table.
+
+    :param profiler: the profiler
+    :param output: a path to save the profile to as JSON (optional)
+    """
+    profiler.stop()
+    if output is not None:
+        profiler.save(output)
+    profiler.print_table(sys.stderr)
+
+
+def _level_name(level: int) -> str:
+    return "None" if level == NO_LEVEL else str(level)
+
+
+def print_dwca_check(path: Path, quiet: bool = False, summary_path: Path | None = None):
+    """
+    Stream the records out of the given Darwin Core Archive, check each one against MIDS
+    and print its id and MIDS level to stdout as a tab separated line. Once all the
+    records have been checked, a summary of the results and the throughput are printed
+    to stderr.
+
+    :param path: the path to the archive zip
+    :param quiet: whether to skip printing the line for each record (default: False)
+    :param summary_path: a path to save the summary to (optional), see
+                         MIDSSummary.save
+    """
+    mids = init(Discipline.biology)
+    plan = mids.plan
+    summary = MIDSSummary.for_plan(plan)
+    start = time.perf_counter()
+    for core_id, element_bits in evaluate_dwca(mids, path):
+        summary.add(element_bits)
+        if not quiet:
+            print(f"{core_id}\t{plan.level(element_bits)}")
+    elapsed = time.perf_counter() - start
+
+    if summary_path is not None:
+        summary.save(summary_path)
+    print_summary(summary, file=sys.stderr)
+    rate = summary.total / elapsed if elapsed else 0
+    print(
+        f"Checked {summary.total} records in {elapsed:.2f}s ({rate:.0f} records/s)",
+        file=sys.stderr,
+    )
+
+
+def print_parquet_check(
+    path: Path,
+    summary: bool = False,
+    summary_path: Path | None = None,
+    batch_size: int | None = None,
+):
+    """
+    Check every record in the given Parquet file against MIDS using the Arrow engine.
+    Either each record's index and MIDS level are printed to stdout as a tab separated
+    line, in file order, or just a summary of the results if summary is True. Requires
+    pyarrow to be installed.
+
+    :param path: the path to the Parquet file
+    :param summary: whether to only print a summary of the results
+    :param summary_path: a path to save the summary to (optional, only used when
+                         summary is True), see MIDSSummary.save
+    :param batch_size: the number of rows to read at a time (default: the Arrow
+                       engine's default)
+    """
+    from mids.arrow import BATCH_SIZE, check_parquet, summarise_parquet
+
+    plan = init(Discipline.biology).plan
+    batch_size = batch_size or BATCH_SIZE
+    if summary:
+        results = summarise_parquet(path, plan, batch_size)
+        if summary_path is not None:
+            results.save(summary_path)
+        print_summary(results)
+    else:
+        index = 0
+        for levels in check_parquet(path, plan, batch_size):
+            for level in levels.to_pylist():
+                print(f"{index}\t{_level_name(level)}")
+                index += 1
+
+
+def print_merged_summaries(paths: Iterable[Path], output: Path | None = None):
+    """
+    Merge the summaries saved at the given paths, print the result to stdout and
+    optionally save it.
+
+    :param paths: the paths of the summaries, see MIDSSummary.save
+    :param output: a path to save the merged summary to (optional)
+    """
+    merged = MIDSSummary.merge_all(map(MIDSSummary.load, paths))
+    if output is not None:
+        merged.save(output)
+    print_summary(merged)
+
+
+def print_compile_mappings():
+    """
+    Compile the mapping for every discipline and print the paths of the compiled mapping
+    files to stdout.
+    """
+    for discipline in Discipline:
+        path = compile_mapping(discipline)
+        print(f"Compiled {discipline} mapping to {path}")
+
+
+def print_gbif_checks(
+    gbif_ids: Iterable[int],
+    base_url: str | None = None,
+    concurrency: int = 10,
+    rate: float | None = None,
+):
+    """
+    Retrieve the occurrences with the given GBIF IDs concurrently and check each one
+    against MIDS as it arrives, printing its GBIF ID and MIDS level to stdout as a tab
+    separated line. Occurrences that don't exist are printed with a level of "Not found"
+    and those which couldn't be retrieved, even after retrying, with a level of "Failed"
+    and the error printed to stderr. Note that the lines are printed in the order the
+    occurrences arrive in.
+
+    :param gbif_ids: the GBIF IDs of the occurrences
+    :param base_url: the base URL of the GBIF API (default: None, which means the
+                     public GBIF API)
+    :param concurrency: the maximum number of concurrent requests (default: 10)
+    :param rate: the maximum number of requests per second (default: None, no limit)
+    """
+    # imported here as asyncio and the client's dependencies are slow to import
+    import asyncio
+    from mids.gbif import GBIF_API_URL, GBIFClient, GBIFError
+
+    if base_url is None:
+        base_url = GBIF_API_URL
+    mids = init(Discipline.biology)
+
+    async def run():
+        async with GBIFClient(base_url, concurrency, rate) as client:
+            async for gbif_id, data in client.get_occurrences(gbif_ids, errors=True):
+                if data is None:
+                    level = "Not found"
+                elif isinstance(data, GBIFError):
+                    level = "Failed"
+                    print(f"{gbif_id}: {data}", file=sys.stderr)
+                else:
+                    level = mids.check(data, aliases=True)
+                print(f"{gbif_id}\t{level}")
+
+    asyncio.run(run())
+
+
+def print_gbif_survey(
+    params: dict,
+    base_url: str | None = None,
+    state_path: Path | None = None,
+    max_records: int | None = None,
+):
+    """
+    Survey the MIDS levels of the occurrences matching the given GBIF occurrence search
+    parameters, printing progress to stderr after each page and the number of
+    occurrences at each level and failing each element to stdout at the end. If a state
+    path is given, the survey's state is saved to it after each page and if the file
+    already exists for the same parameters, the survey resumes from where it left off.
+
+    :param params: the occurrence search parameters
+    :param base_url: the base URL of the GBIF API (default: None, which means the
+                     public GBIF API)
+    :param state_path: the path to save the state to (optional)
+    :param max_records: stop after at least this many occurrences (optional)
+    """
+    # imported here as asyncio and the client's dependencies are slow to import
+    import asyncio
+    from mids.gbif import GBIF_API_URL, GBIFClient
+    from mids.survey import GBIFSurvey
+
+    if base_url is None:
+        base_url = GBIF_API_URL
+    mids = init(Discipline.biology)
+    survey = GBIFSurvey(params, MIDSSummary.for_plan(mids.plan))
+    if state_path is not None and state_path.exists():
+        saved = GBIFSurvey.load(state_path)
+        if saved.params == params:
+            survey = saved
+            print(f"Resuming from offset {survey.offset}", file=sys.stderr)
+
+    async def run():
+        async with GBIFClient(base_url) as client:
+            await survey.run(client, mids, state_path, max_records)
+
+    start = time.perf_counter()
+    asyncio.run(run())
+    elapsed = time.perf_counter() - start
+
+    total = survey.summary.total
+    print(f"Surveyed {total} occurrences in {elapsed:.2f}s", file=sys.stderr)
+    print_summary(survey.summary)
+
+
+def get_gbif_data(gbif_id: int, base_url: str | None = None) -> dict | None:
     """
     Retrieves the data for the given GBIF ID from the GBIF API.
 
     :param gbif_id: the GBIF ID of the occurrence
+    :param base_url: the base URL of the GBIF API (default: None, which means the
+                     public GBIF API)
     :return: either data as a dict or None if the occurrence does not exist
     """
-    return get_data_from_url(f"https://api.gbif.org/v1/occurrence/{gbif_id}")
+    if base_url is None:
+        # imported here as the GBIF client's dependencies are slow to import
+        from mids.gbif import GBIF_API_URL
+
+        base_url = GBIF_API_URL
+    return get_data_from_url(f"{base_url.rstrip('/')}/occurrence/{gbif_id}")
 
 
 def get_data_from_url(url: str) -> dict | None:
@@ -58,6 +596,10 @@ def get_data_from_url(url: str) -> dict | None:
     :param url: the URL to retrieve data from
     :return: either data as a dict or None if a response cannot be retrieved
     """
+    # imported here as urllib.request's dependencies are slow to import
+    import urllib.request
+    from urllib.error import HTTPError
+
     try:
         with urllib.request.urlopen(url) as r:
             if r.headers["Content-Type"] != "application/json":
@@ -0,0 +1,203 @@
+from array import array
+from typing import Iterable, Iterator, Sequence
+
+from mids.model import MIDSElement, MIDSLevel
+from mids.plan import Plan
+
+# the number of element bits stored in each array item
+WORD_BITS = 64
+WORD_MASK = (1 << WORD_BITS) - 1
+
+
+class CompactResult:
+    """
+    A lightweight view of the results at a single MIDS level of a CompactReport. It has
+    the same API as MIDSResult but the element lists are only built when accessed.
+    """
+
+    __slots__ = ("level", "_plan", "_element_bits")
+
+    def __init__(self, level: MIDSLevel, plan: Plan, element_bits: int):
+        self.level = level
+        self._plan = plan
+        self._element_bits = element_bits
+
+    @property
+    def elements(self) -> list[tuple[MIDSElement, bool]]:
+        """
+        :return: all the elements at this level in 2-tuples containing the element and a
+                 bool indicating if it was passed or not
+        """
+        return list(self)
+
+    @property
+    def passed(self) -> bool:
+        """
+        :return: True if all the elements at this level were passed, False if not
+        """
+        mask = self._plan.level_masks[self.level]
+        return self._element_bits & mask == mask
+
+    @property
+    def fails(self) -> list[MIDSElement]:
+        """
+        :return: a list of the MIDSElements failed at this level
+        """
+        return [element for element, matched in self if not matched]
+
+    @property
+    def passes(self) -> list[MIDSElement]:
+        """
+        :return: a list of the MIDSElements passed at this level
+        """
+        return [element for element, matched in self if matched]
+
+    def __iter__(self) -> Iterator[tuple[MIDSElement, bool]]:
+        for index in self._plan.level_elements[self.level]:
+            yield self._plan.elements[index], bool(self._element_bits >> index & 1)
+
+
+class CompactReport:
+    """
+    A compact form of MIDSReport which stores the record's element results as a single
+    int bitmask referencing the shared element table of a plan, rather than keeping the
+    record data and a list of results per level. It has the same level, item access and
+    iteration API as MIDSReport, with the results created lazily on access.
+    """
+
+    __slots__ = ("plan", "element_bits")
+
+    def __init__(self, plan: Plan, element_bits: int):
+        """
+        :param plan: the plan whose element table the bits refer to
+        :param element_bits: the element bitmask (see Plan.evaluate)
+        """
+        self.plan = plan
+        self.element_bits = element_bits
+
+    @property
+    def level(self) -> MIDSLevel | None:
+        """
+        :return: the MIDS level of the record or None if it doesn't meet the first level
+        """
+        return self.plan.level(self.element_bits)
+
+    def __getitem__(self, level: MIDSLevel) -> CompactResult:
+        return CompactResult(level, self.plan, self.element_bits)
+
+    def __iter__(self) -> Iterator[CompactResult]:
+        yield from map(self.__getitem__, MIDSLevel)
+
+    def to_dict(self) -> dict:
+        """
+        :return: the report as a JSON serialisable dict of the MIDS level and, for each
+                 level, whether it was passed and the names of the elements passed and
+                 failed
+        """
+        return {
+            "level": self.level,
+            "levels": {
+                result.level.name: {
+                    "passed": result.passed,
+                    "passes": [element.name for element in result.passes],
+                    "fails": [element.name for element in result.fails],
+                }
+                for result in self
+            },
+        }
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, CompactReport):
+            return NotImplemented
+        return self.plan is other.plan and self.element_bits == other.element_bits
+
+    def __repr__(self) -> str:
+        return f"CompactReport(level={self.level}, element_bits={self.element_bits:#x})"
+
+
+class CompactReports(Sequence[CompactReport]):
+    """
+    An array backed sequence of compact reports, all referencing the same plan. Each
+    report's element bitmask is stored as one or more unsigned 64-bit array items so
+    millions of reports can be held in memory, and the buffer can be viewed as a NumPy
+    array without copying (see as_numpy).
+    """
+
+    def __init__(self, plan: Plan, element_bits: Iterable[int] = ()):
+        """
+        :param plan: the plan whose element table the bits refer to
+        :param element_bits: element bitmasks to add (optional)
+        """
+        self.plan = plan
+        # the number of array items used per report
+        self.words = max(1, -(-len(plan.elements) // WORD_BITS))
+        self.bits = array("Q")
+        self.extend(element_bits)
+
+    def append(self, element_bits: int):
+        """
+        Adds a report to the end of the sequence.
+
+        :param element_bits: the element bitmask of the report (see Plan.evaluate)
+        """
+        if self.words == 1:
+            self.bits.append(element_bits)
+        else:
+            self.bits.extend(
+                element_bits >> (WORD_BITS * word) & WORD_MASK
+                for word in range(self.words)
+            )
+
+    def extend(self, element_bits: Iterable[int]):
+        """
+        Adds reports to the end of the sequence.
+
+        :param element_bits: the element bitmasks of the reports
+        """
+        if self.words == 1:
+            self.bits.extend(element_bits)
+        else:
+            for bits in element_bits:
+                self.append(bits)
+
+    def element_bits(self, index: int) -> int:
+        """
+        :param index: the index of the report
+        :return: the element bitmask of the report at the given index
+        """
+        if self.words == 1:
+            return self.bits[index]
+        if index < 0:
+            index += len(self)
+        start = index * self.words
+        return sum(
+            self.bits[start + word] << (WORD_BITS * word) for word in range(self.words)
+        )
+
+    def __len__(self) -> int:
+        return len(self.bits) // self.words
+
+    def __getitem__(self, index: int | slice) -> CompactReport | list[CompactReport]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if not -len(self) <= index < len(self):
+            raise IndexError("CompactReports index out of range")
+        return CompactReport(self.plan, self.element_bits(index))
+
+    def levels(self) -> Iterator[MIDSLevel | None]:
+        """
+        :return: a generator of the MIDS level of each report
+        """
+        for index in range(len(self)):
+            yield self.plan.level(self.element_bits(index))
+
+    def as_numpy(self):
+        """
+        Returns a NumPy view of the underlying buffer with a row per report and a column
+        per 64-bit word of element bits, least significant word first. Requires NumPy.
+
+        :return: a 2D uint64 array which shares memory with this object
+        """
+        import numpy as np
+
+        return np.frombuffer(self.bits, dtype=np.uint64).reshape(len(self), self.words)
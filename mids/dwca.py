@@ -0,0 +1,285 @@
+import csv
+import io
+import zipfile
+from dataclasses import dataclass, field
+from itertools import groupby
+from pathlib import Path
+from typing import Iterator, Iterable
+from xml.etree import ElementTree
+
+from mids.lib import MIDS
+from mids.matchers import EMPTY_VALUES
+from mids.model import MIDSLevel
+
+DWC_TEXT_NS = "{http://rs.tdwg.org/dwc/text/}"
+
+
+class DwCAError(Exception):
+    """
+    Raised when a Darwin Core Archive can't be read or joined.
+    """
+
+    pass
+
+
+@dataclass
+class ArchiveFile:
+    """
+    Represents a core or extension data file described in a Darwin Core Archive's
+    meta.xml.
+    """
+
+    # the location of the file within the archive
+    location: str
+    # the row type IRI (e.g. http://rs.tdwg.org/dwc/terms/Occurrence)
+    row_type: str
+    # the column index of the id (core) or coreid (extension) column
+    id_index: int
+    # column index -> term IRI
+    fields: dict[int, str] = field(default_factory=dict)
+    # term IRI -> default value for fields which aren't in the file
+    defaults: dict[str, str] = field(default_factory=dict)
+    delimiter: str = ","
+    quote_char: str = '"'
+    encoding: str = "utf-8"
+    ignore_header_lines: int = 0
+
+    def reader(self, archive: zipfile.ZipFile) -> Iterator[list[str]]:
+        """
+        Streams the rows of this file out of the given archive as lists of strings.
+
+        :param archive: the open archive
+        :return: a generator of rows
+        """
+        with archive.open(self.location) as raw:
+            text = io.TextIOWrapper(raw, encoding=self.encoding, newline="")
+            if self.quote_char:
+                rows = csv.reader(
+                    text, delimiter=self.delimiter, quotechar=self.quote_char
+                )
+            else:
+                rows = csv.reader(
+                    text, delimiter=self.delimiter, quoting=csv.QUOTE_NONE
+                )
+            for _ in range(self.ignore_header_lines):
+                next(rows, None)
+            # skip any blank lines
+            yield from filter(None, rows)
+
+
+def _unescape(value: str) -> str:
+    # meta.xml attributes use escape sequences for tabs and newlines
+    return value.replace("\\t", "\t").replace("\\n", "\n").replace("\\r", "\r")
+
+
+def _parse_file(element: ElementTree.Element, id_tag: str) -> ArchiveFile:
+    location = element.find(f"{DWC_TEXT_NS}files/{DWC_TEXT_NS}location")
+    id_element = element.find(f"{DWC_TEXT_NS}{id_tag}")
+    if location is None or id_element is None:
+        raise DwCAError(f"meta.xml {element.tag} is missing a location or {id_tag}")
+
+    archive_file = ArchiveFile(
+        location=location.text.strip(),
+        row_type=element.get("rowType", ""),
+        id_index=int(id_element.get("index")),
+        delimiter=_unescape(element.get("fieldsTerminatedBy", ",")),
+        quote_char=element.get("fieldsEnclosedBy", '"'),
+        encoding=element.get("encoding", "utf-8"),
+        ignore_header_lines=int(element.get("ignoreHeaderLines", "0")),
+    )
+    for field_element in element.iter(f"{DWC_TEXT_NS}field"):
+        term = field_element.get("term")
+        index = field_element.get("index")
+        if index is not None:
+            archive_file.fields[int(index)] = term
+        elif field_element.get("default"):
+            archive_file.defaults[term] = field_element.get("default")
+    return archive_file
+
+
+def read_meta(archive: zipfile.ZipFile) -> tuple[ArchiveFile, list[ArchiveFile]]:
+    """
+    Reads the meta.xml from the given archive and returns the core file and a list of
+    the extension files it describes.
+
+    :param archive: the open archive
+    :return: a 2-tuple of the core file and the extension files
+    """
+    try:
+        with archive.open("meta.xml") as f:
+            root = ElementTree.parse(f).getroot()
+    except KeyError:
+        raise DwCAError("The archive doesn't contain a meta.xml file")
+
+    core = root.find(f"{DWC_TEXT_NS}core")
+    if core is None:
+        raise DwCAError("meta.xml doesn't describe a core file")
+    extensions = [
+        _parse_file(extension, "coreid")
+        for extension in root.findall(f"{DWC_TEXT_NS}extension")
+    ]
+    return _parse_file(core, "id"), extensions
+
+
+def _columns(mids: MIDS, archive_file: ArchiveFile) -> list[tuple[int, str]]:
+    # the (index, term name) pairs of the columns in the file the mapping references
+    return [
+        (index, mids.plan.term_ids[term])
+        for index, term in sorted(archive_file.fields.items())
+        if term in mids.plan.term_ids
+    ]
+
+
+def _defaults(mids: MIDS, archive_file: ArchiveFile) -> dict[str, str]:
+    # the default values of the fields the mapping references, keyed by term name
+    return {
+        mids.plan.term_ids[term]: value
+        for term, value in archive_file.defaults.items()
+        if term in mids.plan.term_ids
+    }
+
+
+def _record(
+    row: list[str], columns: list[tuple[int, str]], defaults: dict[str, str]
+) -> dict:
+    record = dict(defaults)
+    for index, name in columns:
+        if index < len(row) and row[index] not in EMPTY_VALUES:
+            record[name] = row[index]
+    return record
+
+
+def _row_id(archive_file: ArchiveFile, row: list[str]) -> str:
+    # the id (core) or coreid (extension) of the given row
+    if archive_file.id_index >= len(row):
+        raise DwCAError(
+            f"{archive_file.location} has a row with {len(row)} columns, which is too "
+            f"short to have an id in column {archive_file.id_index}"
+        )
+    return row[archive_file.id_index]
+
+
+class _Extension:
+    """
+    Streams the rows of an extension file grouped by coreid so that they can be merge
+    joined onto the core rows.
+    """
+
+    def __init__(self, mids: MIDS, archive: zipfile.ZipFile, archive_file: ArchiveFile):
+        self.archive_file = archive_file
+        self.columns = _columns(mids, archive_file)
+        self.defaults = _defaults(mids, archive_file)
+        rows = archive_file.reader(archive)
+        self.groups = (
+            (core_id, list(group))
+            for core_id, group in groupby(rows, key=lambda r: _row_id(archive_file, r))
+        )
+        # the next group of rows to join and the group after it
+        self.current = next(self.groups, None)
+        self.following = next(self.groups, None)
+
+    def join(self, core_id: str, record: dict):
+        """
+        If the next group of extension rows belongs to the given core id, add their
+        values to the record where the record doesn't already have a value.
+
+        If the next group doesn't belong to the given core id but the group after it
+        does, the next group is either out of order or belongs to no core row at all
+        and, as it would stop every later group from being joined, a DwCAError is
+        raised before the record is used.
+
+        :param core_id: the id of the core row
+        :param record: the core row's record dict
+        """
+        if self.current is None:
+            return
+        if self.current[0] != core_id:
+            if self.following is not None and self.following[0] == core_id:
+                self._raise_unjoined()
+            # the next group belongs to a later core row
+            return
+        for row in self.current[1]:
+            for name, value in _record(row, self.columns, self.defaults).items():
+                if record.get(name, None) in EMPTY_VALUES:
+                    record[name] = value
+        self.current = self.following
+        self.following = next(self.groups, None)
+
+    def check_exhausted(self):
+        """
+        Raises a DwCAError if there are extension rows which weren't joined to a core
+        row.
+        """
+        if self.current is not None:
+            self._raise_unjoined()
+
+    def _raise_unjoined(self):
+        raise DwCAError(
+            f"Extension {self.archive_file.location} has rows for core id "
+            f"{self.current[0]} which couldn't be joined, extension rows must be in "
+            f"the same order as the core rows and belong to a core row"
+        )
+
+
+def read_dwca(mids: MIDS, path: Path | str) -> Iterator[tuple[str, dict]]:
+    """
+    Streams the records out of the given Darwin Core Archive as (id, record) pairs.
+    Each record only contains the terms referenced by the given MIDS object's mapping,
+    keyed by their term names, with the rows from any extensions joined on by core id.
+
+    The join is a streaming merge join so memory use stays flat regardless of the
+    archive's size. This requires the extension rows to be in the same order as the
+    core rows, as they are in archives produced by GBIF and the IPT. If they aren't, or
+    an extension has rows for a core id which isn't in the core file, a DwCAError is
+    raised as soon as this stops a later core row's extension rows from being joined,
+    or once the core file has been read if it doesn't.
+
+    :param mids: the MIDS object the records will be checked against
+    :param path: the path to the archive zip
+    :return: a generator of (id, record) 2-tuples
+    """
+    with zipfile.ZipFile(path) as archive:
+        core, extension_files = read_meta(archive)
+        columns = _columns(mids, core)
+        defaults = _defaults(mids, core)
+        extensions = [
+            _Extension(mids, archive, extension_file)
+            for extension_file in extension_files
+        ]
+        for row in core.reader(archive):
+            core_id = _row_id(core, row)
+            record = _record(row, columns, defaults)
+            for extension in extensions:
+                extension.join(core_id, record)
+            yield core_id, record
+
+        for extension in extensions:
+            extension.check_exhausted()
+
+
+def evaluate_dwca(mids: MIDS, path: Path | str) -> Iterator[tuple[str, int]]:
+    """
+    Streams the records out of the given Darwin Core Archive (see read_dwca) and
+    evaluates them, yielding the id and element bitmask (see Plan.evaluate) of each
+    record.
+
+    :param mids: the MIDS object to check the records against
+    :param path: the path to the archive zip
+    :return: a generator of (id, element bitmask) 2-tuples
+    """
+    plan = mids.plan
+    for core_id, record in read_dwca(mids, path):
+        yield core_id, plan.evaluate(plan.presence(record))
+
+
+def check_dwca(mids: MIDS, path: Path | str) -> Iterable[tuple[str, MIDSLevel | None]]:
+    """
+    Streams the records out of the given Darwin Core Archive and checks them against
+    MIDS, yielding the id and MIDS level of each record.
+
+    :param mids: the MIDS object to check the records against
+    :param path: the path to the archive zip
+    :return: a generator of (id, level) 2-tuples
+    """
+    for core_id, element_bits in evaluate_dwca(mids, path):
+        yield core_id, mids.plan.level(element_bits)
@@ -0,0 +1,292 @@
+import csv
+import json
+import mmap
+import random
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from statistics import NormalDist
+from typing import Iterator
+
+from mids.lib import init
+from mids.model import Discipline, MIDSLevel
+from mids.plan import Plan
+from mids.shard import ColumnSelection, DIALECTS, FileFormat, read_header
+
+# the number of records sampled between each check of the precision reached
+SAMPLE_BATCH_SIZE = 100
+
+_NON_WHITESPACE = re.compile(rb"\S")
+
+
+@dataclass
+class Proportion:
+    """
+    An estimated proportion with a symmetric confidence interval.
+    """
+
+    # the estimated proportion
+    value: float
+    # the half width of the confidence interval
+    margin: float
+
+    @property
+    def low(self) -> float:
+        """
+        :return: the lower bound of the confidence interval, clamped to 0
+        """
+        return max(0.0, self.value - self.margin)
+
+    @property
+    def high(self) -> float:
+        """
+        :return: the upper bound of the confidence interval, clamped to 1
+        """
+        return min(1.0, self.value + self.margin)
+
+    def to_dict(self) -> dict:
+        """
+        :return: the proportion and its bounds as a JSON serialisable dict
+        """
+        return {"value": self.value, "low": self.low, "high": self.high}
+
+
+@dataclass
+class MIDSEstimate:
+    """
+    Estimates the proportion of records at each final MIDS level and failing each
+    element from a weighted random sample of records.
+
+    Each sampled record has a weight, the inverse of its relative chance of having been
+    sampled, and the proportions are estimated with the ratio estimator sum(w * y) /
+    sum(w). Confidence intervals use the normal approximation of the estimator's
+    variance. Only sums are kept, so memory use doesn't grow with the sample size.
+    """
+
+    # the names of the elements in the element table
+    elements: list[str]
+    # the confidence level of the intervals
+    confidence: float = 0.95
+    # the number of records sampled
+    samples: int = 0
+    # per stratum estimates, keyed by the value of the stratifying field
+    strata: dict[str, "MIDSEstimate"] = field(default_factory=dict)
+
+    def __post_init__(self):
+        self._z = NormalDist().inv_cdf((1 + self.confidence) / 2)
+        self._weights = 0.0
+        self._squared_weights = 0.0
+        # the indicators are each final level (the first is for records not meeting
+        # the first level, like MIDSSummary.final_levels) followed by each element
+        # failing
+        self._levels = len(MIDSLevel) + 1
+        indicators = self._levels + len(self.elements)
+        self._sums = [0.0] * indicators
+        self._squared_sums = [0.0] * indicators
+
+    @classmethod
+    def for_plan(cls, plan: Plan, confidence: float = 0.95) -> "MIDSEstimate":
+        """
+        Creates an empty estimate for the element table of the given plan.
+
+        :param plan: the compiled plan
+        :param confidence: the confidence level of the intervals (default: 0.95)
+        :return: a new MIDSEstimate
+        """
+        return cls([element.name for element in plan.elements], confidence)
+
+    def add(
+        self,
+        level: MIDSLevel | None,
+        element_bits: int,
+        weight: float = 1.0,
+        stratum: str | None = None,
+    ):
+        """
+        Adds a sampled record's result to the estimate.
+
+        :param level: the record's MIDS level
+        :param element_bits: the record's element bitmask (see Plan.evaluate)
+        :param weight: the record's sampling weight (default: 1.0)
+        :param stratum: the record's stratum, if the estimate is stratified (optional)
+        """
+        self.samples += 1
+        self._weights += weight
+        squared = weight * weight
+        self._squared_weights += squared
+        indicators = [0 if level is None else level + 1]
+        for index in range(len(self.elements)):
+            if not element_bits >> index & 1:
+                indicators.append(self._levels + index)
+        for indicator in indicators:
+            self._sums[indicator] += weight
+            self._squared_sums[indicator] += squared
+        if stratum is not None:
+            estimate = self.strata.get(stratum)
+            if estimate is None:
+                estimate = self.strata[stratum] = MIDSEstimate(
+                    self.elements, self.confidence
+                )
+            estimate.add(level, element_bits, weight)
+
+    def _proportion(self, indicator: int) -> Proportion:
+        n = self.samples
+        if not n:
+            return Proportion(0.0, 1.0)
+        ratio = self._sums[indicator] / self._weights
+        if n < 2:
+            return Proportion(ratio, 1.0)
+        # sum((w * y - ratio * w) ^ 2) expanded, y is either 0 or 1
+        residuals = (
+            self._squared_sums[indicator] * (1 - 2 * ratio)
+            + ratio * ratio * self._squared_weights
+        )
+        variance = max(0.0, residuals) * n / ((n - 1) * self._weights**2)
+        return Proportion(ratio, self._z * variance**0.5)
+
+    def level(self, level: MIDSLevel | None) -> Proportion:
+        """
+        :param level: the MIDS level, or None for records not meeting the first level
+        :return: the estimated proportion of records whose final level is the level
+        """
+        return self._proportion(0 if level is None else level + 1)
+
+    def element_fails(self, index: int) -> Proportion:
+        """
+        :param index: the position of the element in the element table
+        :return: the estimated proportion of records failing the element
+        """
+        return self._proportion(self._levels + index)
+
+    @property
+    def precision(self) -> float:
+        """
+        :return: the widest confidence interval half width of the level proportions
+        """
+        return max(self.level(level).margin for level in [None, *MIDSLevel])
+
+    def to_dict(self) -> dict:
+        """
+        :return: the estimate as a JSON serialisable dict
+        """
+        return {
+            "samples": self.samples,
+            "confidence": self.confidence,
+            "levels": {
+                str(level): self.level(level).to_dict() for level in [None, *MIDSLevel]
+            },
+            "element_fails": {
+                name: self.element_fails(index).to_dict()
+                for index, name in enumerate(self.elements)
+            },
+            "strata": {
+                stratum: estimate.to_dict() for stratum, estimate in self.strata.items()
+            },
+        }
+
+
+def sample_lines(
+    path: Path, start: int = 0, seed: int | None = None
+) -> Iterator[tuple[bytes, float]]:
+    """
+    Endlessly samples lines from the given file, with replacement, by picking random
+    byte offsets and taking the line each offset is in. Blank lines are skipped.
+
+    A line's chance of being picked is proportional to its length (including its line
+    terminator), so each line is yielded with a weight of the inverse of its length
+    which can be used to correct for this (see MIDSEstimate).
+
+    Like sharding, this means CSV records containing quoted newlines are not supported.
+
+    :param path: the path to the file
+    :param start: the byte offset of the first line to sample from (default: 0)
+    :param seed: the random seed (optional)
+    :return: a generator of (line, weight) 2-tuples
+    """
+    rng = random.Random(seed)
+    with path.open("rb") as f:
+        size = f.seek(0, 2)
+        if size <= start:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if _NON_WHITESPACE.search(mm, start) is None:
+                return
+            while True:
+                offset = rng.randrange(start, size)
+                line_start = mm.rfind(b"\n", start, offset) + 1 or start
+                line_end = mm.find(b"\n", offset)
+                if line_end == -1:
+                    line_end = size
+                line = mm[line_start:line_end]
+                if line.strip():
+                    yield line.rstrip(b"\r"), 1 / (line_end - line_start + 1)
+
+
+def estimate_file(
+    path: Path,
+    file_format: FileFormat,
+    precision: float = 0.01,
+    confidence: float = 0.95,
+    stratify: str | None = None,
+    seed: int | None = None,
+    min_samples: int = 400,
+    max_samples: int = 100_000,
+    discipline: Discipline = Discipline.biology,
+) -> MIDSEstimate:
+    """
+    Estimates the distribution of MIDS levels, and the rate each element is failed at,
+    of the records in the given NDJSON, CSV or TSV file from a random sample of its
+    records, without reading the whole file. Records are sampled in batches until the
+    confidence intervals of the level proportions are all within the given precision.
+
+    If a stratifying field is given, an estimate is also made for each value of the
+    field (see MIDSEstimate.strata). The sample isn't allocated across the strata, as
+    their sizes can't be known without reading the whole file, so rarer strata get
+    fewer samples and wider intervals.
+
+    :param path: the path to the file
+    :param file_format: the format of the file
+    :param precision: the confidence interval half width to stop at (default: 0.01)
+    :param confidence: the confidence level of the intervals (default: 0.95)
+    :param stratify: the field to stratify the estimate by (optional)
+    :param seed: the random seed (optional)
+    :param min_samples: the minimum number of records to sample (default: 400)
+    :param max_samples: the maximum number of records to sample (default: 100,000)
+    :param discipline: the discipline to check against (default: biology)
+    :return: a MIDSEstimate
+    """
+    plan = init(discipline).plan
+    start = 0
+    columns = None
+    if file_format != FileFormat.ndjson:
+        header, start = read_header(path, file_format)
+        terms = plan.term_index
+        columns = ColumnSelection(
+            header,
+            tuple(
+                index
+                for index, name in enumerate(header)
+                if name in terms or name == stratify
+            ),
+        )
+
+    estimate = MIDSEstimate.for_plan(plan, confidence)
+    for line, weight in sample_lines(path, start, seed):
+        text = line.decode("utf-8")
+        if columns is None:
+            record = json.loads(text)
+        else:
+            rows = csv.reader([text], **DIALECTS[file_format])
+            record = next(columns.extract(rows))
+        element_bits = plan.evaluate(plan.presence(record))
+        stratum = None
+        if stratify is not None:
+            stratum = str(record.get(stratify) or "")
+        estimate.add(plan.level(element_bits), element_bits, weight, stratum)
+        samples = estimate.samples
+        if samples >= max_samples:
+            break
+        if samples >= min_samples and samples % SAMPLE_BATCH_SIZE == 0:
+            if estimate.precision <= precision:
+                break
+    return estimate
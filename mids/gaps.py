@@ -0,0 +1,151 @@
+from collections import Counter
+from dataclasses import dataclass
+from itertools import islice
+from pathlib import Path
+
+from mids.lib import init
+from mids.model import Discipline, MIDSLevel
+from mids.plan import Plan
+from mids.shard import file_presence, FileFormat
+
+
+@dataclass
+class Gap:
+    """
+    A set of missing terms which would lift a number of records to the next MIDS level.
+    """
+
+    # the level the records would be lifted to
+    level: MIDSLevel
+    # the names of the missing terms
+    terms: list[str]
+    # the number of records with this gap
+    records: int
+
+    def to_dict(self) -> dict:
+        """
+        :return: the gap as a JSON serialisable dict
+        """
+        return {"level": int(self.level), "terms": self.terms, "records": self.records}
+
+
+class GapAnalysis:
+    """
+    A streaming aggregation of the gaps of many records (see Plan.gap), i.e. the fewest
+    missing terms which would lift each record to its next MIDS level.
+
+    Only a count per distinct gap is kept, so memory use depends on the number of
+    distinct gaps rather than the number of records. Analyses of the same plan can be
+    merged.
+    """
+
+    def __init__(self, plan: Plan):
+        """
+        :param plan: the compiled plan
+        """
+        self.plan = plan
+        # the total number of records
+        self.total = 0
+        # the number of records already at the last level
+        self.complete = 0
+        # (next level, missing terms bitmask) -> number of records
+        self.gaps: Counter[tuple[MIDSLevel, int]] = Counter()
+
+    def add(self, presence: int, count: int = 1):
+        """
+        Adds the gap of a record with the given presence bitmask to the analysis.
+
+        :param presence: the presence bitmask
+        :param count: the number of records with this presence bitmask (default: 1)
+        """
+        self.total += count
+        gap = self.plan.gap(presence)
+        if gap is None:
+            self.complete += count
+        else:
+            self.gaps[gap] += count
+
+    def add_record(self, data: dict):
+        """
+        Adds the gap of the given record data to the analysis.
+
+        :param data: the record data
+        """
+        self.add(self.plan.presence(data))
+
+    def merge(self, other: "GapAnalysis") -> "GapAnalysis":
+        """
+        Adds the counts from the other analysis to this one.
+
+        :param other: the analysis to merge in, it must be of the same plan
+        :return: this analysis
+        """
+        self.total += other.total
+        self.complete += other.complete
+        self.gaps.update(other.gaps)
+        return self
+
+    def top(
+        self, count: int | None = None, level: MIDSLevel | None = None
+    ) -> list[Gap]:
+        """
+        Ranks the distinct gaps by the number of records which have them, i.e. by the
+        number of records filling in each set of terms would lift to the next level.
+
+        :param count: the number of gaps to return (default: None, all of them)
+        :param level: only include gaps to this level (optional)
+        :return: a list of Gaps, most common first
+        """
+        gaps = (
+            Gap(gap_level, self.plan.term_names(missing), records)
+            for (gap_level, missing), records in self.gaps.most_common()
+            if level is None or gap_level == level
+        )
+        return list(islice(gaps, count))
+
+    def term_counts(self, level: MIDSLevel | None = None) -> Counter[str]:
+        """
+        Counts the number of records whose gap includes each term.
+
+        :param level: only include gaps to this level (optional)
+        :return: a Counter of term name -> number of records
+        """
+        counts = Counter()
+        for (gap_level, missing), records in self.gaps.items():
+            if level is None or gap_level == level:
+                for term in self.plan.term_names(missing):
+                    counts[term] += records
+        return counts
+
+    def to_dict(self, count: int | None = None) -> dict:
+        """
+        :param count: the number of gaps to include (default: None, all of them)
+        :return: the analysis as a JSON serialisable dict
+        """
+        return {
+            "total": self.total,
+            "complete": self.complete,
+            "gaps": [gap.to_dict() for gap in self.top(count)],
+            "terms": dict(self.term_counts().most_common()),
+        }
+
+
+def analyse_file(
+    path: Path,
+    file_format: FileFormat,
+    discipline: Discipline = Discipline.biology,
+) -> GapAnalysis:
+    """
+    Analyses the gaps of every record in the given NDJSON, CSV or TSV file in a single
+    streaming pass.
+
+    :param path: the path to the file
+    :param file_format: the format of the file
+    :param discipline: the discipline to check against (default: biology)
+    :return: a GapAnalysis
+    """
+    plan = init(discipline).plan
+    analysis = GapAnalysis(plan)
+    for presence in file_presence(path, file_format, plan):
+        analysis.add(presence)
+    return analysis
@@ -0,0 +1,268 @@
+import asyncio
+import http.client
+import json
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Iterable
+from urllib.parse import urlencode, urlsplit
+
+# the base URL of the public GBIF API
+GBIF_API_URL = "https://api.gbif.org/v1"
+# the largest page size the occurrence search API allows
+SEARCH_PAGE_SIZE = 300
+# the response statuses which are retried with a backoff
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class GBIFError(Exception):
+    """
+    Raised when a request to the GBIF API fails even after retrying.
+    """
+
+    pass
+
+
+class GBIFClient:
+    """
+    A client for making concurrent requests to the GBIF API from asyncio code.
+
+    Requests are made on a pool of keep-alive HTTP connections, one per concurrent
+    request, each used from a dedicated thread. The number of concurrent requests is
+    capped, the request rate can optionally be limited and requests that receive a 429
+    or 5xx response, or a 200 response whose body isn't valid JSON, or fail with a
+    connection error or socket timeout, are retried with an exponential backoff.
+    """
+
+    def __init__(
+        self,
+        base_url: str = GBIF_API_URL,
+        concurrency: int = 10,
+        rate: float | None = None,
+        retries: int = 5,
+        backoff: float = 0.5,
+        timeout: float = 30,
+    ):
+        """
+        :param base_url: the base URL of the API (default: the public GBIF API)
+        :param concurrency: the maximum number of concurrent requests (default: 10)
+        :param rate: the maximum number of requests to start per second (default: None,
+                     which means no limit)
+        :param retries: the number of times to retry a request (default: 5)
+        :param backoff: the delay before the first retry in seconds, this doubles with
+                        each subsequent retry (default: 0.5)
+        :param timeout: the socket timeout in seconds (default: 30)
+        """
+        url = urlsplit(base_url)
+        self.scheme = url.scheme
+        self.host = url.netloc
+        self.base_path = url.path.rstrip("/")
+        self.concurrency = concurrency
+        self.interval = 1 / rate if rate else 0
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self._connections = queue.SimpleQueue()
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._rate_lock = asyncio.Lock()
+        self._next_start = 0.0
+
+    async def __aenter__(self) -> "GBIFClient":
+        return self
+
+    async def __aexit__(self, *args):
+        self.close()
+
+    def close(self):
+        """
+        Closes all the pooled connections and shuts down the thread pool.
+        """
+        self._executor.shutdown(wait=False)
+        while not self._connections.empty():
+            self._connections.get_nowait().close()
+
+    def _connect(self) -> http.client.HTTPConnection:
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(self.host, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, timeout=self.timeout)
+
+    def _request(self, path: str) -> tuple[int, dict, bytes]:
+        # runs in a worker thread, takes a connection from the pool and returns it once
+        # the response has been fully read so that it can be reused
+        try:
+            connection = self._connections.get_nowait()
+            reused = True
+        except queue.Empty:
+            connection = self._connect()
+            reused = False
+        try:
+            connection.request("GET", path, headers={"Accept": "application/json"})
+            response = connection.getresponse()
+            body = response.read()
+        except (http.client.HTTPException, OSError) as e:
+            connection.close()
+            if not reused or isinstance(e, TimeoutError):
+                raise
+            # the server closed an idle pooled connection, try again on a new one
+            return self._request(path)
+        if response.will_close:
+            connection.close()
+        else:
+            self._connections.put(connection)
+        return response.status, dict(response.getheaders()), body
+
+    async def _wait_for_rate(self):
+        if not self.interval:
+            return
+        async with self._rate_lock:
+            now = time.monotonic()
+            if self._next_start > now:
+                await asyncio.sleep(self._next_start - now)
+                now = self._next_start
+            self._next_start = now + self.interval
+
+    async def get(self, path: str, params: dict | None = None) -> dict | None:
+        """
+        Makes a GET request to the given path under the base URL and returns the
+        decoded JSON response. If the response is a 404, None is returned.
+
+        :param path: the path, relative to the base URL
+        :param params: optional query parameters
+        :return: the JSON response as a dict or None
+        """
+        full_path = f"{self.base_path}/{path.lstrip('/')}"
+        if params:
+            full_path = f"{full_path}?{urlencode(params, doseq=True)}"
+
+        loop = asyncio.get_running_loop()
+        for attempt in range(self.retries + 1):
+            error = None
+            async with self._semaphore:
+                await self._wait_for_rate()
+                try:
+                    status, headers, body = await loop.run_in_executor(
+                        self._executor, self._request, full_path
+                    )
+                except (http.client.HTTPException, OSError) as e:
+                    # e.g. a socket timeout, these are retried like a 5xx response
+                    status, headers, error = None, {}, e
+            if status == 200:
+                try:
+                    return json.loads(body)
+                except ValueError as e:
+                    # e.g. a truncated or non-JSON body, retried like a 5xx response
+                    error = e
+            elif status == 404:
+                return None
+            if error is None and status not in RETRY_STATUSES:
+                break
+            if attempt == self.retries:
+                break
+            delay = self.backoff * 2**attempt
+            retry_after = headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                delay = max(delay, int(retry_after))
+            await asyncio.sleep(delay)
+        if error is not None:
+            raise GBIFError(f"Request for {full_path} failed: {error!r}") from error
+        raise GBIFError(f"Request for {full_path} failed with status {status}")
+
+    async def get_occurrence(self, gbif_id: int) -> dict | None:
+        """
+        Retrieves the occurrence with the given GBIF ID.
+
+        :param gbif_id: the GBIF ID of the occurrence
+        :return: the occurrence data as a dict or None if it doesn't exist
+        """
+        return await self.get(f"occurrence/{gbif_id}")
+
+    async def get_occurrences(
+        self, gbif_ids: Iterable[int], errors: bool = False
+    ) -> AsyncIterator[tuple[int, dict | GBIFError | None]]:
+        """
+        Retrieves the occurrences with the given GBIF IDs concurrently, yielding each
+        one as soon as it arrives, so the results are not necessarily in the same order
+        as the IDs. The IDs are consumed lazily so they can come from a large stream.
+
+        :param gbif_ids: the GBIF IDs
+        :param errors: whether to yield the GBIFError of an occurrence whose request
+                       fails in place of its data and carry on, rather than raising it
+                       (default: False)
+        :return: an async generator of (GBIF ID, occurrence data, None or a GBIFError)
+                 2-tuples
+        """
+        ids = iter(gbif_ids)
+        results = asyncio.Queue(maxsize=self.concurrency * 2)
+        done = object()
+
+        async def worker():
+            try:
+                for gbif_id in ids:
+                    try:
+                        data = await self.get_occurrence(gbif_id)
+                    except GBIFError as e:
+                        if not errors:
+                            raise
+                        data = e
+                    await results.put((gbif_id, data))
+            finally:
+                await results.put(done)
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        try:
+            remaining = len(workers)
+            while remaining:
+                result = await results.get()
+                if result is done:
+                    remaining -= 1
+                else:
+                    yield result
+            # surface any errors raised by the workers
+            for task in workers:
+                task.result()
+        finally:
+            for task in workers:
+                task.cancel()
+
+    async def search_occurrences(
+        self, params: dict, offset: int = 0, limit: int = SEARCH_PAGE_SIZE
+    ) -> AsyncIterator[tuple[int, list[dict]]]:
+        """
+        Pages through the occurrence search API with the given query parameters,
+        yielding the occurrences in each page along with the offset of the next page.
+        The next page is requested as soon as the current one arrives so that it is
+        downloaded while the current page is being processed.
+
+        Note that the GBIF API doesn't allow paging beyond 100,000 records, use the
+        occurrence download API for larger surveys.
+
+        :param params: the search query parameters (e.g. {"datasetKey": "..."})
+        :param offset: the offset to start from (default: 0)
+        :param limit: the page size (default: SEARCH_PAGE_SIZE)
+        :return: an async generator of (next offset, occurrences) 2-tuples
+        """
+
+        async def fetch(page_offset: int) -> asyncio.Task:
+            page_params = {**params, "offset": page_offset, "limit": limit}
+            task = asyncio.create_task(self.get("occurrence/search", page_params))
+            # let the task run until it has handed the request to a worker thread,
+            # otherwise it wouldn't start until the consumer next awaits, which is
+            # after the current page has been processed
+            await asyncio.sleep(0)
+            return task
+
+        next_page = await fetch(offset)
+        try:
+            while next_page is not None:
+                page = await next_page
+                results = page.get("results", []) if page else []
+                offset += len(results)
+                if not results or page.get("endOfRecords", True):
+                    next_page = None
+                else:
+                    next_page = await fetch(offset)
+                yield offset, results
+        finally:
+            if next_page is not None:
+                next_page.cancel()
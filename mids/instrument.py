@@ -0,0 +1,262 @@
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from time import perf_counter
+from typing import TextIO
+
+from mids.lib import MIDS
+from mids.matchers import EMPTY_VALUES
+from mids.model import MIDSLevel
+from mids.plan import Plan
+
+# the plan methods replaced with instrumented versions while profiling
+INSTRUMENTED = ("check", "check_presence", "evaluate", "presence")
+
+
+@dataclass
+class Stats:
+    """
+    The call count, hit count and cumulative time of a profiled operation.
+    """
+
+    # the number of times the operation was called
+    calls: int = 0
+    # the number of times the operation matched or passed
+    hits: int = 0
+    # the cumulative time spent in the operation in seconds
+    time: float = 0.0
+
+    def add(self, hit: bool, elapsed: float):
+        """
+        Records a call.
+
+        :param hit: whether the call matched or passed
+        :param elapsed: the time taken by the call in seconds
+        """
+        self.calls += 1
+        self.hits += hit
+        self.time += elapsed
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        :return: the proportion of calls which matched or passed
+        """
+        return self.hits / self.calls if self.calls else 0.0
+
+    def to_dict(self) -> dict:
+        """
+        :return: the stats as a JSON serialisable dict
+        """
+        return {
+            "calls": self.calls,
+            "hits": self.hits,
+            "hit_rate": self.hit_rate,
+            "time": self.time,
+        }
+
+
+class Profiler:
+    """
+    Records call counts, hit rates and cumulative times for each matcher, element and
+    level of a plan, and for the plan's record level operations.
+
+    While started, the plan's check, check_presence, evaluate and presence methods are
+    replaced on the plan instance with instrumented versions which give the same
+    results, and when stopped the originals are restored. This means there is no
+    overhead at all when not profiling. Note that the instrumented versions are much
+    slower than the originals, so only the relative times are meaningful.
+    """
+
+    def __init__(self, plan: Plan):
+        """
+        :param plan: the compiled plan to profile
+        """
+        self.plan = plan
+        self.operations = {name: Stats() for name in INSTRUMENTED}
+        self.levels = {level: Stats() for level in MIDSLevel}
+        self.elements = [Stats() for _ in plan.elements]
+        self.matchers = [[Stats() for _ in masks] for masks in plan.element_masks]
+
+    def __enter__(self) -> "Profiler":
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self) -> "Profiler":
+        """
+        Starts profiling the plan.
+
+        :return: this profiler
+        """
+        if any(name in vars(self.plan) for name in INSTRUMENTED):
+            raise RuntimeError("The plan is already being profiled")
+        for name in INSTRUMENTED:
+            setattr(self.plan, name, getattr(self, f"_{name}"))
+        return self
+
+    def stop(self):
+        """
+        Stops profiling the plan, restoring its original methods.
+        """
+        for name in INSTRUMENTED:
+            vars(self.plan).pop(name, None)
+
+    def _match_element(self, index: int, data: dict | None, presence: int) -> bool:
+        # evaluates the element's matchers in order until one matches, like
+        # MIDSElement.match, testing either the data or the presence bitmask
+        start = perf_counter()
+        element = self.plan.elements[index]
+        masks = self.plan.element_masks[index]
+        stats = self.matchers[index]
+        hit = False
+        for position, matcher in enumerate(element.matchers):
+            matcher_start = perf_counter()
+            if data is None:
+                mask = masks[position]
+                matched = presence & mask == mask
+            else:
+                matched = all(
+                    data.get(term, None) not in EMPTY_VALUES for term in matcher.terms
+                )
+            stats[position].add(matched, perf_counter() - matcher_start)
+            if matched:
+                hit = True
+                break
+        self.elements[index].add(hit, perf_counter() - start)
+        return hit
+
+    def _pass_level(
+        self, level: MIDSLevel, data: dict | None, presence: int
+    ) -> tuple[bool, int]:
+        # evaluates every element at the level, returning whether the level passed and
+        # the element bits of the matched elements
+        start = perf_counter()
+        element_bits = 0
+        for index in self.plan.level_elements[level]:
+            if self._match_element(index, data, presence):
+                element_bits |= 1 << index
+        passed = element_bits == self.plan.level_masks[level]
+        self.levels[level].add(passed, perf_counter() - start)
+        return passed, element_bits
+
+    def _check_levels(self, data: dict | None, presence: int) -> MIDSLevel | None:
+        matched = None
+        for level in MIDSLevel:
+            passed, _ = self._pass_level(level, data, presence)
+            if not passed:
+                break
+            matched = level
+        return matched
+
+    def _check(self, data: dict) -> MIDSLevel | None:
+        start = perf_counter()
+        matched = self._check_levels(data, 0)
+        self.operations["check"].add(matched is not None, perf_counter() - start)
+        return matched
+
+    def _check_presence(self, presence: int) -> MIDSLevel | None:
+        start = perf_counter()
+        matched = self._check_levels(None, presence)
+        elapsed = perf_counter() - start
+        self.operations["check_presence"].add(matched is not None, elapsed)
+        return matched
+
+    def _evaluate(self, presence: int) -> int:
+        start = perf_counter()
+        element_bits = 0
+        for level in MIDSLevel:
+            element_bits |= self._pass_level(level, None, presence)[1]
+        self.operations["evaluate"].add(bool(element_bits), perf_counter() - start)
+        return element_bits
+
+    def _presence(
+        self, data: dict, lookups: tuple[tuple[str, int], ...] | None = None
+    ) -> int:
+        start = perf_counter()
+        presence = Plan.presence(self.plan, data, lookups)
+        self.operations["presence"].add(bool(presence), perf_counter() - start)
+        return presence
+
+    def to_dict(self) -> dict:
+        """
+        :return: the profile as a JSON serialisable dict, times are in seconds
+        """
+        return {
+            "operations": {
+                name: stats.to_dict() for name, stats in self.operations.items()
+            },
+            "levels": {
+                level.name: stats.to_dict() for level, stats in self.levels.items()
+            },
+            "elements": {
+                element.name: {
+                    **self.elements[index].to_dict(),
+                    "level": element.level.name,
+                    "matchers": [
+                        {"matcher": str(matcher), **stats.to_dict()}
+                        for matcher, stats in zip(
+                            element.matchers, self.matchers[index]
+                        )
+                    ],
+                }
+                for index, element in enumerate(self.plan.elements)
+            },
+        }
+
+    def rows(self) -> list[tuple[str, str, Stats]]:
+        """
+        :return: a (kind, name, stats) 3-tuple for every profiled operation, level,
+                 element and matcher which was called, sorted by cumulative time
+        """
+        rows = [
+            ("operation", name, stats) for name, stats in self.operations.items()
+        ] + [("level", level.name, stats) for level, stats in self.levels.items()]
+        for index, element in enumerate(self.plan.elements):
+            rows.append(("element", element.name, self.elements[index]))
+            for matcher, stats in zip(element.matchers, self.matchers[index]):
+                rows.append(("matcher", f"{element.name} {matcher}", stats))
+        rows = [row for row in rows if row[2].calls]
+        return sorted(rows, key=lambda row: row[2].time, reverse=True)
+
+    def print_table(self, file: TextIO):
+        """
+        Prints the profile as a table, sorted by cumulative time.
+
+        :param file: the file to print to
+        """
+        print(
+            f"{'kind':<10} {'calls':>10} {'hit rate':>9} {'time (ms)':>11} "
+            f"{'per call (us)':>14}  name",
+            file=file,
+        )
+        for kind, name, stats in self.rows():
+            print(
+                f"{kind:<10} {stats.calls:>10} {stats.hit_rate:>9.1%} "
+                f"{stats.time * 1000:>11.2f} {stats.time / stats.calls * 1e6:>14.2f}  "
+                f"{name}",
+                file=file,
+            )
+
+    def save(self, path: Path):
+        """
+        Writes the profile to the given path as JSON.
+
+        :param path: the path to write to
+        """
+        path.write_text(json.dumps(self.to_dict(), indent=2))
+
+
+def profile(mids: MIDS | Plan) -> Profiler:
+    """
+    Creates a profiler for the given MIDS object or plan, for use as a context manager:
+
+        with profile(mids) as profiler:
+            mids.check(data)
+        profiler.print_table(sys.stdout)
+
+    :param mids: the MIDS object or plan to profile
+    :return: a Profiler
+    """
+    return Profiler(mids.plan if isinstance(mids, MIDS) else mids)
@@ -1,12 +1,115 @@
 import csv
+import hashlib
+import json
+import os
+import tempfile
+import warnings
 from pathlib import Path
 
-import yaml
-
 from mids.model import Discipline
 
 sssom_path = Path(__file__).parent.parent / "sssom"
 
+# the version of the compiled mapping format, bump this when the format changes so that
+# existing compiled files are treated as stale
+COMPILED_VERSION = 1
+# the columns from the mapping TSV which are kept in the compiled mapping
+COMPILED_COLUMNS = (
+    "subject_id",
+    "subject_category",
+    "predicate_id",
+    "object_id",
+    "object_match_field",
+)
+
+
+def source_paths(discipline: Discipline) -> tuple[Path, Path]:
+    """
+    Returns the paths of the SSSOM TSV mapping and YML metadata files for the given
+    discipline.
+
+    :param discipline: the discipline
+    :return: a 2-tuple of the TSV path and the YML path
+    """
+    return (
+        sssom_path / f"v0.1_{discipline}.sssom.tsv",
+        sssom_path / f"v0.1_{discipline}.sssom.yml",
+    )
+
+
+def cache_dir() -> Path:
+    """
+    Returns the directory compiled mapping files are written to. This is the
+    MIDS_CACHE_DIR environment variable if it's set, otherwise a pymids directory in
+    the user's cache directory (XDG_CACHE_HOME, or ~/.cache if that isn't set). The
+    package's own directory isn't used as it may well be read only once installed.
+
+    :return: the path of the directory, which may not exist yet
+    """
+    if os.environ.get("MIDS_CACHE_DIR"):
+        return Path(os.environ["MIDS_CACHE_DIR"])
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "pymids"
+
+
+def compiled_path(discipline: Discipline) -> Path:
+    """
+    Returns the path of the compiled mapping file for the given discipline.
+
+    :param discipline: the discipline
+    :return: the path
+    """
+    return cache_dir() / f"v0.1_{discipline}.compiled.json"
+
+
+def source_hash(discipline: Discipline) -> str:
+    """
+    Returns a hash of the contents of the SSSOM source files for the given discipline.
+    This is stored in the compiled mapping so that stale compiled files can be detected.
+
+    :param discipline: the discipline
+    :return: the hex digest of the hash
+    """
+    digest = hashlib.sha256()
+    for path in source_paths(discipline):
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def find_mappings(directory: Path) -> dict[str, Path]:
+    """
+    Finds the SSSOM mapping sets in the given directory, i.e. the TSV mapping files
+    which have a YML metadata file alongside them, e.g. v0.1_biology.sssom.tsv and
+    v0.1_biology.sssom.yml.
+
+    :param directory: the directory to search
+    :return: a dict of mapping set name (e.g. v0.1_biology) -> TSV path, sorted by name
+    """
+    mappings = {}
+    for path in sorted(directory.glob("*.sssom.tsv")):
+        name = path.name.removesuffix(".sssom.tsv")
+        if path.with_name(f"{name}.sssom.yml").is_file():
+            mappings[name] = path
+    return mappings
+
+
+def read_sssom(path: Path) -> tuple[list[dict], dict[str, str]]:
+    """
+    Reads the SSSOM mapping set with the given TSV mapping file path, along with the
+    curie map from its YML metadata file.
+
+    :param path: the path of the TSV file, the YML file must be alongside it
+    :return: a 2-tuple of the mapping rows and the curie map
+    """
+    import yaml
+
+    with path.open() as f:
+        rows = list(csv.DictReader(f, dialect="excel-tab"))
+    name = path.name.removesuffix(".sssom.tsv")
+    with path.with_name(f"{name}.sssom.yml").open() as f:
+        metadata = yaml.load(f, Loader=yaml.SafeLoader)
+    return rows, metadata["curie_map"]
+
 
 def read_mapping(discipline: Discipline) -> list[dict]:
     """
@@ -15,7 +118,7 @@ def read_mapping(discipline: Discipline) -> list[dict]:
     :param discipline: the discipline to read
     :return: a list of rows as dicts from the TSV
     """
-    path = sssom_path / f"v0.1_{discipline}.sssom.tsv"
+    path, _ = source_paths(discipline)
     with path.open() as f:
         return list(csv.DictReader(f, dialect="excel-tab"))
 
@@ -27,6 +130,87 @@ def read_metadata(discipline: Discipline) -> dict:
     :param discipline: the discipline to read
     :return: a dict
     """
-    path = sssom_path / f"v0.1_{discipline}.sssom.yml"
+    # only import yaml when it's actually needed as it's slow to import and isn't needed
+    # when a compiled mapping is used
+    import yaml
+
+    _, path = source_paths(discipline)
     with path.open() as f:
         return yaml.load(f, Loader=yaml.SafeLoader)
+
+
+def compile_mapping(discipline: Discipline) -> Path:
+    """
+    Reads the SSSOM source files for the given discipline and writes the parts of them
+    needed to initialise a MIDS object to a compiled JSON mapping file, along with the
+    compiled format version and a hash of the source files.
+
+    :param discipline: the discipline to compile
+    :return: the path of the compiled mapping file
+    """
+    compiled = {
+        "version": COMPILED_VERSION,
+        "hash": source_hash(discipline),
+        "curie_map": read_metadata(discipline)["curie_map"],
+        "mapping": [
+            {column: row[column] for column in COMPILED_COLUMNS}
+            for row in read_mapping(discipline)
+        ],
+    }
+    path = compiled_path(discipline)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # write to a uniquely named temporary file and then move it into place so that
+    # concurrent readers never see a partially written file and concurrent writers
+    # don't write to the same temporary file
+    with tempfile.NamedTemporaryFile(
+        "w", dir=path.parent, prefix=f"{path.name}.", suffix=".tmp", delete=False
+    ) as f:
+        json.dump(compiled, f)
+    Path(f.name).replace(path)
+    return path
+
+
+def read_compiled(discipline: Discipline) -> dict | None:
+    """
+    Reads the compiled mapping file for the given discipline. If the file doesn't exist,
+    has a different format version or was compiled from different source files, None
+    is returned.
+
+    :param discipline: the discipline to read
+    :return: the compiled mapping as a dict or None
+    """
+    try:
+        with compiled_path(discipline).open() as f:
+            compiled = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if compiled.get("version") != COMPILED_VERSION:
+        return None
+    if compiled.get("hash") != source_hash(discipline):
+        return None
+    return compiled
+
+
+def load_mapping(discipline: Discipline) -> tuple[list[dict], dict[str, str]]:
+    """
+    Loads the mapping rows and curie map for the given discipline. The compiled mapping
+    file is used if it is up to date, otherwise it is rebuilt from the SSSOM source
+    files. If the compiled file can't be written, a warning is issued and the source
+    files are used directly.
+
+    :param discipline: the discipline to load
+    :return: a 2-tuple of the mapping rows and the curie map
+    """
+    compiled = read_compiled(discipline)
+    if compiled is None:
+        try:
+            compile_mapping(discipline)
+            compiled = read_compiled(discipline)
+        except OSError as e:
+            warnings.warn(
+                f"Couldn't write the compiled {discipline} mapping, set MIDS_CACHE_DIR "
+                f"to a writable directory to speed up loading it: {e}"
+            )
+    if compiled is None:
+        return read_mapping(discipline), read_metadata(discipline)["curie_map"]
+    return compiled["mapping"], compiled["curie_map"]
@@ -1,9 +1,13 @@
 from collections import defaultdict
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from functools import cache, cached_property
 from itertools import groupby
 from operator import itemgetter
+from pathlib import Path
+from typing import Iterable, Iterator, Mapping, Sequence, TYPE_CHECKING
 
-from mids.io import read_metadata, read_mapping
+from mids.compact import CompactReport, CompactReports
+from mids.io import load_mapping, read_sssom
 from mids.matchers import NarrowMatcher, ExactMatcher, IntersectionOfMatcher
 from mids.model import (
     CurieMap,
@@ -13,18 +17,58 @@ from mids.model import (
     MIDSResult,
     Discipline,
 )
+from mids.plan import Plan
+from mids.sql import SQLCompiler, SQLDialect
 
+if TYPE_CHECKING:
+    import numpy as np
 
+    from mids.batch import BatchReport
+
+
+@cache
 def init(discipline: Discipline) -> "MIDS":
     """
-    Initialize a MIDS object for the given discipline.
+    Initialize a MIDS object for the given discipline. The MIDS object is cached so that
+    it is only built once per discipline per process, use init.cache_clear() to force it
+    to be rebuilt.
 
     :param discipline: the discipline to initialize for
     :return: a MIDS object
     """
-    metadata = read_metadata(discipline)
-    mapping = sorted(read_mapping(discipline), key=itemgetter("subject_id"))
-    curie_map = CurieMap(metadata["curie_map"])
+    return build(discipline, *load_mapping(discipline))
+
+
+def load(path: Path, discipline: Discipline | None = None) -> "MIDS":
+    """
+    Initialize a MIDS object from the SSSOM mapping set with the given TSV mapping file
+    path, which must have its YML metadata file alongside it. Unlike init, the result
+    isn't cached.
+
+    :param path: the path of the TSV file, e.g. sssom/v0.1_biology.sssom.tsv
+    :param discipline: the discipline of the mapping set (default: None, which means
+                       it's taken from the end of the file name)
+    :return: a MIDS object
+    """
+    if discipline is None:
+        name = path.name.removesuffix(".sssom.tsv")
+        discipline = Discipline(name.rpartition("_")[2])
+    return build(discipline, *read_sssom(path))
+
+
+def build(
+    discipline: Discipline, raw_mapping: list[dict], raw_curie_map: dict[str, str]
+) -> "MIDS":
+    """
+    Builds a MIDS object from the rows and curie map of an SSSOM mapping set.
+
+    :param discipline: the discipline of the mapping set
+    :param raw_mapping: the mapping rows
+    :param raw_curie_map: the curie map
+    :return: a MIDS object
+    """
+    mapping = sorted(raw_mapping, key=itemgetter("subject_id"))
+    curie_map = CurieMap(raw_curie_map)
     levels = defaultdict(list)
 
     for subject_id, rows_iter in groupby(mapping, key=itemgetter("subject_id")):
@@ -58,6 +102,118 @@ def init(discipline: Discipline) -> "MIDS":
     return MIDS(discipline, curie_map, levels)
 
 
+# the levels in order, indexable by level number
+LEVELS = tuple(MIDSLevel)
+
+
+class LazyResult(MIDSResult):
+    """
+    A MIDSResult computed from a presence bitmask. Whether the level is passed is tested
+    against the bitmask directly (see Plan.passes_level) and the list of elements, and
+    so the fails and passes, are only built when they're first accessed.
+    """
+
+    def __init__(self, plan: Plan, level: MIDSLevel, presence: int):
+        """
+        :param plan: the compiled plan
+        :param level: the MIDS level
+        :param presence: the presence bitmask of the record, it must include every term
+                         the level's elements use
+        """
+        self.level = level
+        self._plan = plan
+        self._presence = presence
+
+    @cached_property
+    def elements(self) -> list[tuple[MIDSElement, bool]]:
+        plan = self._plan
+        presence = self._presence
+        return [
+            (plan.elements[index], plan.match_element(index, presence))
+            for index in plan.level_elements[self.level]
+        ]
+
+    @property
+    def passed(self) -> bool:
+        # testing the bitmask is cheap, cheaper than caching the result
+        return self._plan.passes_level(self.level, self._presence)
+
+    def __eq__(self, other) -> bool:
+        # equal to a MIDSResult with the same results, lazy or not
+        if isinstance(other, MIDSResult):
+            return (self.level, self.elements) == (other.level, other.elements)
+        return NotImplemented
+
+
+class LazyResults(Mapping[MIDSLevel, MIDSResult]):
+    """
+    The MIDSResult of each level for a record, each level is only evaluated when its
+    result is first accessed and the result is then kept. Like Plan.check, terms are
+    looked up level by level so accessing the results of the lower levels only looks up
+    the terms they need. This means a MIDSReport using these results stops looking up
+    terms at the first level it fails when its level is accessed. Each level's result
+    is a LazyResult, so no element lists are built unless the fails or passes of a
+    level are accessed.
+
+    As the terms are looked up on demand, the record data must not be changed until
+    every result needed has been accessed.
+    """
+
+    def __init__(
+        self,
+        plan: Plan,
+        levels: Iterable[MIDSLevel],
+        data: dict,
+        presence: int | None = None,
+    ):
+        """
+        :param plan: the compiled plan
+        :param levels: the levels in use
+        :param data: the record data
+        :param presence: the presence bitmask of the data if it's already known, in
+                         which case no terms are looked up (default: None)
+        """
+        self._plan = plan
+        self._levels = sorted(levels)
+        self._data = data
+        self._presence = 0 if presence is None else presence
+        # the number of levels, from the first level, whose terms have been looked up
+        self._looked_up = 0 if presence is None else len(MIDSLevel)
+        self._results: dict[MIDSLevel, MIDSResult] = {}
+
+    def __getitem__(self, level: MIDSLevel) -> MIDSResult:
+        result = self._results.get(level)
+        if result is None:
+            if level not in self._levels:
+                raise KeyError(level)
+            result = self._results[level] = self._evaluate(level)
+        return result
+
+    def __iter__(self) -> Iterator[MIDSLevel]:
+        return iter(self._levels)
+
+    def __len__(self) -> int:
+        return len(self._levels)
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+    @property
+    def evaluated(self) -> list[MIDSLevel]:
+        """
+        :return: the levels which have been evaluated so far
+        """
+        return list(self._results)
+
+    def _evaluate(self, level: MIDSLevel) -> MIDSResult:
+        plan = self._plan
+        while self._looked_up <= level:
+            lookups = plan.level_lookups[LEVELS[self._looked_up]]
+            self._presence |= plan.presence(self._data, lookups)
+            self._looked_up += 1
+        return LazyResult(plan, level, self._presence)
+
+
 @dataclass
 class MIDS:
     """
@@ -67,39 +223,224 @@ class MIDS:
     discipline: Discipline
     curie_map: CurieMap
     levels: dict[MIDSLevel, list[MIDSElement]]
+    # the compiled form of the levels which all the checks are run off
+    plan: Plan = field(init=False, repr=False, compare=False)
 
-    def report(self, data: dict) -> MIDSReport:
+    def __post_init__(self):
+        self.plan = Plan(self.levels)
+
+    def report(
+        self, data: dict, aliases: bool = False, lazy: bool = False
+    ) -> MIDSReport:
         """
         Checks the given record data dict against the levels and elements specified in
         this object. All levels are checked, even if earlier ones have already failed so
         that a full report is created.
 
+        If lazy is True, each level is instead only checked when its result is first
+        accessed (see LazyResults), so reading just the report's level costs about the
+        same as check. The full report can still be forced with MIDSReport.evaluate.
+
         :param data: the record data to check
+        :param aliases: whether to resolve the record's keys as term names, CURIEs or
+                        IRIs and include nested records such as GBIF media and
+                        extensions (see Plan.resolve, default: False)
+        :param lazy: whether to check each level on demand (default: False)
         :return: a report about the performance of the record against MIDS
         """
-        results = {
+        if lazy:
+            presence = self.plan.resolve(data) if aliases else None
+            return MIDSReport(data, LazyResults(self.plan, self.levels, data, presence))
+        element_bits = self.plan.evaluate(self._presence(data, aliases))
+        return MIDSReport(data, self.results(element_bits))
+
+    def compact_report(self, data: dict, aliases: bool = False) -> CompactReport:
+        """
+        Checks the given record data dict in the same way as report, but returns a
+        CompactReport which only holds the element results as a bitmask and doesn't keep
+        a reference to the data.
+
+        :param data: the record data to check
+        :param aliases: whether to resolve the record's keys (see report, default:
+                        False)
+        :return: a compact report
+        """
+        return CompactReport(
+            self.plan, self.plan.evaluate(self._presence(data, aliases))
+        )
+
+    def compact_reports(self, records: Iterable[dict]) -> CompactReports:
+        """
+        Checks all the given records and returns their compact reports in an array
+        backed CompactReports sequence.
+
+        :param records: the record data dicts to check
+        :return: the compact reports
+        """
+        plan = self.plan
+        return CompactReports(
+            plan, (plan.evaluate(plan.presence(record)) for record in records)
+        )
+
+    def dependents(self, field: str) -> list[MIDSElement]:
+        """
+        Returns the elements which depend on the given field, the levels affected by a
+        change to the field are the levels of these elements.
+
+        :param field: the field name or full term ID
+        :return: a list of MIDSElements in level order
+        """
+        affected = self.plan.affected([field])
+        return [
+            element
+            for index, element in enumerate(self.plan.elements)
+            if affected >> index & 1
+        ]
+
+    def update_report(
+        self, report: CompactReport, data: dict, changed: Iterable[str]
+    ) -> CompactReport:
+        """
+        Updates a previous compact report of a record after some of its fields have
+        changed, only re-evaluating the elements which depend on the changed fields
+        (see Plan.update). The given report isn't modified.
+
+        :param report: the compact report of the record before the change
+        :param data: the record data after the change
+        :param changed: the names or IDs of the fields which changed
+        :return: a new compact report
+        """
+        return CompactReport(
+            self.plan, self.plan.update(report.element_bits, data, changed)
+        )
+
+    def results(self, element_bits: int) -> dict[MIDSLevel, MIDSResult]:
+        """
+        Converts an element bitmask (see Plan.evaluate) into a MIDSResult for each
+        level.
+
+        :param element_bits: the element bitmask
+        :return: a dict of MIDSLevel -> MIDSResult
+        """
+        return {
             level: MIDSResult(
                 level=level,
-                elements=[(element, element.match(data)) for element in elements],
+                elements=[
+                    (self.plan.elements[index], bool(element_bits >> index & 1))
+                    for index in self.plan.level_elements[level]
+                ],
             )
-            for level, elements in self.levels.items()
+            for level in self.levels
         }
-        return MIDSReport(data, results)
 
-    def check(self, data: dict) -> MIDSLevel | None:
+    def check(self, data: dict, aliases: bool = False) -> MIDSLevel | None:
         """
         Checks the given record data dict against the levels and elements specified in
         this object, returning the MIDSLevel appropriate for the data. If the data
         doesn't meet the first MIDS level in use, None is returned.
 
         :param data: the record data to check
+        :param aliases: whether to resolve the record's keys (see report, default:
+                        False)
         :return: the MIDSLevel appropriate for the data
         """
-        matched = None
-        for level in MIDSLevel:
-            # must match all elements to meet the level
-            if all(element.match(data) for element in self.levels[level]):
-                matched = level
-            else:
-                break
-        return matched
+        if aliases:
+            return self.plan.check_presence(self.plan.resolve(data))
+        return self.plan.check(data)
+
+    def _presence(self, data: dict, aliases: bool) -> int:
+        if aliases:
+            return self.plan.resolve(data)
+        return self.plan.presence(data)
+
+    def gap(self, data: dict) -> tuple[MIDSLevel, list[str]] | None:
+        """
+        Works out the fewest missing terms which, if filled in, would lift the given
+        record data to the next MIDS level (see Plan.gap).
+
+        :param data: the record data to check
+        :return: a 2-tuple of the next MIDSLevel and the names of the missing terms, or
+                 None if the record is already at the last level
+        """
+        gap = self.plan.gap(self.plan.presence(data))
+        if gap is None:
+            return None
+        level, missing = gap
+        return level, self.plan.term_names(missing)
+
+    def to_sql(
+        self,
+        dialect: SQLDialect = SQLDialect.sqlite,
+        table: str | None = None,
+        elements: bool = False,
+        columns: Iterable[str] | None = None,
+    ) -> str:
+        """
+        Compiles the levels and elements specified in this object into SQL which
+        computes the MIDS level of the rows of a table with a column per term, treating
+        NULL and empty strings as empty. If no table is given, just the CASE expression
+        computing the level is returned, which evaluates to NULL if the first level
+        isn't met. If a table is given, a SELECT statement is returned which selects all
+        the table's columns along with the level as mids_level and, optionally, a
+        boolean column per element named element_<element name>, with every column
+        reference qualified with the table name so that a term missing from the table
+        is an error rather than silently read as a string literal by SQLite. When just
+        the expression is used, pass the table's columns if it doesn't have one for
+        every term.
+
+        :param dialect: the SQL dialect to use (default: sqlite)
+        :param table: the name of the table to select from (optional)
+        :param elements: whether to select a column per element, requires a table
+                         (default: False)
+        :param columns: the columns the table has, terms without a column are treated
+                        as always empty (default: None, which means all terms have a
+                        column)
+        :return: the SQL
+        """
+        compiler = SQLCompiler(self.plan, dialect, columns, table)
+        if table is None:
+            if elements:
+                raise ValueError("A table is required to select element columns")
+            return compiler.level_expression()
+        return compiler.select(elements)
+
+    def report_many(
+        self, records: Sequence[dict] | Mapping[str, Sequence]
+    ) -> "BatchReport":
+        """
+        Checks the given records against the levels and elements specified in this
+        object in one go using NumPy. Rather than a MIDSReport per record, a BatchReport
+        is returned which holds the element, level and final level results for all the
+        records as arrays. Requires NumPy to be installed.
+
+        :param records: the record data dicts to check, or a term table (a dict of term
+                        name -> column of values, see mids.batch.presence_matrix)
+        :return: a BatchReport
+        """
+        from mids.batch import report_many
+
+        return report_many(self.plan, records)
+
+    def check_many(
+        self, records: Sequence[dict] | Mapping[str, Sequence]
+    ) -> "np.ndarray":
+        """
+        Checks the given records against the levels and elements specified in this
+        object in one go using NumPy, returning an int8 array of the MIDS level of each
+        record. Records that don't meet the first MIDS level get a value of -1 (see
+        mids.model.NO_LEVEL) in place of None. Requires NumPy to be installed.
+
+        The records can be given as record dicts or as a term table, a dict of term
+        name -> column of values. Each term's column of a term table is tested for
+        emptiness in one go, so a table of NumPy string arrays (e.g. from a DataFrame
+        or Arrow table) is checked many times faster than calling check on each record.
+        Record dicts have to be read a record at a time, which costs about the same as
+        calling check on each (see the check_many entries of
+        benchmarks/bench_suite.py).
+
+        :param records: the record data dicts or term table to check
+        :return: an int8 array of MIDS levels
+        """
+        from mids.batch import check_many
+
+        return check_many(self.plan, records)
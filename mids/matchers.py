@@ -16,6 +16,8 @@ class ExactMatcher(Matcher):
     def __init__(self, identifier: Identifier):
         super().__init__(identifier.name)
         self.identifier = identifier
+        self.identifiers = [identifier]
+        self.terms = (identifier.name,)
 
     def __call__(self, data: dict) -> bool:
         return data.get(self.identifier.name, None) not in EMPTY_VALUES
@@ -43,6 +45,7 @@ class IntersectionOfMatcher(Matcher):
         self.identifiers = identifiers
         # cache the names we're going to look up
         self._names = [identifier.name for identifier in identifiers]
+        self.terms = tuple(self._names)
 
     def __call__(self, data: dict):
         return all(data.get(name, None) not in EMPTY_VALUES for name in self._names)
@@ -2,7 +2,7 @@ import abc
 from dataclasses import dataclass, field
 from enum import IntEnum, StrEnum, auto
 from functools import cached_property
-from typing import Iterator, Iterable
+from typing import Iterator, Iterable, Mapping
 
 
 class Discipline(StrEnum):
@@ -62,6 +62,11 @@ class MIDSLevel(IntEnum):
     mids3 = 3
 
 
+# the value used in place of a MIDSLevel to represent a record not meeting the first
+# MIDS level where levels are stored as ints (e.g. in arrays)
+NO_LEVEL = -1
+
+
 @dataclass
 class MIDSElement:
     """
@@ -100,9 +105,29 @@ class Matcher(abc.ABC):
     Abstract class representing a matcher for a specific criteria.
     """
 
+    # the identifiers of the terms that must all be present in the data for this matcher
+    # to pass and their names, subclasses must set these (there are no defaults as a
+    # matcher without terms would always pass once compiled, see Plan)
+    identifiers: list[Identifier]
+    terms: tuple[str, ...]
+
     def __init__(self, name: str):
         self.name = name
 
+    def mask(self, term_index: dict[str, int]) -> int:
+        """
+        Converts this matcher's terms into a bitmask using the given term index. Data
+        matches this matcher if all the bits in the mask are set in the data's presence
+        bitmask.
+
+        :param term_index: a dict of term names to bit positions
+        :return: the bitmask as an int
+        """
+        mask = 0
+        for term in self.terms:
+            mask |= 1 << term_index[term]
+        return mask
+
     def __str__(self) -> str:
         return f"Matcher: {self.name}"
 
@@ -169,8 +194,9 @@ class MIDSReport:
 
     # the data that was assessed
     data: dict
-    # the results that came from the checks
-    results: dict[MIDSLevel, MIDSResult]
+    # the results that came from the checks, this may be a lazily evaluated mapping (see
+    # mids.lib.LazyResults)
+    results: Mapping[MIDSLevel, MIDSResult]
 
     @property
     def level(self) -> MIDSLevel | None:
@@ -206,3 +232,14 @@ class MIDSReport:
         :return: a generator of MIDSResult objects
         """
         yield from map(self.__getitem__, MIDSLevel)
+
+    def evaluate(self) -> "MIDSReport":
+        """
+        Makes sure the results of every level have been evaluated, this only has an
+        effect on lazy reports.
+
+        :return: this report
+        """
+        for _ in self.results.values():
+            pass
+        return self
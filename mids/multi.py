@@ -0,0 +1,142 @@
+from pathlib import Path
+from typing import Iterable
+
+from mids.compact import CompactReport
+from mids.io import find_mappings
+from mids.lib import load, MIDS
+from mids.model import MIDSLevel
+from mids.plan import Plan
+from mids.summary import MIDSSummary
+
+
+class MultiMIDS:
+    """
+    Checks records against several MIDS mapping sets at once, e.g. different versions of
+    the mapping for a discipline, or different disciplines.
+
+    The term tables of the mapping sets are unioned and each mapping set is compiled
+    into a plan which uses the union's bit positions. This means a record's terms are
+    looked up once, producing a single presence bitmask, which is then evaluated by the
+    plan of every mapping set.
+    """
+
+    def __init__(self, mappings: dict[str, MIDS]):
+        """
+        :param mappings: the MIDS objects to check against, keyed by a name for each
+        """
+        if not mappings:
+            raise ValueError("At least one mapping is required")
+        # the union of the term tables, in order of first use by the mappings
+        self.terms: list[str] = list(
+            dict.fromkeys(
+                term for mids in mappings.values() for term in mids.plan.terms
+            )
+        )
+        # mapping name -> the mapping's plan compiled against the union term table
+        self.plans: dict[str, Plan] = {
+            name: Plan(mids.levels, self.terms) for name, mids in mappings.items()
+        }
+        # share the union of the alias tables between the plans so that any of them
+        # can resolve every term (see Plan.resolve)
+        aliases = {}
+        for plan in self.plans.values():
+            aliases.update(plan.aliases)
+        for plan in self.plans.values():
+            plan.aliases = aliases
+        # all the plans have the same term table so any of them can compute presence
+        self._plan = next(iter(self.plans.values()))
+
+    @classmethod
+    def from_directory(cls, directory: Path) -> "MultiMIDS":
+        """
+        Loads every SSSOM mapping set in the given directory (see
+        mids.io.find_mappings), each mapping set's discipline is taken from the end of
+        its name.
+
+        :param directory: the directory containing the mapping sets
+        :return: a MultiMIDS keyed by mapping set name, e.g. v0.1_biology
+        """
+        return cls(
+            {name: load(path) for name, path in find_mappings(directory).items()}
+        )
+
+    @property
+    def names(self) -> list[str]:
+        """
+        :return: the names of the mappings
+        """
+        return list(self.plans)
+
+    def presence(self, data: dict, aliases: bool = False) -> int:
+        """
+        Looks up the union of the mappings' terms in the given record data.
+
+        :param data: the record data
+        :param aliases: whether to resolve the record's keys as term names, CURIEs or
+                        IRIs and include nested records (see Plan.resolve, default:
+                        False)
+        :return: the presence bitmask
+        """
+        if aliases:
+            return self._plan.resolve(data)
+        return self._plan.presence(data)
+
+    def check_presence(self, presence: int) -> dict[str, MIDSLevel | None]:
+        """
+        :param presence: a presence bitmask
+        :return: a dict of mapping name -> the MIDS level of the presence bitmask
+        """
+        return {
+            name: plan.check_presence(presence) for name, plan in self.plans.items()
+        }
+
+    def check(self, data: dict, aliases: bool = False) -> dict[str, MIDSLevel | None]:
+        """
+        Checks the given record data against every mapping.
+
+        :param data: the record data
+        :param aliases: whether to resolve the record's keys (see presence, default:
+                        False)
+        :return: a dict of mapping name -> the MIDS level of the record
+        """
+        return self.check_presence(self.presence(data, aliases))
+
+    def compact_reports(
+        self, data: dict, aliases: bool = False
+    ) -> dict[str, CompactReport]:
+        """
+        Checks the given record data against every mapping, returning a full compact
+        report for each.
+
+        :param data: the record data
+        :param aliases: whether to resolve the record's keys (see presence, default:
+                        False)
+        :return: a dict of mapping name -> CompactReport
+        """
+        presence = self.presence(data, aliases)
+        return {
+            name: CompactReport(plan, plan.evaluate(presence))
+            for name, plan in self.plans.items()
+        }
+
+    def summarise(
+        self, records: Iterable[dict], aliases: bool = False
+    ) -> dict[str, MIDSSummary]:
+        """
+        Checks all the given records against every mapping, summarising the results of
+        each mapping.
+
+        :param records: the record data dicts
+        :param aliases: whether to resolve the records' keys (see presence, default:
+                        False)
+        :return: a dict of mapping name -> MIDSSummary
+        """
+        summaries = {
+            name: MIDSSummary.for_plan(plan) for name, plan in self.plans.items()
+        }
+        pairs = [(summaries[name], plan) for name, plan in self.plans.items()]
+        for data in records:
+            presence = self.presence(data, aliases)
+            for summary, plan in pairs:
+                summary.add(plan.evaluate(presence))
+        return summaries
@@ -0,0 +1,549 @@
+import hashlib
+import json
+from copy import copy
+from typing import Collection, Iterable, Sequence
+
+from mids.matchers import EMPTY_VALUES
+from mids.model import MIDSElement, MIDSLevel
+
+# the maximum number of gaps cached by a plan before the cache is cleared, see Plan.gap
+GAP_CACHE_SIZE = 100_000
+# the keys of the lists and dicts of nested records resolve descends into by default,
+# the media list and extensions dict of GBIF occurrences
+NESTED_CONTAINERS = frozenset({"media", "extensions"})
+
+
+class Plan:
+    """
+    A compiled form of the MIDS levels and their elements.
+
+    Every term referenced by any matcher is given a single bit in a deduplicated term
+    table so that each term is only looked up once per record, producing a presence
+    bitmask. Matchers, elements and levels are then all evaluated as tests against this
+    bitmask.
+    """
+
+    def __init__(
+        self,
+        levels: dict[MIDSLevel, list[MIDSElement]],
+        terms: Sequence[str] = (),
+        containers: Collection[str] = NESTED_CONTAINERS,
+    ):
+        """
+        :param levels: the elements to compile, grouped by level
+        :param terms: terms to start the term table with, plans compiled with the same
+                      starting terms give their shared terms the same bit positions so
+                      that a single presence bitmask can be evaluated by all of them
+                      (default: no terms)
+        :param containers: the keys of lists and dicts of nested records whose terms
+                           count as present in the record, see resolve (default:
+                           NESTED_CONTAINERS)
+        """
+        # the keys of the nested record containers resolve descends into
+        self.containers: frozenset[str] = frozenset(containers)
+        # the deduplicated term table, in order of first use by the levels after any
+        # given starting terms
+        self.terms: list[str] = list(dict.fromkeys(terms))
+        # term name -> bit position in a presence bitmask
+        self.term_index: dict[str, int] = {
+            term: index for index, term in enumerate(self.terms)
+        }
+        # full term ID -> term name for every term in the term table
+        self.term_ids: dict[str, str] = {}
+        # the element table, in level order, element bits use these positions
+        self.elements: list[MIDSElement] = []
+        # the element table positions of the elements at each level
+        self.level_elements: dict[MIDSLevel, list[int]] = {}
+        # the element bitmask each level must fully match to pass
+        self.level_masks: dict[MIDSLevel, int] = {}
+        # for each level, the terms which are first needed at that level as
+        # (name, bit) pairs, this means check can look up terms level by level and
+        # still only look up each term once
+        self.level_lookups: dict[MIDSLevel, tuple[tuple[str, int], ...]] = {}
+
+        needed = set()
+        for level in MIDSLevel:
+            lookups = []
+            self.level_elements[level] = []
+            self.level_masks[level] = 0
+            for element in levels.get(level, []):
+                for matcher in element.matchers:
+                    if not getattr(matcher, "terms", None):
+                        # an empty mask would match every presence bitmask
+                        raise ValueError(
+                            f"{matcher} of element {element} has no terms, matchers "
+                            f"must set their terms to be compiled"
+                        )
+                    for identifier in matcher.identifiers:
+                        self.term_ids[identifier.id] = identifier.name
+                    for term in matcher.terms:
+                        if term not in self.term_index:
+                            self.term_index[term] = len(self.terms)
+                            self.terms.append(term)
+                        if term not in needed:
+                            needed.add(term)
+                            lookups.append((term, 1 << self.term_index[term]))
+                index = len(self.elements)
+                self.elements.append(element)
+                self.level_elements[level].append(index)
+                self.level_masks[level] |= 1 << index
+            self.level_lookups[level] = tuple(lookups)
+
+        # every key a term can appear under in a record -> the term's bit, the keys are
+        # the term's name, its prefixed CURIE and its full IRI (see resolve)
+        self.aliases: dict[str, int] = {}
+        for element in self.elements:
+            for matcher in element.matchers:
+                for identifier in matcher.identifiers:
+                    bit = 1 << self.term_index[identifier.name]
+                    self.aliases[identifier.name] = bit
+                    self.aliases[f"{identifier.prefix}:{identifier.name}"] = bit
+                    self.aliases[identifier.id] = bit
+
+        self.lookups: tuple[tuple[str, int], ...] = tuple(
+            (term, 1 << index) for index, term in enumerate(self.terms)
+        )
+        # the matcher masks for each element in the element table
+        self.element_masks: list[tuple[int, ...]] = [
+            tuple(matcher.mask(self.term_index) for matcher in element.matchers)
+            for element in self.elements
+        ]
+        # term name -> a bitmask of the elements in the element table which depend on
+        # the term, this is the reverse index used to work out which elements need to
+        # be re-evaluated when fields change (see update)
+        self.term_elements: dict[str, int] = dict.fromkeys(self.terms, 0)
+        # the (name, bit) pairs of the terms each element in the element table uses
+        self.element_lookups: list[tuple[tuple[str, int], ...]] = []
+        for index, element in enumerate(self.elements):
+            terms = dict.fromkeys(
+                term for matcher in element.matchers for term in matcher.terms
+            )
+            for term in terms:
+                self.term_elements[term] |= 1 << index
+            self.element_lookups.append(
+                tuple((term, 1 << self.term_index[term]) for term in terms)
+            )
+        # each element is tested using a mask of all its single term matchers (only
+        # one bit needs to be set) and a tuple of its multi-term matcher masks (all
+        # bits need to be set)
+        self.element_tests: list[tuple[int, tuple[int, ...]]] = []
+        for masks in self.element_masks:
+            single = 0
+            multi = []
+            for mask in masks:
+                if mask.bit_count() == 1:
+                    single |= mask
+                elif mask not in multi:
+                    multi.append(mask)
+            self.element_tests.append((single, tuple(multi)))
+        self._level_tests = {
+            level: [self.element_tests[index] for index in indexes]
+            for level, indexes in self.level_elements.items()
+        }
+        # the evaluation order used by check, None means the default level by level
+        # evaluation is used (see set_order)
+        self._ordered = None
+        # the requirement structure used by gap: each level's elements are any-of their
+        # matcher masks, each of which is all-of its terms, so a level's gap only
+        # depends on the presence of the terms its elements use
+        self.level_terms: dict[MIDSLevel, int] = {}
+        for level, indexes in self.level_elements.items():
+            mask = 0
+            for index in indexes:
+                for matcher_mask in self.element_masks[index]:
+                    mask |= matcher_mask
+            self.level_terms[level] = mask
+        # (level, presence of the level's terms) -> the level's gap, see gap
+        self._gaps: dict[tuple[MIDSLevel, int], int] = {}
+        # each level (and None) -> the level after it, or None for the last level
+        levels = [None, *self.level_elements]
+        self._next_levels = dict(zip(levels, [*levels[1:], None]))
+
+    def fingerprint(self) -> str:
+        """
+        Returns a hash of the compiled structure of the plan, i.e. the term table, the
+        element table and the matchers of each element. Two plans with the same
+        fingerprint give the same results for the same presence bitmask.
+
+        :return: the hex digest of the hash
+        """
+        structure = [
+            self.terms,
+            [
+                [element.name, int(element.level), list(masks)]
+                for element, masks in zip(self.elements, self.element_masks)
+            ],
+        ]
+        return hashlib.sha256(json.dumps(structure).encode("utf-8")).hexdigest()
+
+    def presence(
+        self, data: dict, lookups: tuple[tuple[str, int], ...] | None = None
+    ) -> int:
+        """
+        Looks up the terms in the given data and returns a bitmask with a bit set for
+        each term that is present and doesn't have a value from the EMPTY_VALUES set.
+
+        :param data: the record data
+        :param lookups: the (name, bit) pairs to look up, defaults to all terms
+        :return: the presence bitmask
+        """
+        get = data.get
+        presence = 0
+        for name, bit in self.lookups if lookups is None else lookups:
+            if get(name, None) not in EMPTY_VALUES:
+                presence |= bit
+        return presence
+
+    def resolve(self, data: dict) -> int:
+        """
+        Returns the presence bitmask of the given record data like presence does, but
+        resolves the record's keys against the alias table in a single pass over the
+        record instead of looking up each term by name. This means terms can be keyed
+        by name, CURIE (e.g. dwc:catalogNumber) or full IRI, in any mix.
+
+        The lists and dicts of nested records under the plan's container keys, by
+        default the media list and extensions dict of GBIF occurrences, are resolved in
+        the same pass and any terms they contain count as present in the record, in the
+        same way as extension rows are joined onto core rows in a Darwin Core Archive.
+        Other nested values are not descended into, so unrelated structures which
+        happen to use term names (e.g. GBIF's identifiers list) don't make terms
+        present. A term whose value is itself a list or dict is present if it isn't
+        empty.
+
+        :param data: the record data
+        :return: the presence bitmask
+        """
+        aliases = self.aliases
+        containers = self.containers
+        presence = 0
+        for key, value in data.items():
+            bit = aliases.get(key)
+            if value.__class__ is str:
+                # the common case, checked first
+                if bit and value:
+                    presence |= bit
+            elif isinstance(value, (list, dict)):
+                if value:
+                    if bit:
+                        presence |= bit
+                    if key in containers:
+                        presence |= self._resolve_nested(value)
+            elif bit and value is not None:
+                presence |= bit
+        return presence
+
+    def _resolve_nested(self, value: list | dict) -> int:
+        presence = 0
+        for item in value.values() if isinstance(value, dict) else value:
+            if isinstance(item, dict):
+                presence |= self.resolve(item)
+            elif isinstance(item, list):
+                presence |= self._resolve_nested(item)
+        return presence
+
+    def match_element(self, index: int, presence: int) -> bool:
+        """
+        Tests whether the element at the given position in the element table is matched
+        by the given presence bitmask.
+
+        :param index: the position of the element in the element table
+        :param presence: a presence bitmask
+        :return: True if the element is present, False otherwise
+        """
+        single, multi = self.element_tests[index]
+        return bool(presence & single) or any(presence & m == m for m in multi)
+
+    def passes_level(self, level: MIDSLevel, presence: int) -> bool:
+        """
+        Tests whether every element of the given level is matched by the given presence
+        bitmask, without evaluating the elements of any other level.
+
+        :param level: the MIDS level
+        :param presence: a presence bitmask
+        :return: True if the level is passed, False otherwise
+        """
+        for single, multi in self._level_tests[level]:
+            if not (presence & single or any(presence & m == m for m in multi)):
+                return False
+        return True
+
+    def evaluate(self, presence: int) -> int:
+        """
+        Evaluates every element against the given presence bitmask and returns a bitmask
+        with a bit set for each element in the element table that was matched.
+
+        :param presence: a presence bitmask
+        :return: the element bitmask
+        """
+        element_bits = 0
+        for index, (single, multi) in enumerate(self.element_tests):
+            if presence & single or any(presence & m == m for m in multi):
+                element_bits |= 1 << index
+        return element_bits
+
+    def affected(self, fields: Iterable[str]) -> int:
+        """
+        Returns a bitmask of the elements in the element table which depend on any of
+        the given fields. Fields can be given as term names or full term IDs, fields
+        which aren't used by any element are ignored.
+
+        :param fields: the field names or IDs
+        :return: the element bitmask
+        """
+        affected = 0
+        for field in fields:
+            affected |= self.term_elements.get(self.term_ids.get(field, field), 0)
+        return affected
+
+    def update(self, element_bits: int, data: dict, changed: Iterable[str]) -> int:
+        """
+        Updates a previous element bitmask after the given fields of a record have
+        changed. Only the elements that depend on the changed fields are re-evaluated
+        and only the terms those elements use are looked up in the data, so the cost is
+        proportional to the number of changed fields rather than the size of the
+        mapping.
+
+        :param element_bits: the element bitmask of the record before the change
+        :param data: the record data after the change
+        :param changed: the names or IDs of the fields which changed
+        :return: the updated element bitmask
+        """
+        affected = self.affected(changed)
+        if not affected:
+            return element_bits
+        indexes = []
+        lookups = {}
+        remaining = affected
+        while remaining:
+            bit = remaining & -remaining
+            index = bit.bit_length() - 1
+            indexes.append(index)
+            lookups.update(self.element_lookups[index])
+            remaining ^= bit
+        presence = self.presence(data, tuple(lookups.items()))
+        element_bits &= ~affected
+        for index in indexes:
+            if self.match_element(index, presence):
+                element_bits |= 1 << index
+        return element_bits
+
+    def level(self, element_bits: int) -> MIDSLevel | None:
+        """
+        Returns the MIDS level achieved by the given element bitmask. If the first MIDS
+        level isn't met, None is returned.
+
+        :param element_bits: an element bitmask
+        :return: the MIDSLevel or None
+        """
+        matched = None
+        for level, mask in self.level_masks.items():
+            if element_bits & mask != mask:
+                break
+            matched = level
+        return matched
+
+    def gap(self, presence: int) -> tuple[MIDSLevel, int] | None:
+        """
+        Works out the cheapest set of missing terms which would lift a record with the
+        given presence bitmask to the next MIDS level, i.e. the fewest terms which, if
+        filled in, would make every element of the next level match.
+
+        The gap only depends on the presence of the next level's terms, so gaps are
+        cached by that and, as records tend to share a few presence patterns, most gaps
+        are a single lookup. When there's more than one cheapest set, the one returned
+        is deterministic and favours the matchers listed first in the mapping.
+
+        :param presence: a presence bitmask
+        :return: a 2-tuple of the next MIDS level and a bitmask of the missing terms, or
+                 None if the record is already at the last level
+        """
+        target = self._next_levels[self.check_presence(presence)]
+        if target is None:
+            return None
+        key = (target, presence & self.level_terms[target])
+        missing = self._gaps.get(key)
+        if missing is None:
+            if len(self._gaps) >= GAP_CACHE_SIZE:
+                self._gaps.clear()
+            missing = self._gaps[key] = self._cheapest_gap(target, key[1])
+        return target, missing
+
+    def _cheapest_gap(self, level: MIDSLevel, presence: int) -> int:
+        # each failing element can be fixed by filling in the missing terms of any of
+        # its matchers, so find the combination of matchers, one per failing element,
+        # whose missing terms have the smallest union
+        options = []
+        for index in self.level_elements[level]:
+            if self.match_element(index, presence):
+                continue
+            missing = sorted(
+                dict.fromkeys(mask & ~presence for mask in self.element_masks[index]),
+                key=int.bit_count,
+            )
+            # options which need a superset of another option's terms never help
+            minimal = []
+            for mask in missing:
+                if not any(other & mask == other for other in minimal):
+                    minimal.append(mask)
+            if minimal:
+                options.append(minimal)
+
+        # start with the greedy choice as the bound to beat, then search the rest
+        best = 0
+        for masks in options:
+            best |= min(masks, key=lambda mask: (mask & ~best).bit_count())
+
+        def search(depth: int, union: int):
+            nonlocal best
+            if union.bit_count() >= best.bit_count():
+                return
+            if depth == len(options):
+                best = union
+                return
+            for mask in options[depth]:
+                search(depth + 1, union | mask)
+
+        search(0, 0)
+        return best
+
+    def term_names(self, mask: int) -> list[str]:
+        """
+        :param mask: a bitmask of terms, e.g. a presence bitmask
+        :return: the names of the terms in the bitmask, in term table order
+        """
+        return [term for index, term in enumerate(self.terms) if mask >> index & 1]
+
+    def set_order(
+        self,
+        element_order: dict[MIDSLevel, list[int]] | None,
+        matcher_order: list[list[int]] | None = None,
+    ):
+        """
+        Sets the order check evaluates elements and matchers in. When an order is set,
+        check evaluates each level's elements one at a time in the given order, stopping
+        at the first element that fails, and each element's matchers in the given order,
+        stopping at the first matcher that matches. Terms are only looked up when a
+        matcher being evaluated needs them, so a good order (e.g. one learnt with
+        mids.adaptive) minimises the lookups needed per record. The results are the
+        same whatever the order.
+
+        :param element_order: for each level, the element table positions of the level's
+                              elements in evaluation order, or None to go back to the
+                              default evaluation
+        :param matcher_order: for each element in the element table, the positions of
+                              its matchers in evaluation order (default: the mapping
+                              order)
+        """
+        if element_order is None:
+            self._ordered = None
+            return
+        if matcher_order is None:
+            matcher_order = [list(range(len(masks))) for masks in self.element_masks]
+
+        for level in MIDSLevel:
+            if sorted(element_order.get(level, [])) != self.level_elements[level]:
+                raise ValueError(f"Invalid element order for level {level}")
+        if len(matcher_order) != len(self.elements):
+            raise ValueError("Invalid matcher order, wrong number of elements")
+        element_matchers = []
+        for index, (masks, order) in enumerate(zip(self.element_masks, matcher_order)):
+            if sorted(order) != list(range(len(masks))):
+                raise ValueError(f"Invalid matcher order for element {index}")
+            matchers = []
+            for position in order:
+                mask = masks[position]
+                # skip duplicate matchers
+                if any(mask == existing for existing, _ in matchers):
+                    continue
+                terms = self.elements[index].matchers[position].terms
+                lookups = tuple((term, 1 << self.term_index[term]) for term in terms)
+                matchers.append((mask, lookups))
+            element_matchers.append(tuple(matchers))
+
+        self._ordered = [
+            (level, [element_matchers[index] for index in element_order[level]])
+            for level in MIDSLevel
+        ]
+
+    def with_order(
+        self,
+        element_order: dict[MIDSLevel, list[int]] | None,
+        matcher_order: list[list[int]] | None = None,
+    ) -> "Plan":
+        """
+        Returns a copy of this plan with the given evaluation order set (see set_order),
+        this plan's order is left as it is. The copy shares this plan's compiled tables
+        (and gap cache), which don't depend on the order, so it's cheap to make.
+
+        :param element_order: see set_order
+        :param matcher_order: see set_order
+        :return: a new Plan
+        """
+        plan = copy(self)
+        plan.set_order(element_order, matcher_order)
+        return plan
+
+    def check_presence(self, presence: int) -> MIDSLevel | None:
+        """
+        Returns the MIDS level achieved by the given presence bitmask, stopping at the
+        first failing level.
+
+        :param presence: a presence bitmask
+        :return: the MIDSLevel or None
+        """
+        matched = None
+        for level, tests in self._level_tests.items():
+            for single, multi in tests:
+                if not (presence & single or any(presence & m == m for m in multi)):
+                    return matched
+            matched = level
+        return matched
+
+    def check(self, data: dict) -> MIDSLevel | None:
+        """
+        Checks the given record data and returns the MIDS level it achieves. Terms are
+        looked up level by level so that evaluation stops at the first failing level
+        without looking up terms only used by later levels. If an evaluation order has
+        been set with set_order, that is used instead.
+
+        :param data: the record data
+        :return: the MIDSLevel or None
+        """
+        if self._ordered is not None:
+            return self._check_ordered(data)
+        presence = 0
+        matched = None
+        for level, lookups in self.level_lookups.items():
+            if lookups:
+                presence |= self.presence(data, lookups)
+            for single, multi in self._level_tests[level]:
+                if not (presence & single or any(presence & m == m for m in multi)):
+                    return matched
+            matched = level
+        return matched
+
+    def _check_ordered(self, data: dict) -> MIDSLevel | None:
+        get = data.get
+        # the terms that have been looked up and the terms that were found present
+        known = 0
+        presence = 0
+        matched = None
+        for level, elements in self._ordered:
+            for matchers in elements:
+                for mask, lookups in matchers:
+                    for name, bit in lookups:
+                        if not known & bit:
+                            known |= bit
+                            if get(name, None) not in EMPTY_VALUES:
+                                presence |= bit
+                        if not presence & bit:
+                            # a term is missing so this matcher can't match
+                            break
+                    else:
+                        # every term is present so the element is matched
+                        break
+                else:
+                    # no matcher matched so the element, and therefore the level, failed
+                    return matched
+            matched = level
+        return matched
@@ -0,0 +1,338 @@
+import json
+import sys
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterable, Iterator
+from urllib.parse import parse_qs, urlsplit
+
+from mids.lib import init, MIDS
+from mids.model import Discipline
+
+# the number of response lines written in each chunk of a streamed batch response
+STREAM_CHUNK_LINES = 1000
+
+
+class RequestError(Exception):
+    """
+    Raised when a request can't be handled, resulting in an error response.
+    """
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class ServerMetrics:
+    """
+    Thread safe counters and request latencies of a MIDSServer. Latencies are kept for
+    the most recent requests only so memory use doesn't grow over time.
+    """
+
+    def __init__(self, window: int = 10000):
+        """
+        :param window: the number of recent request latencies to keep (default: 10000)
+        """
+        self.started = time.monotonic()
+        self.requests = Counter()
+        self.errors = 0
+        self.records = 0
+        self.latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, latency: float, records: int, errors: int):
+        """
+        Records a handled request.
+
+        :param endpoint: the endpoint path
+        :param latency: the time taken to handle the request in seconds
+        :param records: the number of records checked or reported on
+        :param errors: the number of errors the request resulted in, i.e. 1 for an
+                       error response or the number of records in a batch which
+                       couldn't be checked
+        """
+        with self._lock:
+            self.requests[endpoint] += 1
+            self.records += records
+            self.errors += errors
+            self.latencies.append(latency)
+
+    def to_dict(self) -> dict:
+        """
+        :return: the metrics as a JSON serialisable dict, latencies are in milliseconds
+        """
+        with self._lock:
+            latencies = sorted(self.latencies)
+            requests = dict(self.requests)
+            records = self.records
+            errors = self.errors
+        uptime = time.monotonic() - self.started
+
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+        return {
+            "uptime": uptime,
+            "requests": requests,
+            "errors": errors,
+            "records": records,
+            "records_per_second": records / uptime if uptime else 0.0,
+            "latency": {
+                "count": len(latencies),
+                "mean": sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+                "p99": percentile(0.99),
+                "max": latencies[-1] * 1000 if latencies else 0.0,
+            },
+        }
+
+
+class MIDSRequestHandler(BaseHTTPRequestHandler):
+    """
+    Handles requests to a MIDSServer. The endpoints are:
+
+        - GET /health
+        - GET /metrics
+        - POST /check and POST /report, the body is a single JSON record
+        - POST /check/batch and POST /report/batch, the body is either a JSON array of
+          records (with a Content-Type of application/json) or NDJSON, the response is
+          streamed as NDJSON with one line per record in the same order, a record
+          which can't be checked gets an {"error": ..., "record": n} line instead
+
+    The POST endpoints take an optional discipline query parameter.
+    """
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: "MIDSServer"
+
+    def log_message(self, *args):
+        if self.server.verbose:
+            super().log_message(*args)
+
+    def do_GET(self):
+        self._handle(self._get)
+
+    def do_POST(self):
+        self._handle(self._post)
+
+    def _handle(self, handler):
+        start = time.perf_counter()
+        endpoint = urlsplit(self.path).path
+        records = 0
+        # the number of records in a batch which couldn't be checked
+        self._errors = 0
+        error = False
+        # whether there's a request body which hasn't been read
+        self._unread = "Content-Length" in self.headers
+        try:
+            records = handler(endpoint)
+        except RequestError as e:
+            error = True
+            if self._unread:
+                # the body wasn't read so the connection can't be reused
+                self.close_connection = True
+            self._send_json(e.status, {"error": str(e)})
+        finally:
+            latency = time.perf_counter() - start
+            errors = self._errors + error
+            self.server.metrics.record(endpoint, latency, records, errors)
+
+    def _get(self, endpoint: str) -> int:
+        if endpoint == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif endpoint == "/metrics":
+            self._send_json(200, self.server.metrics.to_dict())
+        else:
+            raise RequestError(404, f"Unknown endpoint {endpoint}")
+        return 0
+
+    def _post(self, endpoint: str) -> int:
+        action, _, batch = endpoint.strip("/").partition("/")
+        if action not in ("check", "report") or batch not in ("", "batch"):
+            raise RequestError(404, f"Unknown endpoint {endpoint}")
+        mids = self._get_mids()
+
+        def respond(record: dict) -> dict:
+            try:
+                if action == "check":
+                    return {"level": mids.check(record)}
+                return mids.compact_report(record).to_dict()
+            except (TypeError, ValueError) as e:
+                # e.g. an unhashable list or dict value where a term's value should be
+                raise RequestError(400, f"The record could not be checked: {e}")
+
+        if not batch:
+            record = self._parse(self._read_body())
+            self._send_json(200, respond(record))
+            return 1
+        records = self._read_records()
+        try:
+            return self._stream(records, respond)
+        finally:
+            if hasattr(records, "close"):
+                # makes sure the rest of an NDJSON body is drained
+                records.close()
+
+    def _get_mids(self) -> MIDS:
+        query = parse_qs(urlsplit(self.path).query)
+        discipline = query.get("discipline", [Discipline.biology])[0]
+        try:
+            return self.server.mids[Discipline(discipline)]
+        except (ValueError, KeyError):
+            raise RequestError(400, f"Unknown discipline {discipline}")
+
+    def _content_length(self) -> int:
+        length = self.headers.get("Content-Length")
+        if length is None or not length.isdigit():
+            raise RequestError(411, "A Content-Length is required")
+        return int(length)
+
+    def _read_body(self) -> bytes:
+        body = self.rfile.read(self._content_length())
+        self._unread = False
+        return body
+
+    @staticmethod
+    def _parse(data: bytes) -> dict:
+        try:
+            record = json.loads(data)
+        except ValueError as e:
+            raise RequestError(400, f"Invalid JSON: {e}")
+        if not isinstance(record, dict):
+            raise RequestError(400, "Records must be JSON objects")
+        return record
+
+    def _read_records(self) -> Iterator[bytes | object]:
+        # the records are yielded unparsed (NDJSON lines) or unchecked (JSON array
+        # values) so that an invalid record only fails itself, see _stream
+        content_type = self.headers.get("Content-Type", "")
+        if content_type.split(";")[0].strip() == "application/json":
+            try:
+                records = json.loads(self._read_body())
+            except ValueError as e:
+                raise RequestError(400, f"Invalid JSON: {e}")
+            if not isinstance(records, list):
+                raise RequestError(400, "The body must be a JSON array of records")
+            return iter(records)
+        remaining = self._content_length()
+        self._unread = False
+        return self._read_ndjson(remaining)
+
+    def _check_record(self, record) -> dict:
+        if not isinstance(record, dict):
+            raise RequestError(400, "Records must be JSON objects")
+        return record
+
+    def _read_ndjson(self, remaining: int) -> Iterator[bytes]:
+        # the body is read a line at a time so large batches are never held in memory
+        try:
+            while remaining > 0:
+                line = self.rfile.readline(remaining)
+                if not line:
+                    break
+                remaining -= len(line)
+                if line.strip():
+                    yield line
+        finally:
+            # drain anything left unread so the connection can be reused
+            while remaining > 0:
+                chunk = self.rfile.read(min(remaining, 65536))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+
+    def _send_json(self, status: int, data: dict):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+    def _stream(self, records: Iterable[bytes | object], respond) -> int:
+        # each record is parsed and checked in turn, a record which fails gets an error
+        # line in its place and the rest of the batch carries on
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        count = 0
+        lines = []
+        for index, record in enumerate(records):
+            try:
+                if isinstance(record, bytes):
+                    record = self._parse(record)
+                response = respond(self._check_record(record))
+                count += 1
+            except RequestError as e:
+                response = {"error": str(e), "record": index}
+                self._errors += 1
+            lines.append(json.dumps(response))
+            if len(lines) >= STREAM_CHUNK_LINES:
+                self._write_chunk(("\n".join(lines) + "\n").encode("utf-8"))
+                lines.clear()
+        if lines:
+            self._write_chunk(("\n".join(lines) + "\n").encode("utf-8"))
+        self.wfile.write(b"0\r\n\r\n")
+        return count
+
+
+class MIDSServer(ThreadingHTTPServer):
+    """
+    A long running HTTP server for checking records against MIDS. An initialised MIDS
+    object is held for each discipline and shared by all requests, which are handled
+    concurrently in separate threads on keep-alive connections.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: tuple[str, int],
+        disciplines: Iterable[Discipline] = tuple(Discipline),
+        verbose: bool = False,
+    ):
+        """
+        :param address: the (host, port) to listen on, use port 0 for any free port
+        :param disciplines: the disciplines to serve (default: all of them)
+        :param verbose: whether to log each request to stderr (default: False)
+        """
+        self.mids = {discipline: init(discipline) for discipline in disciplines}
+        self.metrics = ServerMetrics()
+        self.verbose = verbose
+        super().__init__(address, MIDSRequestHandler)
+
+    @property
+    def url(self) -> str:
+        """
+        :return: the base URL of the server
+        """
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def serve(host: str = "127.0.0.1", port: int = 8000, verbose: bool = False):
+    """
+    Runs a MIDSServer until interrupted.
+
+    :param host: the host to listen on (default: 127.0.0.1)
+    :param port: the port to listen on (default: 8000)
+    :param verbose: whether to log each request to stderr (default: False)
+    """
+    with MIDSServer((host, port), verbose=verbose) as server:
+        print(f"Serving MIDS on {server.url}", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,580 @@
+import codecs
+import csv
+import json
+import mmap
+import re
+from array import array
+from dataclasses import dataclass
+from enum import StrEnum, auto
+from itertools import compress
+from operator import itemgetter
+from pathlib import Path
+from typing import Callable, Iterator, Iterable
+
+from mids.lib import init, MIDS
+from mids.model import Discipline, NO_LEVEL
+from mids.plan import Plan
+from mids.summary import MIDSSummary
+
+# the approximate size in bytes of the shards a file is split into when it's scored in
+# this process, results are yielded shard by shard so this bounds the memory they use
+# and how long it is before the first results are available
+IN_PROCESS_SHARD_SIZE = 1 << 22
+# the byte values bytes.isspace treats as whitespace
+WHITESPACE = frozenset(b" \t\n\r\x0b\x0c")
+
+
+class FileFormat(StrEnum):
+    """
+    Enum representing the line based file formats that can be scored in shards.
+    """
+
+    # one JSON object per line
+    ndjson = auto()
+    # a header line followed by one record per line
+    csv = auto()
+    # a tab separated header line followed by one record per line, without quoting
+    tsv = auto()
+
+
+# the csv module reader options for each delimited file format
+DIALECTS = {
+    FileFormat.csv: {},
+    FileFormat.tsv: {"delimiter": "\t", "quoting": csv.QUOTE_NONE},
+}
+
+
+@dataclass(frozen=True)
+class ColumnSelection:
+    """
+    The columns of a delimited file which are read. Wide files often have many more
+    columns than the terms a mapping references, so only the referenced columns are
+    extracted from each row, avoiding building a dict of every field per row.
+    """
+
+    # the column names in the file's header
+    header: list[str]
+    # the positions of the columns which are read, in header order
+    indexes: tuple[int, ...]
+
+    @classmethod
+    def for_plan(cls, plan: Plan, header: list[str]) -> "ColumnSelection":
+        """
+        Selects the columns whose names are terms referenced by the given plan.
+
+        :param plan: the compiled plan
+        :param header: the column names
+        :return: a ColumnSelection
+        """
+        terms = plan.term_index
+        return cls(header, tuple(i for i, name in enumerate(header) if name in terms))
+
+    @classmethod
+    def all(cls, header: list[str]) -> "ColumnSelection":
+        """
+        Selects every column.
+
+        :param header: the column names
+        :return: a ColumnSelection
+        """
+        return cls(header, tuple(range(len(header))))
+
+    @property
+    def names(self) -> list[str]:
+        """
+        :return: the names of the columns which are read
+        """
+        return [self.header[index] for index in self.indexes]
+
+    @property
+    def skipped(self) -> list[str]:
+        """
+        :return: the names of the columns which are skipped
+        """
+        read = set(self.indexes)
+        return [name for index, name in enumerate(self.header) if index not in read]
+
+    def extract(self, rows: Iterable[list[str]]) -> Iterator[dict]:
+        """
+        Converts the given rows into record dicts containing only the selected columns.
+        Rows shorter than the header are missing the fields they don't have values for.
+
+        :param rows: the rows as lists of field values
+        :return: a generator of record dicts
+        """
+        names = self.names
+        indexes = self.indexes
+        if not indexes:
+            for _ in rows:
+                yield {}
+            return
+        width = indexes[-1] + 1
+        # itemgetter only returns a tuple when given more than one index
+        if len(indexes) > 1:
+            getter = itemgetter(*indexes)
+        else:
+            getter = lambda row: (row[indexes[0]],)
+        for row in rows:
+            if len(row) >= width:
+                yield dict(zip(names, getter(row)))
+            else:
+                yield dict(zip(names, (row[i] for i in indexes if i < len(row))))
+
+
+def shard_ranges(path: Path, shards: int, start: int = 0) -> list[tuple[int, int]]:
+    """
+    Splits the given file into roughly equal byte ranges, each of which starts at the
+    beginning of a line and ends at the beginning of a line (or the end of the file).
+
+    Note that this means CSV records containing quoted newlines are not supported.
+
+    :param path: the path to the file
+    :param shards: the number of ranges to split the file into
+    :param start: the byte offset to start from (default: 0)
+    :return: a list of (start, end) byte offset 2-tuples, end is exclusive
+    """
+    size = path.stat().st_size
+    boundaries = [start]
+    with path.open("rb") as f:
+        for shard in range(1, shards):
+            offset = start + (size - start) * shard // shards
+            if offset <= boundaries[-1]:
+                continue
+            f.seek(offset - 1)
+            # read to the end of the line the offset is in, if the offset is already at
+            # the start of a line this just reads the preceding newline
+            f.readline()
+            offset = f.tell()
+            if boundaries[-1] < offset < size:
+                boundaries.append(offset)
+    boundaries.append(size)
+    return [(s, e) for s, e in zip(boundaries, boundaries[1:]) if s < e]
+
+
+def read_header(
+    path: Path, file_format: FileFormat = FileFormat.csv
+) -> tuple[list[str], int]:
+    """
+    Reads the header line of the given delimited file.
+
+    :param path: the path to the file
+    :param file_format: the format of the file (default: csv)
+    :return: a 2-tuple of the field names and the byte offset of the first record
+    """
+    with path.open("rb") as f:
+        line = f.readline().decode("utf-8").rstrip("\r\n")
+        return next(csv.reader([line], **DIALECTS[file_format]), []), f.tell()
+
+
+def read_columns(
+    path: Path, file_format: FileFormat, plan: Plan
+) -> tuple[ColumnSelection, int]:
+    """
+    Reads the header line of the given delimited file and selects the columns which are
+    referenced by the given plan.
+
+    :param path: the path to the file
+    :param file_format: the format of the file
+    :param plan: the compiled plan
+    :return: a 2-tuple of the ColumnSelection and the byte offset of the first record
+    """
+    header, start = read_header(path, file_format)
+    return ColumnSelection.for_plan(plan, header), start
+
+
+def iter_lines(path: Path, start: int, end: int) -> Iterator[bytes]:
+    """
+    Yields the lines of the given file in the byte range, skipping blank lines.
+
+    :param path: the path to the file
+    :param start: the start of the byte range, must be at the start of a line
+    :param end: the end of the byte range (exclusive)
+    :return: a generator of lines as bytes
+    """
+    with path.open("rb") as f:
+        f.seek(start)
+        position = start
+        for line in f:
+            if position >= end:
+                break
+            position += len(line)
+            if line.strip():
+                yield line
+
+
+def iter_records(
+    path: Path,
+    file_format: FileFormat,
+    start: int,
+    end: int,
+    columns: ColumnSelection | None = None,
+) -> Iterator[dict]:
+    """
+    Yields the records in the byte range of the given file as dicts.
+
+    :param path: the path to the file
+    :param file_format: the format of the file
+    :param start: the start of the byte range, must be at the start of a line
+    :param end: the end of the byte range (exclusive)
+    :param columns: the columns to read, required for delimited files
+    :return: a generator of record dicts
+    """
+    lines = iter_lines(path, start, end)
+    if file_format == FileFormat.ndjson:
+        yield from map(json.loads, lines)
+    else:
+        rows = csv.reader(codecs.iterdecode(lines, "utf-8"), **DIALECTS[file_format])
+        yield from columns.extract(rows)
+
+
+def tsv_presence(
+    plan: Plan, columns: ColumnSelection
+) -> Callable[[bytes | mmap.mmap, int, int], int]:
+    """
+    Creates a function which returns the presence bitmask (see Plan.presence) of a TSV
+    row held in a buffer, given the row's start and end offsets. The row is tested in
+    place rather than being copied and split into fields: a regex is matched against
+    the buffer as far as the last selected column, capturing just the first byte of
+    each selected field, so a field is present if its group isn't empty (one byte
+    bytes objects are cached by Python so no field values are created). Rows which are
+    too short to match are stepped through from tab to tab with find instead.
+
+    :param plan: the compiled plan
+    :param columns: the columns to read
+    :return: a function taking a buffer (e.g. bytes or a memory map), the offset of the
+             start of the row and the offset of its end (excluding the line ending) and
+             returning the row's presence bitmask
+    """
+    if not columns.indexes:
+        return lambda buffer, start, end: 0
+    # the term bit of each column up to the last selected one, 0 if it isn't selected
+    bits = [0] * (columns.indexes[-1] + 1)
+    for index, name in zip(columns.indexes, columns.names):
+        bits[index] = 1 << plan.term_index[name]
+    # the bits of the selected columns, in the same order as the regex's groups
+    group_bits = [bit for bit in bits if bit]
+    # the quantifiers are possessive so that a row which is too short fails to match
+    # straight away rather than backtracking through every way of splitting it
+    match = re.compile(
+        b"\t".join(b"([^\t]?+)[^\t]*+" if bit else b"[^\t]*+" for bit in bits)
+    ).match
+
+    def presence(buffer: bytes | mmap.mmap, start: int, end: int) -> int:
+        row = match(buffer, start, end)
+        if row is not None:
+            # each column's bit is distinct so summing them is the same as or-ing them
+            return sum(compress(group_bits, row.groups()))
+        # the row doesn't have all the selected columns
+        find = buffer.find
+        result = 0
+        position = start
+        for bit in bits:
+            field_end = find(b"\t", position, end)
+            if field_end == -1:
+                if end > position:
+                    result |= bit
+                break
+            if field_end > position:
+                result |= bit
+            position = field_end + 1
+        return result
+
+    return presence
+
+
+def scan_presence(
+    path: Path, plan: Plan, columns: ColumnSelection, start: int, end: int
+) -> Iterator[int]:
+    """
+    Scans the rows of the given TSV file in the byte range and yields each row's
+    presence bitmask (see Plan.presence), without decoding or copying the rows or
+    building record dicts. The file is memory mapped and each row is tested in place
+    with tsv_presence. Blank lines are skipped.
+
+    As TSV files are unquoted, this gives the same results as reading the rows with
+    iter_records and passing them to Plan.presence.
+
+    :param path: the path to the TSV file
+    :param plan: the compiled plan
+    :param columns: the columns to read
+    :param start: the start of the byte range, must be at the start of a line
+    :param end: the end of the byte range (exclusive)
+    :return: a generator of presence bitmasks
+    """
+    if start >= end:
+        return
+    presence = tsv_presence(plan, columns)
+    with path.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        find = mm.find
+        position = start
+        while position < end:
+            line_start = position
+            line_end = find(b"\n", position, end)
+            if line_end == -1:
+                line_end = end
+            position = line_end + 1
+            if line_end > line_start and mm[line_end - 1] == 13:
+                line_end -= 1
+            # only lines starting with whitespace (including a tab) can be blank, which
+            # is rare so only they are copied to check
+            if line_end == line_start or (
+                mm[line_start] in WHITESPACE and mm[line_start:line_end].isspace()
+            ):
+                continue
+            yield presence(mm, line_start, line_end)
+
+
+def iter_presence(
+    path: Path,
+    file_format: FileFormat,
+    start: int,
+    end: int,
+    columns: ColumnSelection | None,
+    plan: Plan,
+) -> Iterator[int]:
+    """
+    Yields the presence bitmask of each record in the byte range of the given file. TSV
+    files are scanned with scan_presence, other formats are read with iter_records.
+
+    :param path: the path to the file
+    :param file_format: the format of the file
+    :param start: the start of the byte range, must be at the start of a line
+    :param end: the end of the byte range (exclusive)
+    :param columns: the columns to read, required for delimited files
+    :param plan: the compiled plan
+    :return: a generator of presence bitmasks
+    """
+    if file_format == FileFormat.tsv:
+        yield from scan_presence(path, plan, columns, start, end)
+    else:
+        for record in iter_records(path, file_format, start, end, columns):
+            yield plan.presence(record)
+
+
+def file_presence(path: Path, file_format: FileFormat, plan: Plan) -> Iterator[int]:
+    """
+    Yields the presence bitmask of every record in the given NDJSON, CSV or TSV file, in
+    file order, in this process.
+
+    :param path: the path to the file
+    :param file_format: the format of the file
+    :param plan: the compiled plan
+    :return: a generator of presence bitmasks
+    """
+    columns = None
+    start = 0
+    if file_format in DIALECTS:
+        columns, start = read_columns(path, file_format, plan)
+    yield from iter_presence(
+        path, file_format, start, path.stat().st_size, columns, plan
+    )
+
+
+def line_presence(
+    file_format: FileFormat, plan: Plan, columns: ColumnSelection | None = None
+) -> Callable[[bytes], int]:
+    """
+    Creates a function which returns the presence bitmask of a single line of a file of
+    the given format, for when lines are read individually rather than in a range (see
+    mids.cache.ResultCache). TSV lines are scanned as raw bytes with tsv_presence.
+
+    :param file_format: the format of the file
+    :param plan: the compiled plan
+    :param columns: the columns to read, required for delimited files
+    :return: a function taking a line as bytes and returning its presence bitmask
+    """
+    if file_format == FileFormat.ndjson:
+        return lambda line: plan.presence(json.loads(line))
+
+    if file_format == FileFormat.tsv:
+        tsv = tsv_presence(plan, columns)
+
+        def presence(line: bytes) -> int:
+            end = len(line)
+            while end and line[end - 1] in b"\r\n":
+                end -= 1
+            return tsv(line, 0, end)
+
+        return presence
+
+    dialect = DIALECTS[file_format]
+
+    def presence(line: bytes) -> int:
+        rows = csv.reader([line.decode("utf-8")], **dialect)
+        return plan.presence(next(columns.extract(rows)))
+
+    return presence
+
+
+# the MIDS object used by the current worker process, this is created once per process
+# by the pool's initializer
+_worker_mids: MIDS | None = None
+
+
+def _init_worker(discipline: Discipline):
+    global _worker_mids
+    _worker_mids = init(discipline)
+
+
+def _get_mids(discipline: Discipline) -> MIDS:
+    if _worker_mids is None:
+        _init_worker(discipline)
+    return _worker_mids
+
+
+def _check_shard(
+    path: Path,
+    file_format: FileFormat,
+    columns: ColumnSelection | None,
+    discipline: Discipline,
+    shard: tuple[int, int],
+) -> array:
+    # the levels are returned as a compact array of codes to keep the pickled results
+    # small
+    mids = _get_mids(discipline)
+    levels = array("b")
+    if file_format == FileFormat.tsv:
+        plan = mids.plan
+        for presence in scan_presence(path, plan, columns, *shard):
+            level = plan.check_presence(presence)
+            levels.append(NO_LEVEL if level is None else level)
+    else:
+        for record in iter_records(path, file_format, *shard, columns):
+            level = mids.check(record)
+            levels.append(NO_LEVEL if level is None else level)
+    return levels
+
+
+def _summarise_shard(
+    path: Path,
+    file_format: FileFormat,
+    columns: ColumnSelection | None,
+    discipline: Discipline,
+    shard: tuple[int, int],
+) -> MIDSSummary:
+    # only a summary of the shard's results is returned
+    plan = _get_mids(discipline).plan
+    summary = MIDSSummary.for_plan(plan)
+    for presence in iter_presence(path, file_format, *shard, columns, plan):
+        summary.add(plan.evaluate(presence))
+    return summary
+
+
+def _report_shard(
+    path: Path,
+    file_format: FileFormat,
+    columns: ColumnSelection | None,
+    discipline: Discipline,
+    shard: tuple[int, int],
+) -> list[int]:
+    # the reports are returned as element bitmasks (see Plan.evaluate) to keep the
+    # pickled results small
+    plan = _get_mids(discipline).plan
+    return [
+        plan.evaluate(presence)
+        for presence in iter_presence(path, file_format, *shard, columns, plan)
+    ]
+
+
+def _run(
+    func,
+    path: Path,
+    file_format: FileFormat,
+    workers: int,
+    discipline: Discipline,
+) -> Iterable:
+    columns = None
+    start = 0
+    if file_format in DIALECTS:
+        columns, start = read_columns(path, file_format, init(discipline).plan)
+
+    if workers <= 1:
+        # score the file in this process in shards so that results stream out
+        shards = max(1, (path.stat().st_size - start) // IN_PROCESS_SHARD_SIZE)
+        for shard in shard_ranges(path, shards, start):
+            yield func(path, file_format, columns, discipline, shard)
+        return
+
+    # imported here as the process pool's dependencies are slow to import
+    from concurrent.futures import ProcessPoolExecutor
+
+    # use a few shards per worker so that uneven shards balance out
+    shards = shard_ranges(path, workers * 4, start)
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(discipline,)
+    ) as executor:
+        yield from executor.map(
+            func,
+            *zip(
+                *((path, file_format, columns, discipline, shard) for shard in shards)
+            ),
+        )
+
+
+def check_file(
+    path: Path,
+    file_format: FileFormat,
+    workers: int = 1,
+    discipline: Discipline = Discipline.biology,
+) -> Iterator[int]:
+    """
+    Checks every record in the given NDJSON, CSV or TSV file against MIDS, splitting the
+    file into byte range shards which are scored by a pool of worker processes. Each
+    worker reads its shards straight from the file so records are never pickled between
+    processes. Only the columns of delimited files that the mapping references are read
+    (see ColumnSelection) and TSV files are scanned as raw bytes (see scan_presence).
+    The results are yielded in file order.
+
+    :param path: the path to the file
+    :param file_format: the format of the file
+    :param workers: the number of worker processes to use (default: 1, which means the
+                    file is scored in this process)
+    :param discipline: the discipline to check against (default: biology)
+    :return: a generator of MIDS level ints, NO_LEVEL for no level
+    """
+    for levels in _run(_check_shard, path, file_format, workers, discipline):
+        yield from levels
+
+
+def summarise_file(
+    path: Path,
+    file_format: FileFormat,
+    workers: int = 1,
+    discipline: Discipline = Discipline.biology,
+) -> MIDSSummary:
+    """
+    Checks every record in the given NDJSON, CSV or TSV file against MIDS in the same
+    way as check_file, but returns a summary of the results instead. Each worker
+    summarises its shards and the summaries are merged.
+
+    :param path: the path to the file
+    :param file_format: the format of the file
+    :param workers: the number of worker processes to use (default: 1)
+    :param discipline: the discipline to check against (default: biology)
+    :return: a MIDSSummary
+    """
+    summary = MIDSSummary.for_plan(init(discipline).plan)
+    for shard_summary in _run(_summarise_shard, path, file_format, workers, discipline):
+        summary.merge(shard_summary)
+    return summary
+
+
+def report_file(
+    path: Path,
+    file_format: FileFormat,
+    workers: int = 1,
+    discipline: Discipline = Discipline.biology,
+) -> Iterator[int]:
+    """
+    Reports on every record in the given NDJSON, CSV or TSV file in the same way as
+    check_file, yielding each record's element bitmask in file order. The bits refer to
+    the positions of the elements in the element table of the discipline's plan.
+
+    :param path: the path to the file
+    :param file_format: the format of the file
+    :param workers: the number of worker processes to use (default: 1)
+    :param discipline: the discipline to check against (default: biology)
+    :return: a generator of element bitmasks
+    """
+    for element_bits in _run(_report_shard, path, file_format, workers, discipline):
+        yield from element_bits
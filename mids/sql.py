@@ -0,0 +1,146 @@
+from enum import StrEnum, auto
+from typing import Iterable
+
+from mids.model import MIDSLevel
+from mids.plan import Plan
+
+# the name of the column the MIDS level is selected as
+LEVEL_COLUMN = "mids_level"
+# the prefix of the names of the columns each element's result is selected as, without
+# it some element names (e.g. License) would clash with term columns (e.g. license) as
+# SQL identifiers are case insensitive
+ELEMENT_COLUMN_PREFIX = "element_"
+
+
+class SQLDialect(StrEnum):
+    """
+    Enum representing the SQL dialects the mapping can be compiled to.
+    """
+
+    sqlite = auto()
+    postgresql = auto()
+
+
+def quote(name: str) -> str:
+    """
+    Quotes the given identifier.
+
+    :param name: the identifier, e.g. a column name
+    :return: the quoted identifier
+    """
+    escaped = name.replace('"', '""')
+    return f'"{escaped}"'
+
+
+class SQLCompiler:
+    """
+    Compiles a plan into SQL expressions which compute the MIDS level, and each
+    element's result, from a table with a column per term. Like the EMPTY_VALUES set,
+    both NULL and empty strings are treated as empty.
+
+    If a table is given, column references are qualified with it (e.g.
+    "occ"."catalogNumber"). SQLite treats an unknown double quoted identifier as a
+    string literal, so without qualification a term missing from the table would read
+    as a non-empty string and always be present, qualified it's an error instead.
+    """
+
+    def __init__(
+        self,
+        plan: Plan,
+        dialect: SQLDialect = SQLDialect.sqlite,
+        columns: Iterable[str] | None = None,
+        table: str | None = None,
+    ):
+        """
+        :param plan: the compiled plan
+        :param dialect: the SQL dialect to use (default: sqlite)
+        :param columns: the columns the table has, terms without a column are treated
+                        as always empty (default: None, which means there's a column
+                        for every term)
+        :param table: the name of the table the columns are in, required by select
+                      (optional)
+        """
+        self.plan = plan
+        self.dialect = SQLDialect(dialect)
+        self.columns = None if columns is None else set(columns)
+        self.table = table
+        if self.dialect == SQLDialect.sqlite:
+            self.true, self.false = "1", "0"
+        else:
+            self.true, self.false = "TRUE", "FALSE"
+
+    def present(self, term: str) -> str:
+        """
+        :param term: the term name
+        :return: an expression testing whether the term's column isn't empty
+        """
+        if self.columns is not None and term not in self.columns:
+            return self.false
+        column = quote(term)
+        if self.table is not None:
+            column = f"{quote(self.table)}.{column}"
+        if self.dialect == SQLDialect.postgresql:
+            # compare as text so that non-text columns can be tested too
+            return f"({column} IS NOT NULL AND {column}::text <> '')"
+        return f"({column} IS NOT NULL AND {column} <> '')"
+
+    def element(self, index: int) -> str:
+        """
+        :param index: the position of the element in the element table
+        :return: an expression testing whether the element is matched
+        """
+        matchers = []
+        for matcher in self.plan.elements[index].matchers:
+            terms = [self.present(term) for term in dict.fromkeys(matcher.terms)]
+            if self.false in terms:
+                continue
+            expression = " AND ".join(terms) if terms else self.true
+            if len(terms) > 1:
+                expression = f"({expression})"
+            if expression not in matchers:
+                matchers.append(expression)
+        if not matchers:
+            return self.false
+        if len(matchers) == 1:
+            return matchers[0]
+        return f"({' OR '.join(matchers)})"
+
+    def level(self, level: MIDSLevel) -> str:
+        """
+        :param level: the MIDS level
+        :return: an expression testing whether all of the level's elements are matched
+        """
+        elements = [self.element(index) for index in self.plan.level_elements[level]]
+        if not elements:
+            return self.true
+        return " AND ".join(elements)
+
+    def level_expression(self) -> str:
+        """
+        :return: a CASE expression computing the MIDS level, NULL if the first level
+                 isn't met
+        """
+        cases = []
+        previous = "NULL"
+        for level in MIDSLevel:
+            cases.append(f"  WHEN NOT ({self.level(level)}) THEN {previous}")
+            previous = str(int(level))
+        return "\n".join(["CASE", *cases, f"  ELSE {previous}", "END"])
+
+    def select(self, elements: bool = False) -> str:
+        """
+        :param elements: whether to select a boolean column per element too, named
+                         after the element with the ELEMENT_COLUMN_PREFIX (default:
+                         False)
+        :return: a SELECT statement which selects all of the table's columns along
+                 with the MIDS level (and the element columns)
+        """
+        if self.table is None:
+            raise ValueError("A table is required to select from")
+        expressions = [f"{self.level_expression()} AS {quote(LEVEL_COLUMN)}"]
+        if elements:
+            for index, element in enumerate(self.plan.elements):
+                column = quote(f"{ELEMENT_COLUMN_PREFIX}{element.name}")
+                expressions.append(f"{self.element(index)} AS {column}")
+        select_list = ",\n".join(["*", *expressions])
+        return f"SELECT\n{select_list}\nFROM {quote(self.table)}"
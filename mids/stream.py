@@ -0,0 +1,296 @@
+import csv
+import json
+import re
+from enum import StrEnum, auto
+from typing import Iterator, TextIO
+
+from mids.model import MIDSLevel
+from mids.plan import Plan
+from mids.shard import ColumnSelection, DIALECTS, FileFormat
+from mids.summary import MIDSSummary
+
+# the number of characters read from a stream at a time when reading a JSON array
+READ_CHUNK_SIZE = 65536
+# the default maximum number of characters in a single value of a JSON array
+MAX_VALUE_SIZE = 1 << 26
+# the number of characters from the end of what's been read within which a JSON value
+# may just be cut short rather than be invalid (or complete, for a number)
+_CUT_MARGIN = 16
+# the number of characters of output buffered before they're written
+WRITE_BUFFER_SIZE = 1 << 20
+
+_NON_WHITESPACE = re.compile(r"\S")
+
+
+class OutputFormat(StrEnum):
+    """
+    Enum representing the formats the results of a stream of records can be written in.
+    """
+
+    # one JSON object per record
+    ndjson = auto()
+    # a header line followed by one line per record
+    csv = auto()
+
+
+def iter_json_array(
+    f: TextIO, chunk_size: int = READ_CHUNK_SIZE, max_value_size: int = MAX_VALUE_SIZE
+) -> Iterator:
+    """
+    Yields the values of the JSON array in the given text stream one at a time, reading
+    the stream in chunks so that the whole array is never held in memory, at most a
+    value (up to twice over) and a chunk are.
+
+    When a value runs past what's been read, at least as much again as the value so far
+    is read before decoding it again, so each value is decoded a logarithmic rather
+    than linear number of times. A value which is invalid before the end of what's
+    been read is rejected straight away, without reading any more of it.
+
+    :param f: the text stream
+    :param chunk_size: the number of characters to read at a time (default:
+                       READ_CHUNK_SIZE)
+    :param max_value_size: the maximum number of characters a value can have, a
+                           ValueError is raised for longer values (default:
+                           MAX_VALUE_SIZE)
+    :return: a generator of the array's values
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    # whether the whole stream has been read
+    exhausted = False
+    # what's expected next: the opening bracket, a value (or the closing bracket if
+    # the array is empty), a value, or a separator
+    state = "start"
+    while True:
+        match = _NON_WHITESPACE.search(buffer, position)
+        if match is None:
+            buffer = f.read(chunk_size)
+            position = 0
+            if not buffer:
+                raise ValueError("Unexpected end of JSON array")
+            continue
+        position = match.start()
+        char = buffer[position]
+        if state == "start":
+            if char != "[":
+                raise ValueError("Expected a JSON array")
+            position += 1
+            state = "first"
+        elif state == "separator" or (state == "first" and char == "]"):
+            if char == "]":
+                return
+            if char != ",":
+                raise ValueError(f"Expected , or ] in JSON array, found {char}")
+            position += 1
+            state = "value"
+        else:
+            try:
+                value, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError as e:
+                # the value may just be cut short by the end of the buffer, unless the
+                # error is before it, in which case no amount of reading will help
+                cut = e.pos >= len(buffer) - _CUT_MARGIN or e.msg.startswith(
+                    "Unterminated string"
+                )
+                if exhausted or not cut:
+                    raise
+            else:
+                # a number (or literal) which ends near the end of the buffer may carry
+                # on in what hasn't been read yet
+                cut = (
+                    not exhausted
+                    and len(buffer) - end < _CUT_MARGIN
+                    and not isinstance(value, (dict, list, str))
+                )
+            if cut:
+                pending = len(buffer) - position
+                if pending > max_value_size:
+                    raise ValueError(
+                        f"JSON array value longer than {max_value_size} characters"
+                    )
+                chunk = f.read(max(chunk_size, pending))
+                exhausted = not chunk
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+            position = end
+            yield value
+            state = "separator"
+
+
+def iter_stream(
+    f: TextIO,
+    file_format: str,
+    plan: Plan,
+    id_field: str | None = None,
+    aliases: bool = False,
+) -> Iterator[dict]:
+    """
+    Yields the records in the given text stream as dicts, one at a time.
+
+    :param f: the text stream
+    :param file_format: json for a JSON array of records, or a FileFormat
+    :param plan: the compiled plan, only the columns of a CSV or TSV stream which are
+                 terms referenced by the plan (and the ID field) are read
+    :param id_field: the field records are identified by (optional)
+    :param aliases: whether the record keys will be resolved as term names, CURIEs or
+                    IRIs, in which case every column of a CSV or TSV stream is read
+                    (default: False)
+    :return: a generator of record dicts
+    """
+    if file_format == "json" or file_format == FileFormat.ndjson:
+        if file_format == "json":
+            records = iter_json_array(f)
+        else:
+            records = (json.loads(line) for line in f if line.strip())
+        for record in records:
+            if not isinstance(record, dict):
+                raise ValueError("Records must be JSON objects")
+            yield record
+    else:
+        rows = csv.reader(f, **DIALECTS[FileFormat(file_format)])
+        header = next(rows, [])
+        if aliases:
+            columns = ColumnSelection.all(header)
+        else:
+            terms = plan.term_index
+            columns = ColumnSelection(
+                header,
+                tuple(
+                    index
+                    for index, name in enumerate(header)
+                    if name in terms or name == id_field
+                ),
+            )
+        yield from columns.extract(rows)
+
+
+class ResultWriter:
+    """
+    Writes the MIDS level, and optionally the failing elements, of each record in a
+    stream to a text stream as either NDJSON or CSV. Output is buffered and written in
+    large chunks.
+    """
+
+    def __init__(
+        self,
+        f: TextIO,
+        output_format: OutputFormat,
+        fails: bool = False,
+        buffer_size: int = WRITE_BUFFER_SIZE,
+    ):
+        """
+        :param f: the text stream to write to
+        :param output_format: the format to write
+        :param fails: whether to write the names of the elements each record fails
+                      (default: False)
+        :param buffer_size: the number of characters to buffer before writing them
+                            (default: WRITE_BUFFER_SIZE)
+        """
+        self.f = f
+        self.output_format = OutputFormat(output_format)
+        self.fails = fails
+        self.buffer_size = buffer_size
+        self._parts = []
+        self._size = 0
+        self._csv = None
+        if self.output_format == OutputFormat.csv:
+            self._csv = csv.writer(self, lineterminator="\n")
+            self._csv.writerow(["id", "level", "fails"] if fails else ["id", "level"])
+
+    def __enter__(self) -> "ResultWriter":
+        return self
+
+    def __exit__(self, *args):
+        self.flush()
+
+    def write(self, text: str):
+        """
+        Adds the given text to the buffer, writing the buffer out if it's full.
+
+        :param text: the text
+        """
+        self._parts.append(text)
+        self._size += len(text)
+        if self._size >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes out the buffer.
+        """
+        if self._parts:
+            self.f.write("".join(self._parts))
+            self._parts.clear()
+            self._size = 0
+        self.f.flush()
+
+    def add(self, record_id, level: MIDSLevel | None, fails: list[str] | None = None):
+        """
+        Writes the result of a record.
+
+        :param record_id: the record's ID
+        :param level: the record's MIDS level
+        :param fails: the names of the elements the record fails, only used if the
+                      writer was created with fails=True
+        """
+        if self._csv is not None:
+            row = [record_id, "" if level is None else int(level)]
+            if self.fails:
+                row.append("|".join(fails))
+            self._csv.writerow(row)
+        else:
+            result = {"id": record_id, "level": None if level is None else int(level)}
+            if self.fails:
+                result["fails"] = fails
+            self.write(json.dumps(result))
+            self.write("\n")
+
+
+def check_stream(
+    records: Iterator[dict],
+    plan: Plan,
+    writer: ResultWriter,
+    id_field: str | None = None,
+    aliases: bool = False,
+    summary: MIDSSummary | None = None,
+) -> int:
+    """
+    Checks each of the given records and writes its result with the given writer, one
+    record at a time so that memory use is constant.
+
+    :param records: the record dicts
+    :param plan: the compiled plan to check with
+    :param writer: the writer to write the results with
+    :param id_field: the field records are identified by, records without a value are
+                     given an ID of null (default: None, which means each record's
+                     position in the stream is used)
+    :param aliases: whether to resolve the record keys as term names, CURIEs or IRIs
+                    and include nested records (see Plan.resolve, default: False)
+    :param summary: a summary to add the results to (optional)
+    :return: the number of records checked
+    """
+    presence_of = plan.resolve if aliases else plan.presence
+    names = [element.name for element in plan.elements]
+    evaluate = writer.fails or summary is not None
+    count = 0
+    for index, record in enumerate(records):
+        record_id = index if id_field is None else record.get(id_field)
+        presence = presence_of(record)
+        if evaluate:
+            element_bits = plan.evaluate(presence)
+            if summary is not None:
+                summary.add(element_bits)
+            fails = None
+            if writer.fails:
+                fails = [
+                    name
+                    for position, name in enumerate(names)
+                    if not element_bits >> position & 1
+                ]
+            writer.add(record_id, plan.level(element_bits), fails)
+        else:
+            writer.add(record_id, plan.check_presence(presence))
+        count += 1
+    return count
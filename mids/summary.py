@@ -0,0 +1,258 @@
+import json
+import struct
+import sys
+from array import array
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable
+
+from mids.model import MIDSLevel, NO_LEVEL
+from mids.plan import Plan
+
+# the magic bytes at the start of the binary form of a summary
+BINARY_MAGIC = b"MIDS"
+# the version of the binary form of a summary
+BINARY_VERSION = 1
+
+
+@dataclass
+class MIDSSummary:
+    """
+    A streaming summary of the MIDS results of many records.
+
+    Only counts are kept so memory use doesn't grow with the number of records. The
+    counts are: the number of records, the number of records passing each level (on its
+    own, regardless of the levels below it), the number of records whose final MIDS
+    level is each level and the number of records failing each element.
+
+    Summaries of the same element table can be merged associatively, so records can be
+    summarised in separate threads, processes or machines and then combined. Summaries
+    can be serialised to JSON or to a compact binary form.
+    """
+
+    # the names of the elements in the element table
+    elements: list[str]
+    # the MIDS level of each element in the element table
+    element_levels: list[int]
+    # the total number of records
+    total: int = 0
+    # the number of records passing each level, in MIDSLevel order
+    level_passes: list[int] = field(default_factory=lambda: [0] * len(MIDSLevel))
+    # the number of records at each final level, the first entry is the number of
+    # records not meeting the first level and the rest are in MIDSLevel order
+    final_levels: list[int] = field(default_factory=lambda: [0] * (len(MIDSLevel) + 1))
+    # the number of records failing each element in the element table
+    element_fails: list[int] | None = None
+
+    def __post_init__(self):
+        if self.element_fails is None:
+            self.element_fails = [0] * len(self.elements)
+        self._all_elements = (1 << len(self.elements)) - 1
+        self._level_masks = [0] * len(MIDSLevel)
+        for index, level in enumerate(self.element_levels):
+            self._level_masks[level] |= 1 << index
+
+    @classmethod
+    def for_plan(cls, plan: Plan) -> "MIDSSummary":
+        """
+        Creates an empty summary for the element table of the given plan.
+
+        :param plan: the compiled plan
+        :return: a new MIDSSummary
+        """
+        return cls(
+            [element.name for element in plan.elements],
+            [int(element.level) for element in plan.elements],
+        )
+
+    def add(self, element_bits: int, count: int = 1):
+        """
+        Adds a compiled result (an element bitmask, see Plan.evaluate) to the summary.
+
+        :param element_bits: the element bitmask
+        :param count: the number of records with this result (default: 1)
+        """
+        self.total += count
+        final = NO_LEVEL
+        for level, mask in enumerate(self._level_masks):
+            if element_bits & mask == mask:
+                self.level_passes[level] += count
+                if final == level - 1:
+                    final = level
+        self.final_levels[final + 1] += count
+        # only visit the bits of the failed elements
+        missing = self._all_elements & ~element_bits
+        while missing:
+            bit = missing & -missing
+            self.element_fails[bit.bit_length() - 1] += count
+            missing ^= bit
+
+    def add_record(self, plan: Plan, data: dict):
+        """
+        Evaluates the given record data with the plan and adds the result to the
+        summary.
+
+        :param plan: the compiled plan, this must have the same element table
+        :param data: the record data
+        """
+        self.add(plan.evaluate(plan.presence(data)))
+
+    def level_count(self, level: MIDSLevel | None) -> int:
+        """
+        Returns the number of records whose final MIDS level is the given level.
+
+        :param level: the MIDS level, or None for records not meeting the first level
+        :return: the number of records
+        """
+        return self.final_levels[0 if level is None else level + 1]
+
+    def merge(self, other: "MIDSSummary") -> "MIDSSummary":
+        """
+        Adds the counts from the other summary to this one.
+
+        :param other: the summary to merge in, it must be of the same element table
+        :return: this summary
+        """
+        if (self.elements, self.element_levels) != (
+            other.elements,
+            other.element_levels,
+        ):
+            raise ValueError("Summaries of different element tables can't be merged")
+        self.total += other.total
+        for counts, other_counts in (
+            (self.level_passes, other.level_passes),
+            (self.final_levels, other.final_levels),
+            (self.element_fails, other.element_fails),
+        ):
+            for index, count in enumerate(other_counts):
+                counts[index] += count
+        return self
+
+    def __add__(self, other: "MIDSSummary") -> "MIDSSummary":
+        return self.copy().merge(other)
+
+    def __iadd__(self, other: "MIDSSummary") -> "MIDSSummary":
+        return self.merge(other)
+
+    def copy(self) -> "MIDSSummary":
+        """
+        :return: a copy of this summary
+        """
+        return MIDSSummary.from_dict(self.to_dict())
+
+    @classmethod
+    def merge_all(cls, summaries: Iterable["MIDSSummary"]) -> "MIDSSummary":
+        """
+        Merges all the given summaries into a new summary.
+
+        :param summaries: the summaries, there must be at least one
+        :return: a new MIDSSummary
+        """
+        summaries = iter(summaries)
+        merged = next(summaries).copy()
+        for summary in summaries:
+            merged.merge(summary)
+        return merged
+
+    def to_dict(self) -> dict:
+        """
+        :return: the summary as a JSON serialisable dict
+        """
+        return {
+            "elements": list(self.elements),
+            "element_levels": list(self.element_levels),
+            "total": self.total,
+            "level_passes": list(self.level_passes),
+            "final_levels": list(self.final_levels),
+            "element_fails": list(self.element_fails),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "MIDSSummary":
+        """
+        :param data: a dict created by to_dict
+        :return: a new MIDSSummary
+        """
+        return cls(**data)
+
+    def to_bytes(self) -> bytes:
+        """
+        Serialises the summary to a compact binary form. This is the magic bytes and
+        version, followed by the length of and then the element table as JSON, followed
+        by all the counts as little endian unsigned 64-bit ints.
+
+        :return: the summary as bytes
+        """
+        header = json.dumps([self.elements, self.element_levels]).encode("utf-8")
+        counts = array(
+            "Q",
+            [
+                self.total,
+                *self.level_passes,
+                *self.final_levels,
+                *self.element_fails,
+            ],
+        )
+        if sys.byteorder == "big":
+            counts.byteswap()
+        return b"".join(
+            [
+                BINARY_MAGIC,
+                struct.pack("<BI", BINARY_VERSION, len(header)),
+                header,
+                counts.tobytes(),
+            ]
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "MIDSSummary":
+        """
+        :param data: bytes created by to_bytes
+        :return: a new MIDSSummary
+        """
+        if data[: len(BINARY_MAGIC)] != BINARY_MAGIC:
+            raise ValueError("Not a binary MIDS summary")
+        offset = len(BINARY_MAGIC)
+        version, header_length = struct.unpack_from("<BI", data, offset)
+        if version != BINARY_VERSION:
+            raise ValueError(f"Unsupported binary MIDS summary version {version}")
+        offset += struct.calcsize("<BI")
+        elements, element_levels = json.loads(data[offset : offset + header_length])
+        counts = array("Q")
+        counts.frombytes(data[offset + header_length :])
+        if sys.byteorder == "big":
+            counts.byteswap()
+        levels = len(MIDSLevel)
+        return cls(
+            elements,
+            element_levels,
+            total=counts[0],
+            level_passes=counts[1 : 1 + levels].tolist(),
+            final_levels=counts[1 + levels : 2 + levels * 2].tolist(),
+            element_fails=counts[2 + levels * 2 :].tolist(),
+        )
+
+    def save(self, path: Path):
+        """
+        Writes the summary to the given path, as JSON if the path has a .json suffix and
+        in the binary form otherwise.
+
+        :param path: the path to write to
+        """
+        if path.suffix == ".json":
+            path.write_text(json.dumps(self.to_dict()))
+        else:
+            path.write_bytes(self.to_bytes())
+
+    @classmethod
+    def load(cls, path: Path) -> "MIDSSummary":
+        """
+        Reads a summary written by save, in either form.
+
+        :param path: the path to read from
+        :return: a new MIDSSummary
+        """
+        data = path.read_bytes()
+        if data.startswith(BINARY_MAGIC):
+            return cls.from_bytes(data)
+        return cls.from_dict(json.loads(data))
@@ -0,0 +1,86 @@
+import json
+from dataclasses import dataclass
+from pathlib import Path
+
+from mids.gbif import GBIFClient
+from mids.lib import MIDS
+from mids.summary import MIDSSummary
+
+
+@dataclass
+class GBIFSurvey:
+    """
+    The running state of a survey of the MIDS levels of the occurrences matching a GBIF
+    occurrence search. Only aggregate counts are kept, not the occurrences themselves,
+    and the state can be saved after each page so that the survey can be resumed.
+    """
+
+    # the search query parameters
+    params: dict
+    # the running summary of the occurrences scored so far
+    summary: MIDSSummary
+    # the offset of the next page to score
+    offset: int = 0
+
+    def save(self, path: Path):
+        """
+        Writes the survey state to the given path as JSON, replacing the file in one go
+        so that an interrupted write never leaves a broken state file.
+
+        :param path: the path to write to
+        """
+        temp_path = path.with_suffix(f"{path.suffix}.tmp")
+        temp_path.write_text(
+            json.dumps(
+                {
+                    "params": self.params,
+                    "summary": self.summary.to_dict(),
+                    "offset": self.offset,
+                }
+            )
+        )
+        temp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "GBIFSurvey":
+        """
+        Reads a survey state previously written with save.
+
+        :param path: the path to read from
+        :return: a GBIFSurvey
+        """
+        state = json.loads(path.read_text())
+        return cls(
+            state["params"],
+            MIDSSummary.from_dict(state["summary"]),
+            state["offset"],
+        )
+
+    async def run(
+        self,
+        client: GBIFClient,
+        mids: MIDS,
+        state_path: Path | None = None,
+        max_records: int | None = None,
+    ):
+        """
+        Pages through the search from the current offset, scoring each page's
+        occurrences while the next page downloads. After each page the offset is
+        updated and, if a state path is given, the state is saved.
+
+        :param client: the GBIF client to use
+        :param mids: the MIDS object to score with
+        :param state_path: the path to save the state to after each page (optional)
+        :param max_records: stop after at least this many occurrences (optional)
+        """
+        pages = client.search_occurrences(self.params, self.offset)
+        async for offset, results in pages:
+            for data in results:
+                # GBIF occurrences hold media and extensions as nested records
+                self.summary.add(mids.plan.evaluate(mids.plan.resolve(data)))
+            self.offset = offset
+            if state_path is not None:
+                self.save(state_path)
+            if max_records is not None and self.summary.total >= max_records:
+                await pages.aclose()
+                break
@@ -0,0 +1,155 @@
+import csv
+import json
+import random
+from pathlib import Path
+from typing import Iterator
+
+from mids.model import MIDSElement, MIDSLevel
+from mids.plan import Plan
+from mids.shard import DIALECTS, FileFormat
+
+
+class RecordGenerator:
+    """
+    Generates deterministic synthetic Darwin Core records for a plan, for benchmarking
+    and testing. The same seed always produces the same records.
+
+    Each record is first given each of the plan's terms with the given density, with
+    some of the values empty, plus a number of unreferenced fields. If level pass rates
+    are given, a target level is then chosen for the record and the record is adjusted
+    so that it passes every level up to the target and fails the level after it.
+    """
+
+    def __init__(
+        self,
+        plan: Plan,
+        seed: int = 42,
+        density: float = 0.8,
+        empty_rate: float = 0.1,
+        extra_fields: int = 0,
+        level_pass_rates: dict[MIDSLevel, float] | None = None,
+    ):
+        """
+        :param plan: the compiled plan to generate records for
+        :param seed: the random seed (default: 42)
+        :param density: the probability of each term being in a record (default: 0.8)
+        :param empty_rate: the probability of a term in a record having an empty value,
+                           either "" or None (default: 0.1)
+        :param extra_fields: the number of fields not referenced by the plan to add to
+                             each record, to control the record width (default: 0)
+        :param level_pass_rates: the probability of a record passing each level given
+                                 it passed the level before it, levels which aren't
+                                 given are left to chance (default: None)
+        """
+        self.plan = plan
+        self.seed = seed
+        self.density = density
+        self.empty_rate = empty_rate
+        self.extra_fields = [f"extra{index}" for index in range(extra_fields)]
+        self.level_pass_rates = level_pass_rates or {}
+
+    @property
+    def fields(self) -> list[str]:
+        """
+        :return: every field the generated records can contain
+        """
+        return [*self.plan.terms, *self.extra_fields]
+
+    def records(self, count: int) -> Iterator[dict]:
+        """
+        Generates the given number of records.
+
+        :param count: the number of records
+        :return: a generator of record dicts
+        """
+        rng = random.Random(self.seed)
+        for index in range(count):
+            yield self._record(rng, index)
+
+    def _value(self, rng: random.Random, index: int) -> str | None:
+        if rng.random() < self.empty_rate:
+            return rng.choice(["", None])
+        return f"value-{index}"
+
+    def _record(self, rng: random.Random, index: int) -> dict:
+        record = {}
+        for term in self.plan.terms:
+            if rng.random() < self.density:
+                record[term] = self._value(rng, index)
+        for field in self.extra_fields:
+            record[field] = f"extra-{index}"
+        if self.level_pass_rates:
+            self._adjust(rng, record, index)
+        return record
+
+    def _adjust(self, rng: random.Random, record: dict, index: int):
+        # pick the level the record should reach, then make it pass every level up to
+        # that level and fail the next one
+        passes = []
+        failing = None
+        for level in MIDSLevel:
+            rate = self.level_pass_rates.get(level)
+            if rate is not None and rng.random() >= rate:
+                failing = level
+                break
+            passes.append(level)
+
+        for level in passes:
+            if level not in self.level_pass_rates:
+                continue
+            for element_index in self.plan.level_elements[level]:
+                element = self.plan.elements[element_index]
+                if not element.match(record):
+                    matcher = rng.choice(element.matchers)
+                    for term in matcher.terms:
+                        record[term] = f"value-{index}"
+
+        if failing is not None:
+            required = [
+                self.plan.elements[element_index]
+                for level in passes
+                for element_index in self.plan.level_elements[level]
+            ]
+            candidates = [
+                self.plan.elements[element_index]
+                for element_index in self.plan.level_elements[failing]
+            ]
+            rng.shuffle(candidates)
+            for element in candidates:
+                if self._fail(record, element, required):
+                    break
+
+    @staticmethod
+    def _fail(record: dict, element: MIDSElement, required: list[MIDSElement]) -> bool:
+        # removes the element's terms from the record, unless that would fail one of the
+        # required elements
+        removed = {
+            term: record.pop(term)
+            for matcher in element.matchers
+            for term in matcher.terms
+            if term in record
+        }
+        if all(other.match(record) for other in required):
+            return True
+        record.update(removed)
+        return False
+
+    def write(self, path: Path, count: int, file_format: FileFormat):
+        """
+        Writes the given number of records to a file.
+
+        :param path: the path to write to
+        :param count: the number of records
+        :param file_format: the format to write
+        """
+        with path.open("w", newline="", encoding="utf-8") as f:
+            if file_format == FileFormat.ndjson:
+                for record in self.records(count):
+                    f.write(json.dumps(record))
+                    f.write("\n")
+            else:
+                writer = csv.DictWriter(
+                    f, self.fields, restval="", **DIALECTS[file_format]
+                )
+                writer.writeheader()
+                writer.writerows(self.records(count))
@@ -0,0 +1,48 @@
+import pytest
+
+from typing import Callable
+
+from mids.lib import init
+from mids.model import Discipline, MIDSLevel
+from mids.plan import Plan
+from mids.synthetic import RecordGenerator
+
+
+@pytest.fixture(autouse=True, scope="session")
+def cache_dir(tmp_path_factory):
+    # write compiled mappings to a temporary directory rather than the user's cache
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv("MIDS_CACHE_DIR", str(tmp_path_factory.mktemp("cache")))
+        yield
+
+
+@pytest.fixture
+def record_generator() -> Callable[..., RecordGenerator]:
+    """
+    A factory of RecordGenerators, it takes the generator's options as keyword
+    arguments and the plan defaults to the biology plan.
+    """
+
+    def make(plan: Plan | None = None, **options) -> RecordGenerator:
+        if plan is None:
+            plan = init(Discipline.biology).plan
+        return RecordGenerator(plan, **options)
+
+    return make
+
+
+@pytest.fixture
+def records(record_generator: Callable[..., RecordGenerator]) -> list[dict]:
+    """
+    Deterministic synthetic biology records spread across every MIDS level (and no
+    level), with some empty values.
+    """
+    generator = record_generator(
+        level_pass_rates={
+            MIDSLevel.mids0: 0.9,
+            MIDSLevel.mids1: 0.8,
+            MIDSLevel.mids2: 0.7,
+            MIDSLevel.mids3: 0.6,
+        },
+    )
+    return list(generator.records(400))
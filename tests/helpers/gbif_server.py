@@ -0,0 +1,121 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+
+class StubGBIFServer:
+    """
+    A local stand in for the GBIF API serving occurrences from a dict.
+    """
+
+    def __init__(
+        self,
+        occurrences: dict[int, dict],
+        fail_first: set[int] = (),
+        stall_first: set[int] = (),
+        stall: float = 0.5,
+        garble_first: set[int] = (),
+    ):
+        """
+        :param occurrences: the occurrences to serve, keyed by GBIF ID
+        :param fail_first: GBIF IDs which should get a 429 on their first request
+        :param stall_first: GBIF IDs whose first request should stall before responding
+        :param stall: how long to stall for in seconds
+        :param garble_first: GBIF IDs which should get a 200 with a truncated JSON body
+                             on their first request
+        """
+        self.occurrences = occurrences
+        self.fail_first = set(fail_first)
+        self.stall_first = set(stall_first)
+        self.stall = stall
+        self.garble_first = set(garble_first)
+        self.requests = []
+        # the client addresses connections came from, one per connection
+        self.connections = set()
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, args=(0.05,), daemon=True
+        )
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address
+        return f"http://{host}:{port}/v1"
+
+    def __enter__(self) -> "StubGBIFServer":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def search(self, params: dict[str, list[str]]) -> dict:
+        offset = int(params.get("offset", ["0"])[0])
+        limit = int(params.get("limit", ["20"])[0])
+        results = list(self.occurrences.values())
+        return {
+            "offset": offset,
+            "limit": limit,
+            "count": len(results),
+            "endOfRecords": offset + limit >= len(results),
+            "results": results[offset : offset + limit],
+        }
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def send(self, status: int, data: dict | None = None):
+                body = json.dumps(data).encode("utf-8") if data is not None else b""
+                self.send_body(status, body)
+
+            def send_body(self, status: int, body: bytes):
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                with stub.lock:
+                    stub.requests.append(self.path)
+                    stub.connections.add(self.client_address)
+                parts = url.path.strip("/").split("/")
+                if parts[:2] == ["v1", "occurrence"] and len(parts) == 3:
+                    if parts[2] == "search":
+                        self.send(200, stub.search(parse_qs(url.query)))
+                        return
+                    gbif_id = int(parts[2])
+                    with stub.lock:
+                        if gbif_id in stub.fail_first:
+                            stub.fail_first.discard(gbif_id)
+                            self.send(429)
+                            return
+                        if gbif_id in stub.garble_first:
+                            stub.garble_first.discard(gbif_id)
+                            self.send_body(200, b'{"key": ')
+                            return
+                        stalled = gbif_id in stub.stall_first
+                        stub.stall_first.discard(gbif_id)
+                    if stalled:
+                        time.sleep(stub.stall)
+                        # the client has given up on the request
+                        self.close_connection = True
+                        return
+                    if gbif_id in stub.occurrences:
+                        self.send(200, stub.occurrences[gbif_id])
+                        return
+                self.send(404)
+
+        return Handler
@@ -0,0 +1,106 @@
+import random
+from pathlib import Path
+
+import pytest
+
+from mids.adaptive import (
+    AdaptiveChecker,
+    EvaluationOrder,
+    MatchProfile,
+    learn_order,
+)
+from mids.lib import init, MIDS
+from mids.model import Discipline, MIDSLevel
+
+
+@pytest.fixture
+def mids() -> MIDS:
+    return init(Discipline.biology)
+
+
+def random_records(mids: MIDS, count: int, seed: int = 1) -> list[dict]:
+    rng = random.Random(seed)
+    terms = mids.plan.terms
+    densities = {term: rng.choice([0.05, 0.5, 0.95]) for term in terms}
+    return [
+        {term: "x" for term in terms if rng.random() < densities[term]}
+        for _ in range(count)
+    ]
+
+
+def test_ordered_check_matches_default(mids: MIDS):
+    records = random_records(mids, 2000)
+    expected = [mids.check(record) for record in records]
+
+    ordered = learn_order(mids, records[:200]).apply(mids)
+    assert ordered.plan._ordered is not None
+    assert [ordered.check(record) for record in records] == expected
+
+    # a reversed order must give the same results too
+    order = EvaluationOrder.default(mids.plan)
+    for names in order.elements.values():
+        names.reverse()
+    for positions in order.matchers.values():
+        positions.reverse()
+    ordered = order.apply(mids)
+    assert [ordered.check(record) for record in records] == expected
+
+    ordered.plan.set_order(None)
+    assert [ordered.check(record) for record in records] == expected
+
+
+def test_apply_leaves_cached_plan(mids: MIDS):
+    order = learn_order(mids, random_records(mids, 100))
+    ordered = order.apply(mids)
+    assert ordered is not mids
+    assert ordered.plan is not mids.plan
+    assert ordered.levels is mids.levels
+    # the plan shared by everything using init is untouched
+    assert init(Discipline.biology).plan._ordered is None
+
+
+def test_order_prefers_likely_failures(mids: MIDS):
+    plan = mids.plan
+    profile = MatchProfile(plan)
+    for _ in range(100):
+        profile.observe(0)
+    assert profile.records == 100
+    assert not any(profile.element_hits)
+
+    # an element which always passes should be evaluated after ones which never do
+    passing = plan.level_elements[MIDSLevel.mids1][0]
+    profile.matcher_hits[passing][0] = 100
+    profile.element_hits[passing] = 100
+    order = profile.order()
+    assert order.elements["mids1"][-1] == plan.elements[passing].name
+
+
+def test_set_order_validation(mids: MIDS):
+    plan = mids.plan
+    with pytest.raises(ValueError):
+        plan.set_order({MIDSLevel.mids0: []})
+    order = EvaluationOrder.default(plan)
+    order.matchers[plan.elements[0].name] = [0, 0]
+    with pytest.raises(ValueError):
+        order.apply(mids)
+    order = EvaluationOrder.default(plan)
+    order.elements["mids0"].append("nope")
+    with pytest.raises(ValueError):
+        order.apply(mids)
+
+
+def test_save_load(mids: MIDS, tmp_path: Path):
+    order = learn_order(mids, random_records(mids, 100))
+    path = tmp_path / "order.json"
+    order.save(path)
+    assert EvaluationOrder.load(path) == order
+
+
+def test_adaptive_checker(mids: MIDS):
+    records = random_records(mids, 500, seed=2)
+    expected = [mids.check(record) for record in records]
+    checker = AdaptiveChecker(mids, sample_every=2, relearn_every=100)
+    assert [checker.check(record) for record in records] == expected
+    assert checker.profile.records == 250
+    assert checker.mids.plan._ordered is not None
+    assert mids.plan._ordered is None
@@ -0,0 +1,87 @@
+from pathlib import Path
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+from mids.arrow import (
+    check_columns,
+    check_parquet,
+    present,
+    read_parquet,
+    summarise_parquet,
+)
+from mids.lib import init
+from mids.model import Discipline, NO_LEVEL
+from mids.summary import MIDSSummary
+
+
+@pytest.fixture
+def table(records: list[dict]) -> "pa.Table":
+    terms = init(Discipline.biology).plan.terms
+    # leave a few of the terms out entirely and add a column that isn't used
+    schema = pa.schema([(term, pa.string()) for term in terms[:-3]])
+    table = pa.Table.from_pylist(records, schema=schema)
+    return table.append_column("unused", pa.array(range(table.num_rows)))
+
+
+def expected_levels(table: "pa.Table") -> list[int]:
+    mids = init(Discipline.biology)
+    return [
+        NO_LEVEL if level is None else level
+        for level in map(mids.check, table.to_pylist())
+    ]
+
+
+def test_present():
+    assert present(pa.array(["x", "", None])).to_pylist() == [True, False, False]
+    assert present(pa.array(["x", "", None], pa.large_string())).to_pylist() == [
+        True,
+        False,
+        False,
+    ]
+    # zero isn't an empty value
+    assert present(pa.array([0, None])).to_pylist() == [True, False]
+    assert present(pa.array(["x", "", None]).dictionary_encode()).to_pylist() == [
+        True,
+        False,
+        False,
+    ]
+
+
+def test_check_columns(table: "pa.Table"):
+    plan = init(Discipline.biology).plan
+    assert check_columns(plan, table).to_pylist() == expected_levels(table)
+    batch = table.to_batches()[0]
+    assert check_columns(plan, batch).to_pylist() == expected_levels(
+        pa.Table.from_batches([batch])
+    )
+
+
+def test_check_parquet(table: "pa.Table", tmp_path: Path):
+    plan = init(Discipline.biology).plan
+    path = tmp_path / "records.parquet"
+    pq.write_table(table, path)
+    batches = list(read_parquet(path, plan, batch_size=300))
+    assert "unused" not in batches[0].schema.names
+    levels = [level for batch in check_parquet(path, plan, 300) for level in batch]
+    assert [level.as_py() for level in levels] == expected_levels(table)
+
+
+def test_summarise_parquet(table: "pa.Table", tmp_path: Path):
+    plan = init(Discipline.biology).plan
+    path = tmp_path / "records.parquet"
+    pq.write_table(table, path)
+    expected = MIDSSummary.for_plan(plan)
+    for record in table.to_pylist():
+        expected.add_record(plan, record)
+    assert summarise_parquet(path, plan, batch_size=300) == expected
+
+
+def test_no_referenced_columns(tmp_path: Path):
+    plan = init(Discipline.biology).plan
+    path = tmp_path / "records.parquet"
+    pq.write_table(pa.table({"unused": [1, 2, 3]}), path)
+    levels = [level.as_py() for batch in check_parquet(path, plan) for level in batch]
+    assert levels == [NO_LEVEL] * 3
@@ -0,0 +1,89 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from mids.batch import NO_LEVEL, final_levels
+from mids.lib import init, MIDS
+from mids.model import Discipline, MIDSLevel
+
+
+def test_final_levels():
+    levels = np.array(
+        [
+            [False, False, False, False],
+            [True, False, True, True],
+            [True, True, False, False],
+            [True, True, True, True],
+        ]
+    )
+    assert final_levels(levels).tolist() == [NO_LEVEL, 0, 1, 3]
+
+
+def reference(mids: MIDS, record: dict) -> tuple[list, dict, MIDSLevel | None]:
+    # the results of the uncompiled Matcher semantics: elements match if any of their
+    # matchers match, levels pass if all of their elements match
+    elements = []
+    passed = {}
+    for level, level_elements in mids.levels.items():
+        matches = [element.match(record) for element in level_elements]
+        elements.extend(zip(level_elements, matches))
+        passed[level] = all(matches)
+    final = None
+    for level in MIDSLevel:
+        if not passed[level]:
+            break
+        final = level
+    return elements, passed, final
+
+
+def test_check_many_matches_matchers(records):
+    mids = init(Discipline.biology)
+    levels = mids.check_many(records)
+    assert levels.dtype == np.int8
+    expected = [reference(mids, record)[2] for record in records]
+    assert [None if level == NO_LEVEL else level for level in levels] == expected
+
+
+def test_report_many_matches_matchers(records):
+    mids = init(Discipline.biology)
+    batch = mids.report_many(records)
+    assert len(batch) == len(records)
+    for row, record in enumerate(records):
+        elements, passed, final = reference(mids, record)
+        for column, level in enumerate(MIDSLevel):
+            assert batch.levels[row, column] == passed[level]
+        for element, matched in elements:
+            index = batch.element_table.index(element)
+            assert batch.elements[row, index] == matched
+        assert batch.level[row] == (NO_LEVEL if final is None else final)
+
+
+def test_term_table(records):
+    mids = init(Discipline.biology)
+    expected = mids.check_many(records)
+    # lists with None and "" as empty values, plus a column which isn't a term
+    table = {term: [record.get(term) for record in records] for term in mids.plan.terms}
+    table["unused"] = [""] * len(records)
+    assert mids.check_many(table).tolist() == expected.tolist()
+    # NumPy string arrays, with a missing term column
+    table = {
+        term: np.array([record.get(term) or "" for record in records])
+        for term in mids.plan.terms[1:]
+    }
+    without_first = [
+        {term: value for term, value in record.items() if term != mids.plan.terms[0]}
+        for record in records
+    ]
+    assert mids.check_many(table).tolist() == mids.check_many(without_first).tolist()
+
+
+def test_term_table_lengths():
+    mids = init(Discipline.biology)
+    with pytest.raises(ValueError):
+        mids.check_many({"catalogNumber": ["1", "2"], "institutionCode": ["x"]})
+    assert len(mids.check_many({})) == 0
+
+
+def test_empty_batch():
+    mids = init(Discipline.biology)
+    assert len(mids.check_many([])) == 0
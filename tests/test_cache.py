@@ -0,0 +1,165 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from mids.cache import ResultCache
+from mids.lib import init, MIDS
+from mids.model import Discipline, MIDSLevel
+from mids.shard import FileFormat, report_file
+
+
+def write_ndjson(path: Path, records: list[dict]):
+    path.write_text("".join(json.dumps(record) + "\n" for record in records))
+
+
+def write_tsv(path: Path, header: list[str], records: list[dict]):
+    lines = ["\t".join(header)]
+    lines.extend(
+        "\t".join(record.get(name) or "" for name in header) for record in records
+    )
+    path.write_text("\n".join(lines) + "\n")
+
+
+@pytest.mark.parametrize("file_format", [FileFormat.ndjson, FileFormat.tsv])
+def test_evaluate_file(tmp_path: Path, records: list[dict], file_format: FileFormat):
+    plan = init(Discipline.biology).plan
+    path = tmp_path / f"records.{file_format}"
+    if file_format == FileFormat.ndjson:
+        write_ndjson(path, records)
+    else:
+        write_tsv(path, plan.terms, records)
+    expected = list(report_file(path, file_format))
+    cache_path = tmp_path / "cache.db"
+
+    with ResultCache(cache_path, plan) as cache:
+        assert list(cache.evaluate_file(path, file_format)) == expected
+        assert cache.stats.hits == 0
+        assert cache.stats.misses == len(cache) == len(records)
+
+    # the results persist between runs and unchanged records are hits
+    with ResultCache(cache_path, plan) as cache:
+        assert list(cache.evaluate_file(path, file_format)) == expected
+        assert cache.stats.hits == len(records)
+        assert cache.stats.misses == 0
+        assert cache.stats.hit_rate == 1
+
+
+def test_changed_records_are_checked(tmp_path: Path, records: list[dict]):
+    plan = init(Discipline.biology).plan
+    path = tmp_path / "records.ndjson"
+    cache_path = tmp_path / "cache.db"
+    write_ndjson(path, records)
+    with ResultCache(cache_path, plan) as cache:
+        list(cache.evaluate_file(path, FileFormat.ndjson))
+
+    # insert a new record at the start, change one, move one to the end and remove
+    # one, none of which should affect the other records
+    changed = [{"catalogNumber": "new"}, *records[1:]]
+    changed[3] = {"catalogNumber": "changed"}
+    changed.append(changed.pop(5))
+    del changed[10]
+    write_ndjson(path, changed)
+    with ResultCache(cache_path, plan) as cache:
+        results = list(cache.evaluate_file(path, FileFormat.ndjson))
+        assert results == [plan.evaluate(plan.presence(r)) for r in changed]
+        assert cache.stats.misses == cache.stats.inserts == 2
+        assert cache.stats.hits == len(changed) - 2
+
+
+def test_files_share_results(tmp_path: Path, records: list[dict]):
+    plan = init(Discipline.biology).plan
+    first = tmp_path / "first.ndjson"
+    second = tmp_path / "second.ndjson"
+    write_ndjson(first, records[:300])
+    write_ndjson(second, records[100:])
+    with ResultCache(tmp_path / "cache.db", plan) as cache:
+        list(cache.evaluate_file(first, FileFormat.ndjson))
+        expected = list(report_file(second, FileFormat.ndjson))
+        assert list(cache.evaluate_file(second, FileFormat.ndjson)) == expected
+        assert cache.stats.hits == 200
+        # both files' results are kept
+        assert len(cache) == len(records)
+
+
+def test_evaluate_batches(tmp_path: Path):
+    plan = init(Discipline.biology).plan
+    lines = [b"a", b"bb", b"", b"a"]
+    calls = []
+
+    def presence(line: bytes) -> int:
+        calls.append(line)
+        return len(line)
+
+    expected = [plan.evaluate(len(line)) for line in lines]
+    with ResultCache(tmp_path / "cache.db", plan) as cache:
+        assert list(cache.evaluate(lines, presence, batch_size=3)) == expected
+        assert cache.stats.inserts == 3
+        assert list(cache.evaluate(lines, presence, batch_size=3)) == expected
+        # a different context invalidates the results
+        assert list(cache.evaluate(lines, presence, b"other")) == expected
+    # repeated lines are only checked once
+    assert calls == [b"a", b"bb", b"", b"a", b"bb", b""]
+
+
+def test_get_put_many(tmp_path: Path):
+    plan = init(Discipline.biology).plan
+    with ResultCache(tmp_path / "cache.db", plan) as cache:
+        assert cache.get_many([b"1", b"2"]) == {}
+        cache.put_many({b"1": 0b101, b"2": 0})
+        assert cache.get_many([b"2", b"3", b"1"]) == {b"1": 0b101, b"2": 0}
+
+
+def test_eviction(tmp_path: Path):
+    plan = init(Discipline.biology).plan
+    keys = [str(i).encode() for i in range(14)]
+    path = tmp_path / "cache.db"
+    with ResultCache(path, plan, max_entries=10) as cache:
+        cache.put_many({key: i for i, key in enumerate(keys[:10])})
+        # results which are already cached aren't added again
+        cache.put_many({keys[0]: 0})
+        cache.put_many({key: i for i, key in enumerate(keys[10:], 10)})
+        assert len(cache) == 10
+        assert cache.stats.inserts == 14
+        assert cache.stats.evictions == 4
+        # the oldest results are evicted first
+        assert cache.get_many(keys[:4]) == {}
+        assert cache.get_many(keys[4:]) == {key: i for i, key in enumerate(keys[4:], 4)}
+
+    # the size bound is kept between runs
+    with ResultCache(path, plan, max_entries=10) as cache:
+        assert len(cache) == 10
+        cache.put_many({b"new": 0})
+        assert len(cache) == 10
+        assert cache.get_many(keys[4:5]) == {}
+
+
+def test_header_change_invalidates(tmp_path: Path, records: list[dict]):
+    plan = init(Discipline.biology).plan
+    path = tmp_path / "records.tsv"
+    cache_path = tmp_path / "cache.db"
+    write_tsv(path, plan.terms, records)
+    with ResultCache(cache_path, plan) as cache:
+        list(cache.evaluate_file(path, FileFormat.tsv))
+
+    # the same rows mean something else under a different header
+    header = list(reversed(plan.terms))
+    path.write_text(
+        "\t".join(header) + "\n" + path.read_text().split("\n", 1)[1],
+    )
+    expected = list(report_file(path, FileFormat.tsv))
+    with ResultCache(cache_path, plan) as cache:
+        assert list(cache.evaluate_file(path, FileFormat.tsv)) == expected
+        assert cache.stats.hits == 0
+
+
+def test_different_mappings_are_not_shared(tmp_path: Path):
+    mids = init(Discipline.biology)
+    levels = {MIDSLevel.mids0: mids.levels[MIDSLevel.mids0]}
+    other = MIDS(mids.discipline, mids.curie_map, levels).plan
+    path = tmp_path / "cache.db"
+    with ResultCache(path, mids.plan) as cache:
+        list(cache.evaluate([b"a"], lambda line: 0))
+    with ResultCache(path, other) as cache:
+        list(cache.evaluate([b"a"], lambda line: 0))
+        assert cache.stats.misses == 1
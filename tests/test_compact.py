@@ -0,0 +1,88 @@
+import pytest
+
+from mids.compact import CompactReport, CompactReports
+from mids.lib import init
+from mids.matchers import ExactMatcher
+from mids.model import Discipline, Identifier, MIDSElement, MIDSLevel
+from mids.plan import Plan
+
+
+def assert_same(compact: CompactReport, data: dict):
+    report = init(Discipline.biology).report(data)
+    assert compact.level == report.level
+    for compact_result, result in zip(compact, report, strict=True):
+        assert compact_result.level == result.level
+        assert compact_result.passed == result.passed
+        assert compact_result.fails == result.fails
+        assert compact_result.passes == result.passes
+        assert list(compact_result) == list(result)
+        assert compact_result.elements == result.elements
+        assert compact[result.level].passed == result.passed
+
+
+def test_compact_report(records: list[dict]):
+    mids = init(Discipline.biology)
+    for record in records:
+        compact = mids.compact_report(record)
+        assert not hasattr(compact, "__dict__")
+        assert_same(compact, record)
+
+
+def test_to_dict():
+    mids = init(Discipline.biology)
+    data = {"catalogNumber": "1", "institutionCode": "NHMUK"}
+    report = mids.compact_report(data).to_dict()
+    assert report["level"] == MIDSLevel.mids0
+    assert report["levels"]["mids0"] == {
+        "passed": True,
+        "passes": [element.name for element in mids.levels[MIDSLevel.mids0]],
+        "fails": [],
+    }
+    assert not report["levels"]["mids1"]["passed"]
+    assert "Name" in report["levels"]["mids1"]["fails"]
+
+
+def test_compact_reports(records: list[dict]):
+    mids = init(Discipline.biology)
+    reports = mids.compact_reports(records)
+    assert len(reports) == len(records)
+    assert reports.words == 1
+    assert list(reports.levels()) == [mids.check(record) for record in records]
+    for report, record in zip(reports, records, strict=True):
+        assert_same(report, record)
+    assert reports[-1] == mids.compact_report(records[-1])
+    assert reports[1:3] == [reports[1], reports[2]]
+    with pytest.raises(IndexError):
+        reports[len(records)]
+
+
+def test_compact_reports_many_elements():
+    # more elements than fit in one array item
+    elements = [
+        MIDSElement(
+            Identifier(f"e{i}", f"e{i}", "ex"),
+            MIDSLevel.mids0,
+            [ExactMatcher(Identifier(f"t{i}", f"t{i}", "ex"))],
+        )
+        for i in range(100)
+    ]
+    plan = Plan({MIDSLevel.mids0: elements})
+    bits = [(1 << 100) - 1, 1 << 99, 1 << 63 | 1 << 64, 0]
+    reports = CompactReports(plan, bits)
+    assert reports.words == 2
+    assert len(reports) == 4
+    assert [reports.element_bits(i) for i in range(4)] == bits
+    assert reports.element_bits(-1) == 0
+    assert [report.level for report in reports] == [MIDSLevel.mids3, None, None, None]
+
+
+def test_as_numpy(records: list[dict]):
+    np = pytest.importorskip("numpy")
+    mids = init(Discipline.biology)
+    reports = mids.compact_reports(records)
+    array = reports.as_numpy()
+    assert array.shape == (len(records), 1)
+    assert array.dtype == np.uint64
+    assert [int(value) for value in array[:, 0]] == [
+        reports.element_bits(i) for i in range(len(reports))
+    ]
@@ -0,0 +1,145 @@
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from mids.dwca import DwCAError, check_dwca, read_dwca, read_meta
+from mids.lib import init
+from mids.model import Discipline, MIDSLevel
+
+META = """<?xml version="1.0" encoding="UTF-8"?>
+<archive xmlns="http://rs.tdwg.org/dwc/text/" metadata="eml.xml">
+  <core encoding="UTF-8" fieldsTerminatedBy="\\t" linesTerminatedBy="\\n"
+        fieldsEnclosedBy="" ignoreHeaderLines="1"
+        rowType="http://rs.tdwg.org/dwc/terms/Occurrence">
+    <files><location>occurrence.txt</location></files>
+    <id index="0"/>
+    <field index="1" term="http://rs.tdwg.org/dwc/terms/catalogNumber"/>
+    <field index="2" term="http://rs.tdwg.org/dwc/terms/institutionCode"/>
+    <field index="3" term="http://rs.tdwg.org/dwc/terms/scientificName"/>
+    <field index="4" term="http://rs.tdwg.org/dwc/terms/basisOfRecord"/>
+    <field index="5" term="http://rs.tdwg.org/dwc/terms/preparations"/>
+    <field index="6" term="http://purl.org/dc/terms/modified"/>
+    <field index="7" term="http://rs.tdwg.org/dwc/terms/country"/>
+    <field index="8" term="http://rs.tdwg.org/dwc/terms/decimalLatitude"/>
+    <field index="9" term="http://rs.tdwg.org/dwc/terms/decimalLongitude"/>
+    <field index="10" term="http://rs.tdwg.org/dwc/terms/recordedBy"/>
+    <field index="11" term="http://rs.tdwg.org/dwc/terms/eventDate"/>
+    <field index="12" term="http://rs.tdwg.org/dwc/terms/recordNumber"/>
+    <field index="13" term="http://example.com/notMapped"/>
+    <field term="http://purl.org/dc/terms/license" default="CC0"/>
+  </core>
+  <extension encoding="UTF-8" fieldsTerminatedBy="\\t" linesTerminatedBy="\\n"
+             fieldsEnclosedBy="" ignoreHeaderLines="1"
+             rowType="http://rs.gbif.org/terms/1.0/Multimedia">
+    <files><location>multimedia.txt</location></files>
+    <coreid index="0"/>
+    <field index="1" term="http://purl.org/dc/terms/identifier"/>
+  </extension>
+</archive>
+"""
+
+FULL = ["1", "NHM", "Larus", "PreservedSpecimen", "skin", "2024", "UK"]
+FULL += ["51.5", "-0.17", "Dillen", "2024", "12", "beans"]
+
+
+def make_archive(path: Path, core_rows: list[list[str]], media_rows: list[list[str]]):
+    def lines(header: list[str], rows: list[list[str]]) -> str:
+        return "".join("\t".join(row) + "\n" for row in [header, *rows])
+
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("meta.xml", META)
+        archive.writestr("occurrence.txt", lines(["id"] * 14, core_rows))
+        archive.writestr("multimedia.txt", lines(["coreid", "identifier"], media_rows))
+
+
+def test_read_meta(tmp_path: Path):
+    path = tmp_path / "test.zip"
+    make_archive(path, [], [])
+    with zipfile.ZipFile(path) as archive:
+        core, extensions = read_meta(archive)
+    assert core.location == "occurrence.txt"
+    assert core.delimiter == "\t"
+    assert core.quote_char == ""
+    assert core.id_index == 0
+    assert core.fields[1] == "http://rs.tdwg.org/dwc/terms/catalogNumber"
+    assert core.defaults == {"http://purl.org/dc/terms/license": "CC0"}
+    assert len(extensions) == 1
+    assert extensions[0].location == "multimedia.txt"
+
+
+def test_read_dwca(tmp_path: Path):
+    path = tmp_path / "test.zip"
+    make_archive(
+        path,
+        [["a", *FULL], ["b", "2", "NHM", *[""] * 11]],
+        [["a", "http://example.com/1.jpg"], ["a", "http://example.com/2.jpg"]],
+    )
+    mids = init(Discipline.biology)
+    records = dict(read_dwca(mids, path))
+    assert records["a"]["identifier"] == "http://example.com/1.jpg"
+    assert records["a"]["license"] == "CC0"
+    assert "notMapped" not in records["a"]
+    assert records["b"] == {"catalogNumber": "2", "institutionCode": "NHM"} | {
+        "license": "CC0"
+    }
+
+
+def test_check_dwca(tmp_path: Path):
+    path = tmp_path / "test.zip"
+    make_archive(
+        path,
+        [["a", *FULL], ["b", *FULL], ["c", "", "", *[""] * 11]],
+        [["b", "http://example.com/1.jpg"]],
+    )
+    mids = init(Discipline.biology)
+    assert list(check_dwca(mids, path)) == [
+        # no media so only level 1
+        ("a", MIDSLevel.mids1),
+        ("b", MIDSLevel.mids2),
+        ("c", None),
+    ]
+
+
+def test_check_dwca_unordered_extension(tmp_path: Path):
+    path = tmp_path / "test.zip"
+    make_archive(
+        path,
+        [["a", *FULL], ["b", *FULL]],
+        [["b", "http://example.com/1.jpg"], ["a", "http://example.com/2.jpg"]],
+    )
+    mids = init(Discipline.biology)
+    results = check_dwca(mids, path)
+    # the error is raised before any record is checked without its extension rows
+    with pytest.raises(DwCAError, match="core id b"):
+        next(results)
+
+
+def test_check_dwca_unknown_core_id(tmp_path: Path):
+    path = tmp_path / "test.zip"
+    make_archive(
+        path,
+        [["a", *FULL], ["b", *FULL], ["c", *FULL]],
+        [["a", "http://example.com/1.jpg"], ["x", "http://example.com/2.jpg"]]
+        + [["c", "http://example.com/3.jpg"]],
+    )
+    mids = init(Discipline.biology)
+    results = check_dwca(mids, path)
+    assert next(results) == ("a", MIDSLevel.mids2)
+    assert next(results) == ("b", MIDSLevel.mids1)
+    with pytest.raises(DwCAError, match="core id x"):
+        next(results)
+
+
+def test_check_dwca_short_rows(tmp_path: Path):
+    path = tmp_path / "test.zip"
+    with zipfile.ZipFile(path, "w") as archive:
+        # the extension's coreid is in its second column, which the last row lacks
+        archive.writestr(
+            "meta.xml", META.replace('coreid index="0"', 'coreid index="1"')
+        )
+        archive.writestr("occurrence.txt", "\t".join(["id"] * 14) + "\na\n")
+        archive.writestr("multimedia.txt", "identifier\tcoreid\nx.jpg\ta\ny.jpg\n")
+    mids = init(Discipline.biology)
+    with pytest.raises(DwCAError, match="multimedia.txt has a row with 1 columns"):
+        list(check_dwca(mids, path))
@@ -0,0 +1,97 @@
+import random
+from itertools import islice
+from pathlib import Path
+from typing import Callable
+
+import pytest
+
+from mids.estimate import estimate_file, MIDSEstimate, sample_lines
+from mids.model import MIDSLevel
+from mids.shard import FileFormat, summarise_file
+from mids.synthetic import RecordGenerator
+
+LEVEL_PASS_RATES = {
+    MIDSLevel.mids0: 0.9,
+    MIDSLevel.mids1: 0.6,
+    MIDSLevel.mids2: 0.5,
+    MIDSLevel.mids3: 0.5,
+}
+
+
+def test_sample_lines_weights(tmp_path: Path):
+    # half the lines are much longer than the others, so are picked far more often,
+    # but the weights correct for that
+    path = tmp_path / "lines.txt"
+    path.write_text("".join("a\n" if i % 2 else "b" * 50 + "\n" for i in range(1000)))
+    samples = list(islice(sample_lines(path, seed=1), 20000))
+    raw_short = sum(line == b"a" for line, _ in samples) / len(samples)
+    assert raw_short < 0.1
+    weighted_short = sum(w for line, w in samples if line == b"a") / sum(
+        w for _, w in samples
+    )
+    assert weighted_short == pytest.approx(0.5, abs=0.03)
+
+
+def test_sample_lines_empty(tmp_path: Path):
+    path = tmp_path / "empty.txt"
+    path.write_text("header\n\n  \n")
+    assert list(sample_lines(path, start=7)) == []
+
+
+def test_estimate_weights():
+    estimate = MIDSEstimate(["e0", "e1"])
+    rng = random.Random(2)
+    for _ in range(2000):
+        # records at level 0 are sampled 4 times as often but weighted a quarter
+        if rng.random() < 0.8:
+            estimate.add(MIDSLevel.mids0, 0b01, 0.25)
+        else:
+            estimate.add(None, 0b00, 1.0)
+    level = estimate.level(MIDSLevel.mids0)
+    assert level.value == pytest.approx(0.5, abs=0.05)
+    assert 0 < level.margin < 0.05
+    assert estimate.element_fails(1).value == 1.0
+    assert estimate.element_fails(0).value == pytest.approx(0.5, abs=0.05)
+
+
+@pytest.mark.parametrize("file_format", list(FileFormat))
+def test_estimate_file(
+    tmp_path: Path,
+    file_format: FileFormat,
+    record_generator: Callable[..., RecordGenerator],
+):
+    generator = record_generator(extra_fields=3, level_pass_rates=LEVEL_PASS_RATES)
+    path = tmp_path / f"records.{file_format}"
+    generator.write(path, 5000, file_format)
+    summary = summarise_file(path, file_format)
+
+    estimate = estimate_file(path, file_format, precision=0.02, seed=4)
+    assert estimate.precision <= 0.02
+    assert 400 <= estimate.samples < 5000
+    for level, count in zip([None, *MIDSLevel], summary.final_levels):
+        proportion = estimate.level(level)
+        # allow for the odd interval missing
+        assert abs(proportion.value - count / summary.total) < 2 * proportion.margin
+    for index, count in enumerate(summary.element_fails):
+        proportion = estimate.element_fails(index)
+        assert abs(proportion.value - count / summary.total) < 0.05
+
+
+def test_estimate_file_stratified(tmp_path: Path):
+    path = tmp_path / "records.csv"
+    lines = ["institutionCode,catalogNumber,scientificName"]
+    for i in range(3000):
+        if i % 3:
+            lines.append(f"A,{i},")
+        else:
+            lines.append("B,,")
+    path.write_text("\n".join(lines) + "\n")
+    estimate = estimate_file(
+        path, FileFormat.csv, stratify="institutionCode", seed=1, max_samples=600
+    )
+    assert estimate.samples == 600
+    assert set(estimate.strata) == {"A", "B"}
+    assert estimate.strata["A"].level(MIDSLevel.mids0).value == 1.0
+    assert estimate.strata["B"].level(None).value == 1.0
+    assert sum(s.samples for s in estimate.strata.values()) == 600
+    assert estimate.to_dict()["strata"]["A"]["samples"] == estimate.strata["A"].samples
@@ -0,0 +1,69 @@
+from pathlib import Path
+from typing import Callable
+
+from mids.gaps import analyse_file, GapAnalysis
+from mids.lib import init
+from mids.model import Discipline, MIDSLevel
+from mids.shard import FileFormat
+from mids.synthetic import RecordGenerator
+
+
+def test_analysis(record_generator: Callable[..., RecordGenerator]):
+    mids = init(Discipline.biology)
+    records = list(record_generator(seed=8, density=0.6).records(500))
+    analysis = GapAnalysis(mids.plan)
+    for record in records:
+        analysis.add_record(record)
+
+    assert analysis.total == len(records)
+    assert analysis.complete == sum(
+        mids.check(record) == MIDSLevel.mids3 for record in records
+    )
+    gaps = analysis.top()
+    assert sum(gap.records for gap in gaps) == analysis.total - analysis.complete
+    assert [gap.records for gap in gaps] == sorted(
+        (gap.records for gap in gaps), reverse=True
+    )
+    assert len(analysis.top(3)) == 3
+    assert all(gap.level == MIDSLevel.mids1 for gap in analysis.top(level=1))
+
+    # filling in the top gap's terms lifts its records to the next level
+    top = gaps[0]
+    lifted = 0
+    for record in records:
+        gap = mids.gap(record)
+        if gap is not None and gap == (top.level, top.terms):
+            filled = {**record, **dict.fromkeys(top.terms, "x")}
+            assert mids.check(filled) >= top.level
+            lifted += 1
+    assert lifted == top.records
+
+    term_counts = analysis.term_counts()
+    for term in top.terms:
+        assert term_counts[term] >= top.records
+
+
+def test_merge(records: list[dict]):
+    plan = init(Discipline.biology).plan
+    whole = GapAnalysis(plan)
+    first = GapAnalysis(plan)
+    second = GapAnalysis(plan)
+    for index, record in enumerate(records):
+        whole.add_record(record)
+        (first if index % 2 else second).add_record(record)
+    merged = first.merge(second)
+    assert merged.total == whole.total
+    assert merged.complete == whole.complete
+    assert merged.gaps == whole.gaps
+
+
+def test_analyse_file(tmp_path: Path, record_generator: Callable[..., RecordGenerator]):
+    plan = init(Discipline.biology).plan
+    generator = record_generator(seed=4, density=0.7)
+    expected = GapAnalysis(plan)
+    for record in generator.records(400):
+        expected.add_record(record)
+    for file_format in FileFormat:
+        path = tmp_path / f"records.{file_format}"
+        generator.write(path, 400, file_format)
+        assert analyse_file(path, file_format).to_dict() == expected.to_dict()
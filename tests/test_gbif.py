@@ -0,0 +1,161 @@
+import asyncio
+import time
+
+import pytest
+from helpers.gbif_server import StubGBIFServer
+
+from mids.gbif import GBIFClient, GBIFError
+
+
+def occurrences(count: int) -> dict[int, dict]:
+    return {
+        gbif_id: {"key": gbif_id, "catalogNumber": str(gbif_id), "institutionCode": "x"}
+        for gbif_id in range(1, count + 1)
+    }
+
+
+async def collect(client: GBIFClient, gbif_ids) -> dict:
+    return {gbif_id: data async for gbif_id, data in client.get_occurrences(gbif_ids)}
+
+
+def test_get_occurrence():
+    with StubGBIFServer(occurrences(3)) as server:
+
+        async def run():
+            async with GBIFClient(server.url) as client:
+                assert (await client.get_occurrence(2))["key"] == 2
+                assert await client.get_occurrence(20) is None
+
+        asyncio.run(run())
+
+
+def test_get_occurrences():
+    data = occurrences(50)
+    with StubGBIFServer(data) as server:
+
+        async def run():
+            async with GBIFClient(server.url, concurrency=4) as client:
+                return await collect(client, [*data, 51])
+
+        results = asyncio.run(run())
+        assert results == {**data, 51: None}
+        # the connections should have been kept alive and reused
+        assert len(server.connections) <= 4
+
+
+def test_retries_with_backoff():
+    data = occurrences(5)
+    with StubGBIFServer(data, fail_first={2, 4}) as server:
+
+        async def run():
+            async with GBIFClient(server.url, concurrency=2, backoff=0.01) as client:
+                return await collect(client, data)
+
+        assert asyncio.run(run()) == data
+        assert len(server.requests) == 7
+
+
+def test_gives_up_after_retries():
+    with StubGBIFServer(occurrences(1), fail_first={1}) as server:
+
+        async def run():
+            async with GBIFClient(server.url, retries=0) as client:
+                await client.get_occurrence(1)
+
+        with pytest.raises(GBIFError):
+            asyncio.run(run())
+
+
+def test_retries_timeouts():
+    data = occurrences(3)
+    with StubGBIFServer(data, stall_first={2}, stall=0.3) as server:
+
+        async def run():
+            async with GBIFClient(server.url, backoff=0.01, timeout=0.1) as client:
+                return await collect(client, data)
+
+        assert asyncio.run(run()) == data
+        assert server.requests.count("/v1/occurrence/2") == 2
+
+
+def test_retries_invalid_json():
+    data = occurrences(3)
+    with StubGBIFServer(data, garble_first={2}) as server:
+
+        async def run():
+            async with GBIFClient(server.url, backoff=0.01) as client:
+                return await collect(client, data)
+
+        assert asyncio.run(run()) == data
+        assert server.requests.count("/v1/occurrence/2") == 2
+
+    with StubGBIFServer(data, garble_first={2}) as server:
+
+        async def run():
+            async with GBIFClient(server.url, retries=0) as client:
+                await client.get_occurrence(2)
+
+        with pytest.raises(GBIFError, match="JSONDecodeError"):
+            asyncio.run(run())
+
+
+def test_failures_per_id():
+    data = occurrences(3)
+    with StubGBIFServer(data, stall_first={2}, stall=0.3) as server:
+
+        async def run():
+            async with GBIFClient(server.url, retries=0, timeout=0.1) as client:
+                return {
+                    gbif_id: result
+                    async for gbif_id, result in client.get_occurrences(
+                        [*data, 4], errors=True
+                    )
+                }
+
+        results = asyncio.run(run())
+        assert isinstance(results.pop(2), GBIFError)
+        assert results == {1: data[1], 3: data[3], 4: None}
+
+        async def run_raising():
+            async with GBIFClient(server.url, retries=0, timeout=0.1) as client:
+                server.stall_first.add(1)
+                await collect(client, data)
+
+        with pytest.raises(GBIFError):
+            asyncio.run(run_raising())
+
+
+def test_rate_limit():
+    data = occurrences(5)
+    with StubGBIFServer(data) as server:
+
+        async def run():
+            async with GBIFClient(server.url, concurrency=5, rate=50) as client:
+                loop = asyncio.get_running_loop()
+                start = loop.time()
+                await collect(client, data)
+                return loop.time() - start
+
+        # 5 requests at 50 per second should take at least 4 intervals
+        assert asyncio.run(run()) >= 0.08
+
+
+def test_search_prefetches():
+    with StubGBIFServer(occurrences(25)) as server:
+
+        async def run():
+            counts = []
+            async with GBIFClient(server.url) as client:
+                async for offset, results in client.search_occurrences({}, limit=10):
+                    # process the page synchronously, as a survey scores it, giving
+                    # the next page's request time to arrive
+                    deadline = time.monotonic() + 1
+                    while len(server.requests) <= offset // 10:
+                        if time.monotonic() > deadline:
+                            break
+                        time.sleep(0.01)
+                    counts.append(len(server.requests))
+            return counts
+
+        # the next page was requested while each page was being processed
+        assert asyncio.run(run()) == [2, 3, 3]
@@ -0,0 +1,85 @@
+import io
+import json
+from pathlib import Path
+
+import pytest
+
+from mids.instrument import INSTRUMENTED, Profiler, profile
+from mids.lib import init
+from mids.model import Discipline, MIDSLevel
+
+
+def test_same_results(records: list[dict]):
+    mids = init(Discipline.biology)
+    plan = mids.plan
+    levels = list(map(mids.check, records))
+    reports = list(map(mids.compact_report, records))
+    presences = list(map(plan.presence, records))
+    checked = list(map(plan.check_presence, presences))
+
+    with profile(mids) as profiler:
+        assert all(name in vars(plan) for name in INSTRUMENTED)
+        assert list(map(mids.check, records)) == levels
+        assert list(map(mids.compact_report, records)) == reports
+        assert list(map(plan.check_presence, presences)) == checked
+
+    # the original methods are restored
+    assert not any(name in vars(plan) for name in INSTRUMENTED)
+    assert profiler.operations["check"].calls == len(records)
+    assert profiler.operations["evaluate"].calls == len(records)
+    assert profiler.operations["check_presence"].calls == len(records)
+
+
+def test_stats(records: list[dict]):
+    mids = init(Discipline.biology)
+    with profile(mids) as profiler:
+        for record in records:
+            mids.report(record)
+
+    # every element is evaluated by report
+    for index, element in enumerate(mids.plan.elements):
+        stats = profiler.elements[index]
+        assert stats.calls == len(records)
+        assert stats.hits == sum(element.match(record) for record in records)
+        # matchers are only evaluated until one matches
+        matchers = profiler.matchers[index]
+        assert matchers[0].calls == len(records)
+        assert sum(matcher.hits for matcher in matchers) == stats.hits
+    for level in MIDSLevel:
+        assert profiler.levels[level].hits == sum(
+            mids.report(record)[level].passed for record in records
+        )
+
+
+def test_check_short_circuits():
+    mids = init(Discipline.biology)
+    with profile(mids) as profiler:
+        assert mids.check({}) is None
+    assert profiler.levels[MIDSLevel.mids0].calls == 1
+    assert profiler.levels[MIDSLevel.mids1].calls == 0
+
+
+def test_already_profiled():
+    plan = init(Discipline.biology).plan
+    with Profiler(plan):
+        with pytest.raises(RuntimeError):
+            Profiler(plan).start()
+
+
+def test_output(records: list[dict], tmp_path: Path):
+    mids = init(Discipline.biology)
+    with profile(mids) as profiler:
+        for record in records:
+            mids.check(record)
+    path = tmp_path / "profile.json"
+    profiler.save(path)
+    data = json.loads(path.read_text())
+    assert data["operations"]["check"]["calls"] == len(records)
+    assert data["elements"]["Organization"]["level"] == "mids0"
+    assert data["elements"]["Organization"]["matchers"]
+
+    table = io.StringIO()
+    profiler.print_table(table)
+    lines = table.getvalue().splitlines()
+    assert lines[0].split()[0] == "kind"
+    assert len(lines) == len(profiler.rows()) + 1
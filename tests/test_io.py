@@ -1,4 +1,24 @@
-from mids.io import read_mapping, read_metadata
+import json
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from mids import io
+from mids.io import (
+    COMPILED_VERSION,
+    cache_dir,
+    compile_mapping,
+    compiled_path,
+    load_mapping,
+    read_compiled,
+    read_mapping,
+    read_metadata,
+    source_hash,
+    source_paths,
+)
 from mids.model import Discipline
 
 
@@ -15,3 +35,85 @@ def test_read_metadata():
     mapping = read_metadata(Discipline.biology)
     assert mapping
     assert isinstance(mapping, dict)
+
+
+@pytest.fixture
+def sources(tmp_path: Path, monkeypatch) -> Path:
+    # copy the source files somewhere they can be modified
+    for path in source_paths(Discipline.biology):
+        shutil.copy(path, tmp_path / path.name)
+    monkeypatch.setattr(io, "sssom_path", tmp_path)
+    monkeypatch.setenv("MIDS_CACHE_DIR", str(tmp_path / "cache"))
+    return tmp_path
+
+
+def test_cache_dir(tmp_path: Path, monkeypatch):
+    monkeypatch.delenv("MIDS_CACHE_DIR", raising=False)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    assert cache_dir() == tmp_path / "pymids"
+    monkeypatch.setenv("MIDS_CACHE_DIR", str(tmp_path / "mids"))
+    assert cache_dir() == tmp_path / "mids"
+
+
+def test_compile_mapping(sources: Path):
+    path = compile_mapping(Discipline.biology)
+    assert path == compiled_path(Discipline.biology)
+    # the compiled file is written to the cache directory, not alongside the sources
+    assert path.parent == sources / "cache"
+    # and no temporary files are left behind
+    assert list(path.parent.iterdir()) == [path]
+
+    compiled = read_compiled(Discipline.biology)
+    assert compiled["version"] == COMPILED_VERSION
+    assert compiled["hash"] == source_hash(Discipline.biology)
+    assert compiled["curie_map"] == read_metadata(Discipline.biology)["curie_map"]
+    assert len(compiled["mapping"]) == len(read_mapping(Discipline.biology))
+
+
+def test_read_compiled_stale(sources: Path):
+    assert read_compiled(Discipline.biology) is None
+    compile_mapping(Discipline.biology)
+    assert read_compiled(Discipline.biology) is not None
+
+    tsv_path, _ = source_paths(Discipline.biology)
+    with tsv_path.open("a") as f:
+        f.write("\n")
+    assert read_compiled(Discipline.biology) is None
+
+
+def test_read_compiled_version(sources: Path):
+    path = compile_mapping(Discipline.biology)
+    compiled = json.loads(path.read_text())
+    compiled["version"] = COMPILED_VERSION - 1
+    path.write_text(json.dumps(compiled))
+    assert read_compiled(Discipline.biology) is None
+
+
+def test_load_mapping_rebuilds(sources: Path):
+    mapping, curie_map = load_mapping(Discipline.biology)
+    assert compiled_path(Discipline.biology).exists()
+    assert mapping == read_compiled(Discipline.biology)["mapping"]
+    assert curie_map == read_metadata(Discipline.biology)["curie_map"]
+
+
+def test_load_mapping_unwritable(sources: Path, monkeypatch):
+    # the cache directory can't be created as there's a file in the way
+    (sources / "cache").write_text("")
+    with pytest.warns(UserWarning, match="MIDS_CACHE_DIR"):
+        mapping, curie_map = load_mapping(Discipline.biology)
+    assert mapping == read_mapping(Discipline.biology)
+    assert curie_map == read_metadata(Discipline.biology)["curie_map"]
+
+
+def test_load_mapping_without_yaml(sources: Path):
+    # the subprocess reads the real source files, which these are copies of, and
+    # inherits the cache directory
+    compile_mapping(Discipline.biology)
+    code = (
+        "import sys; from mids.lib import init; init('biology'); "
+        "print('yaml' in sys.modules)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == "False"
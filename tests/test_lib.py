@@ -1,5 +1,5 @@
 from mids.lib import init, MIDS
-from mids.model import Discipline
+from mids.model import Discipline, MIDSLevel
 
 
 def test_can_be_loaded():
@@ -10,3 +10,134 @@ def test_can_be_loaded():
 def test_check():
     mids = init(Discipline.biology)
     data = {}
+    assert mids.check(data) is None
+    data.update(catalogNumber="1", institutionCode="NHMUK")
+    assert mids.check(data) == MIDSLevel.mids0
+    data.update(
+        scientificName="Larus",
+        basisOfRecord="PreservedSpecimen",
+        preparations="skin",
+        license="CC0",
+        modified="2024",
+    )
+    assert mids.check(data) == MIDSLevel.mids1
+    # latitude alone isn't enough for the intersection
+    data.update(
+        country="UK",
+        decimalLatitude="51.5",
+        recordedBy="Dillen",
+        eventDate="2024",
+        recordNumber="1",
+        associatedMedia="http://example.com/image.jpg",
+    )
+    assert mids.check(data) == MIDSLevel.mids1
+    data.update(decimalLongitude="-0.17")
+    assert mids.check(data) == MIDSLevel.mids2
+
+
+def test_report():
+    mids = init(Discipline.biology)
+    data = {"catalogNumber": "1", "institutionCode": "NHMUK", "scientificName": ""}
+    report = mids.report(data)
+    assert report.level == mids.check(data) == MIDSLevel.mids0
+    assert report[MIDSLevel.mids0].passed
+    assert not report[MIDSLevel.mids1].passed
+    assert {element.name for element in report[MIDSLevel.mids1].fails} == {
+        "Name",
+        "SpecimenType",
+        "ObjectType",
+        "License",
+        "Modified",
+    }
+    for result in report:
+        for element, passed in result:
+            assert element.match(data) == passed
+
+
+def test_lazy_report():
+    mids = init(Discipline.biology)
+    data = {"catalogNumber": "1", "institutionCode": "NHMUK", "scientificName": ""}
+    report = mids.report(data, lazy=True)
+    assert report.results.evaluated == []
+    assert report.level == MIDSLevel.mids0
+    # evaluation stops at the first failing level
+    assert report.results.evaluated == [MIDSLevel.mids0, MIDSLevel.mids1]
+    # the level is found without building any element lists
+    assert not any("elements" in vars(result) for result in report.results.values())
+    assert report.evaluate().results.evaluated == list(MIDSLevel)
+    full = mids.report(data)
+    for lazy_result, result in zip(report, full):
+        assert lazy_result == result
+    report = mids.report({"dwc:catalogNumber": "1"}, aliases=True, lazy=True)
+    assert [element.name for element in report[MIDSLevel.mids0].fails] == [
+        "Organization"
+    ]
+
+
+def test_init_is_cached():
+    assert init(Discipline.biology) is init(Discipline.biology)
+    mids = init(Discipline.biology)
+    init.cache_clear()
+    assert init(Discipline.biology) is not mids
+
+
+def test_dependents():
+    mids = init(Discipline.biology)
+    names = {element.name for element in mids.dependents("catalogNumber")}
+    assert "PhysicalSpecimenID" in names
+    assert mids.dependents("notAField") == []
+
+
+def test_update_report():
+    mids = init(Discipline.biology)
+    data = {"catalogNumber": "1", "institutionCode": "NHMUK", "scientificName": ""}
+    report = mids.compact_report(data)
+    data.update(scientificName="Paradoxurus hermaphroditus", license="CC0")
+    updated = mids.update_report(report, data, ["scientificName", "license"])
+    assert updated == mids.compact_report(data)
+    assert report.level == MIDSLevel.mids0
+
+
+def test_check_aliases():
+    mids = init(Discipline.biology)
+    data = {
+        "http://rs.tdwg.org/dwc/terms/catalogNumber": "1",
+        "dwc:institutionCode": "NHMUK",
+        "scientificName": "Larus",
+        "basisOfRecord": "PreservedSpecimen",
+        "preparations": "skin",
+        "modified": "2024",
+    }
+    assert mids.check(data) is None
+    assert mids.check(data, aliases=True) == MIDSLevel.mids0
+    # the license is held in a nested media record, as in GBIF occurrences
+    data["media"] = [{"type": "StillImage", "license": "CC0"}]
+    assert mids.check(data, aliases=True) == MIDSLevel.mids1
+    assert mids.compact_report(data, aliases=True).level == MIDSLevel.mids1
+    assert mids.report(data, aliases=True).level == MIDSLevel.mids1
+    # GBIF's identifiers list isn't a nested record container, so it doesn't make
+    # dc:identifier present
+    data["identifiers"] = [{"identifier": "urn:catalog:NHMUK:1"}]
+    identifier = 1 << mids.plan.term_index["identifier"]
+    assert not mids.plan.resolve(data) & identifier
+    assert mids.check(data, aliases=True) == MIDSLevel.mids1
+
+
+def test_gap():
+    mids = init(Discipline.biology)
+    assert mids.gap({"catalogNumber": "1"}) == (
+        MIDSLevel.mids0,
+        ["ownerInstitutionCode"],
+    )
+    data = {
+        "catalogNumber": "1",
+        "institutionCode": "NHMUK",
+        "scientificName": "Larus",
+        "basisOfRecord": "PreservedSpecimen",
+        "preparations": "skin",
+    }
+    level, missing = mids.gap(data)
+    assert level == MIDSLevel.mids1
+    assert sorted(missing) == ["license", "modified"]
+    data.update(license="CC0", modified="2024")
+    assert mids.check(data) == MIDSLevel.mids1
@@ -68,3 +68,29 @@ def test_intersection_of_matcher():
         )
         assert not matcher({"beans": "yep!", "decimalLongitude": empty_value})
         assert not matcher({"beans": "yep!", "decimalLatitude": empty_value})
+
+
+def test_matcher_mask():
+    term_index = {"decimalLatitude": 0, "decimalLongitude": 3, "occurrenceID": 5}
+    exact = ExactMatcher(
+        Identifier("http://rs.tdwg.org/dwc/terms/occurrenceID", "occurrenceID", "dwc")
+    )
+    assert exact.terms == ("occurrenceID",)
+    assert exact.mask(term_index) == 0b100000
+
+    intersection = IntersectionOfMatcher(
+        [
+            Identifier(
+                "http://rs.tdwg.org/dwc/terms/decimalLatitude",
+                "decimalLatitude",
+                "dwc",
+            ),
+            Identifier(
+                "http://rs.tdwg.org/dwc/terms/decimalLongitude",
+                "decimalLongitude",
+                "dwc",
+            ),
+        ]
+    )
+    assert intersection.terms == ("decimalLatitude", "decimalLongitude")
+    assert intersection.mask(term_index) == 0b1001
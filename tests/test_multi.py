@@ -0,0 +1,99 @@
+import shutil
+from pathlib import Path
+from typing import Callable
+
+import pytest
+
+from mids.io import sssom_path
+from mids.lib import load
+from mids.model import MIDSLevel
+from mids.multi import MultiMIDS
+from mids.summary import MIDSSummary
+from mids.synthetic import RecordGenerator
+
+
+@pytest.fixture
+def mapping_dir(tmp_path: Path) -> Path:
+    # a copy of the v0.1 biology mapping set and a made up newer version of it, which
+    # drops the media element, moves Modified up a level and adds a new term
+    for suffix in ("tsv", "yml"):
+        shutil.copy(
+            sssom_path / f"v0.1_biology.sssom.{suffix}",
+            tmp_path / f"v0.1_biology.sssom.{suffix}",
+        )
+    shutil.copy(
+        sssom_path / "v0.1_biology.sssom.yml", tmp_path / "v0.2_biology.sssom.yml"
+    )
+    lines = (sssom_path / "v0.1_biology.sssom.tsv").read_text().splitlines()
+    new_lines = [lines[0]]
+    for line in lines[1:]:
+        if line.startswith("mids:media\t"):
+            continue
+        if line.startswith("mids:Modified\t"):
+            line = line.replace("\tmids1\t", "\tmids2\t", 1)
+        new_lines.append(line)
+        if line.startswith("mids:Name\t") and "dwc:scientificName\t" in line:
+            new_lines.append(line.replace("dwc:scientificName\t", "dwc:genus\t", 1))
+    (tmp_path / "v0.2_biology.sssom.tsv").write_text("\n".join(new_lines) + "\n")
+    # a TSV without a YML file isn't a mapping set
+    (tmp_path / "notes.sssom.tsv").write_text("")
+    return tmp_path
+
+
+def test_from_directory(mapping_dir: Path):
+    multi = MultiMIDS.from_directory(mapping_dir)
+    assert multi.names == ["v0.1_biology", "v0.2_biology"]
+    assert "genus" in multi.terms
+    assert len(multi.terms) == len(set(multi.terms))
+    for plan in multi.plans.values():
+        assert plan.terms == multi.terms
+
+
+def test_check_matches_each_mapping(
+    mapping_dir: Path, record_generator: Callable[..., RecordGenerator]
+):
+    multi = MultiMIDS.from_directory(mapping_dir)
+    single = {name: load(mapping_dir / f"{name}.sssom.tsv") for name in multi.names}
+    generator = record_generator(multi.plans["v0.2_biology"], seed=3, density=0.5)
+    records = list(generator.records(500))
+    for record in records:
+        levels = multi.check(record)
+        assert levels == {name: mids.check(record) for name, mids in single.items()}
+        reports = multi.compact_reports(record)
+        assert {name: report.level for name, report in reports.items()} == levels
+
+    summaries = multi.summarise(records)
+    for name, mids in single.items():
+        expected = MIDSSummary.for_plan(mids.plan)
+        for record in records:
+            expected.add_record(mids.plan, record)
+        assert summaries[name].final_levels == expected.final_levels
+        assert summaries[name].element_fails == expected.element_fails
+
+
+def test_versions_differ(mapping_dir: Path):
+    multi = MultiMIDS.from_directory(mapping_dir)
+    data = {
+        "catalogNumber": "1",
+        "institutionCode": "NHMUK",
+        "genus": "Larus",
+        "basisOfRecord": "PreservedSpecimen",
+        "preparations": "skin",
+        "license": "CC0",
+    }
+    assert multi.check(data) == {
+        "v0.1_biology": MIDSLevel.mids0,
+        "v0.2_biology": MIDSLevel.mids1,
+    }
+    assert multi.check({"dwc:catalogNumber": "1", "dwc:institutionCode": "x"}) == {
+        "v0.1_biology": None,
+        "v0.2_biology": None,
+    }
+    assert multi.check(
+        {"dwc:catalogNumber": "1", "dwc:institutionCode": "x"}, aliases=True
+    ) == {"v0.1_biology": MIDSLevel.mids0, "v0.2_biology": MIDSLevel.mids0}
+
+
+def test_requires_mappings():
+    with pytest.raises(ValueError):
+        MultiMIDS({})
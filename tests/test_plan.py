@@ -0,0 +1,247 @@
+import random
+
+import pytest
+
+from mids.lib import init
+from mids.matchers import ExactMatcher, IntersectionOfMatcher
+from mids.model import Discipline, Identifier, Matcher, MIDSElement, MIDSLevel
+from mids.plan import Plan
+
+
+def identifier(name: str) -> Identifier:
+    return Identifier(f"http://example.com/{name}", name, "ex")
+
+
+def reference_check(levels: dict, data: dict) -> MIDSLevel | None:
+    # the original, uncompiled, way of calculating the level
+    matched = None
+    for level in MIDSLevel:
+        if all(element.match(data) for element in levels.get(level, [])):
+            matched = level
+        else:
+            break
+    return matched
+
+
+@pytest.fixture
+def levels() -> dict[MIDSLevel, list[MIDSElement]]:
+    return {
+        MIDSLevel.mids0: [
+            MIDSElement(
+                identifier("e0"), MIDSLevel.mids0, [ExactMatcher(identifier("a"))]
+            ),
+        ],
+        MIDSLevel.mids1: [
+            MIDSElement(
+                identifier("e1"),
+                MIDSLevel.mids1,
+                [
+                    ExactMatcher(identifier("b")),
+                    IntersectionOfMatcher([identifier("a"), identifier("c")]),
+                ],
+            ),
+        ],
+        MIDSLevel.mids2: [
+            MIDSElement(
+                identifier("e2"),
+                MIDSLevel.mids2,
+                [ExactMatcher(identifier("a")), ExactMatcher(identifier("d"))],
+            ),
+        ],
+        MIDSLevel.mids3: [
+            MIDSElement(
+                identifier("e3"),
+                MIDSLevel.mids3,
+                [IntersectionOfMatcher([identifier("c"), identifier("d")])],
+            ),
+        ],
+    }
+
+
+class TestPlan:
+    def test_term_table_is_deduplicated(self, levels):
+        plan = Plan(levels)
+        assert plan.terms == ["a", "b", "c", "d"]
+        assert plan.term_index == {"a": 0, "b": 1, "c": 2, "d": 3}
+
+    def test_level_lookups(self, levels):
+        plan = Plan(levels)
+        assert plan.level_lookups[MIDSLevel.mids0] == (("a", 1),)
+        assert plan.level_lookups[MIDSLevel.mids1] == (("b", 2), ("c", 4))
+        assert plan.level_lookups[MIDSLevel.mids2] == (("d", 8),)
+        assert plan.level_lookups[MIDSLevel.mids3] == ()
+
+    def test_presence(self, levels):
+        plan = Plan(levels)
+        assert plan.presence({}) == 0
+        assert plan.presence({"a": "x", "b": "", "c": None, "e": "x"}) == 0b0001
+        assert plan.presence({"a": "x", "b": "x", "c": "x", "d": "x"}) == 0b1111
+
+    def test_evaluate(self, levels):
+        plan = Plan(levels)
+        assert plan.evaluate(0) == 0
+        # a alone matches e0 and e2
+        assert plan.evaluate(0b0001) == 0b0101
+        # a and c match e0, e1 (via the intersection) and e2
+        assert plan.evaluate(0b0101) == 0b0111
+        # c alone doesn't match anything
+        assert plan.evaluate(0b0100) == 0
+
+    def test_level(self, levels):
+        plan = Plan(levels)
+        assert plan.level(0) is None
+        assert plan.level(0b0001) == MIDSLevel.mids0
+        assert plan.level(0b0111) == MIDSLevel.mids2
+        assert plan.level(0b1110) is None
+        assert plan.level(0b1111) == MIDSLevel.mids3
+
+    def test_check_matches_reference(self, levels):
+        plan = Plan(levels)
+        rng = random.Random(42)
+        for _ in range(500):
+            data = {
+                term: rng.choice(["x", "", None])
+                for term in ["a", "b", "c", "d", "e"]
+                if rng.random() < 0.6
+            }
+            assert plan.check(data) == reference_check(levels, data)
+
+    def test_check_matches_reference_biology(self):
+        mids = init(Discipline.biology)
+        terms = mids.plan.terms
+        rng = random.Random(42)
+        for density in (0.2, 0.5, 0.8, 0.95):
+            for _ in range(250):
+                data = {term: "x" for term in terms if rng.random() < density}
+                assert mids.plan.check(data) == reference_check(mids.levels, data)
+
+    def test_affected(self, levels):
+        plan = Plan(levels)
+        # a is used by e0, e1 (via the intersection) and e2
+        assert plan.affected(["a"]) == 0b0111
+        assert plan.affected(["http://example.com/d"]) == 0b1100
+        assert plan.affected(["unused"]) == 0
+        assert plan.affected(["c", "e"]) == 0b1010
+
+    def test_update_matches_evaluate(self, levels):
+        plan = Plan(levels)
+        terms = ["a", "b", "c", "d", "e"]
+        rng = random.Random(7)
+        for _ in range(500):
+            data = {term: "x" for term in terms if rng.random() < 0.5}
+            element_bits = plan.evaluate(plan.presence(data))
+            changed = rng.sample(terms, rng.randint(0, 3))
+            for term in changed:
+                data[term] = rng.choice(["x", ""])
+            expected = plan.evaluate(plan.presence(data))
+            assert plan.update(element_bits, data, changed) == expected
+
+    def test_check_presence(self, levels):
+        plan = Plan(levels)
+        for presence in range(1 << len(plan.terms)):
+            assert plan.check_presence(presence) == plan.level(plan.evaluate(presence))
+
+    def test_matcher_without_terms(self, levels):
+        class AlwaysMatcher(Matcher):
+            def __init__(self):
+                super().__init__("always")
+                self.identifiers = []
+
+            def __call__(self, data: dict) -> bool:
+                return True
+
+        class EmptyMatcher(AlwaysMatcher):
+            terms = ()
+
+        for matcher in (AlwaysMatcher(), EmptyMatcher()):
+            element = MIDSElement(identifier("e"), MIDSLevel.mids3, [matcher])
+            with pytest.raises(ValueError, match="has no terms"):
+                Plan({**levels, MIDSLevel.mids3: [element]})
+
+    def test_passes_level(self, levels):
+        plan = Plan(levels)
+        for presence in range(1 << len(plan.terms)):
+            element_bits = plan.evaluate(presence)
+            for level, mask in plan.level_masks.items():
+                passed = element_bits & mask == mask
+                assert plan.passes_level(level, presence) == passed
+
+    def test_fingerprint(self, levels):
+        assert Plan(levels).fingerprint() == Plan(levels).fingerprint()
+        fewer = {level: elements for level, elements in levels.items() if level < 3}
+        assert Plan(fewer).fingerprint() != Plan(levels).fingerprint()
+
+    def test_aliases(self, levels):
+        plan = Plan(levels)
+        assert plan.aliases["c"] == 4
+        assert plan.aliases["ex:c"] == 4
+        assert plan.aliases["http://example.com/c"] == 4
+
+    def test_resolve(self, levels):
+        plan = Plan(levels)
+        rng = random.Random(7)
+        keys = [lambda t: t, lambda t: f"ex:{t}", lambda t: f"http://example.com/{t}"]
+        for _ in range(200):
+            data = {
+                term: rng.choice(["x", "", None])
+                for term in plan.terms
+                if rng.random() < 0.7
+            }
+            mixed = {rng.choice(keys)(term): value for term, value in data.items()}
+            mixed["other"] = "x"
+            assert plan.resolve(mixed) == plan.presence(data)
+
+    def test_resolve_nested(self, levels):
+        plan = Plan(levels)
+        data = {
+            "a": "x",
+            "b": [],
+            "media": [{"ex:c": ""}, {"c": "x"}],
+            "extensions": {"http://example.com/ext": [{"http://example.com/d": "x"}]},
+        }
+        assert plan.resolve(data) == 0b1101
+        # a term with a non-empty list value is present
+        assert plan.resolve({"b": ["x"]}) == 0b10
+
+    def test_resolve_unrelated_nested(self, levels):
+        plan = Plan(levels)
+        # nested records outside the container keys don't make their terms present
+        data = {"a": "x", "identifiers": [{"c": "x"}], "other": {"d": "x"}}
+        assert plan.resolve(data) == 0b1
+        assert Plan(levels, containers={"identifiers"}).resolve(data) == 0b101
+        assert Plan(levels, containers=()).resolve({"media": [{"c": "x"}]}) == 0
+
+    def test_starting_terms(self, levels):
+        plan = Plan(levels)
+        shared = Plan(levels, ["z", "c", "a"])
+        assert shared.terms == ["z", "c", "a", "b", "d"]
+        rng = random.Random(3)
+        for _ in range(200):
+            data = {term: "x" for term in shared.terms if rng.random() < 0.5}
+            assert shared.check(data) == plan.check(data)
+            assert shared.level(shared.evaluate(shared.presence(data))) == plan.check(
+                data
+            )
+
+    def test_gap(self, levels):
+        plan = Plan(levels)
+        terms = len(plan.terms)
+        order = [None, *MIDSLevel]
+        for presence in range(1 << terms):
+            level = plan.check_presence(presence)
+            gap = plan.gap(presence)
+            if level == MIDSLevel.mids3:
+                assert gap is None
+                continue
+            target, missing = gap
+            assert target == order[order.index(level) + 1]
+            assert not missing & presence
+            reached = plan.check_presence(presence | missing)
+            assert reached is not None and reached >= target
+            # no smaller set of terms reaches the target level
+            for extra in range(1 << terms):
+                if extra & presence or extra.bit_count() >= missing.bit_count():
+                    continue
+                reached = plan.check_presence(presence | extra)
+                assert reached is None or reached < target
+        assert plan.term_names(0b1010) == ["b", "d"]
@@ -0,0 +1,150 @@
+import http.client
+import json
+import threading
+
+import pytest
+
+from mids.lib import init
+from mids.model import Discipline
+from mids.server import MIDSServer
+
+
+@pytest.fixture(scope="module")
+def server() -> MIDSServer:
+    server = MIDSServer(("127.0.0.1", 0))
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def connection(server: MIDSServer) -> http.client.HTTPConnection:
+    connection = http.client.HTTPConnection(*server.server_address[:2])
+    yield connection
+    connection.close()
+
+
+def request(
+    connection: http.client.HTTPConnection,
+    method: str,
+    path: str,
+    body: bytes | None = None,
+    headers: dict | None = None,
+) -> tuple[int, http.client.HTTPResponse, bytes]:
+    connection.request(method, path, body=body, headers=headers or {})
+    response = connection.getresponse()
+    return response.status, response, response.read()
+
+
+records = [
+    {"catalogNumber": "1", "institutionCode": "NHMUK"},
+    {"catalogNumber": "2"},
+    {},
+]
+
+
+def test_check_and_report(connection: http.client.HTTPConnection):
+    mids = init(Discipline.biology)
+    for record in records:
+        status, _, body = request(connection, "POST", "/check", json.dumps(record))
+        assert status == 200
+        assert json.loads(body) == {"level": mids.check(record)}
+
+        status, _, body = request(connection, "POST", "/report", json.dumps(record))
+        assert status == 200
+        assert json.loads(body) == json.loads(
+            json.dumps(mids.compact_report(record).to_dict())
+        )
+
+
+def test_batch(connection: http.client.HTTPConnection):
+    mids = init(Discipline.biology)
+    batch = records * 700
+    expected = [{"level": mids.check(record)} for record in batch]
+
+    ndjson = "\n".join(map(json.dumps, batch)).encode("utf-8")
+    status, response, body = request(connection, "POST", "/check/batch", ndjson)
+    assert status == 200
+    assert response.getheader("Transfer-Encoding") == "chunked"
+    assert list(map(json.loads, body.splitlines())) == expected
+
+    status, _, body = request(
+        connection,
+        "POST",
+        "/report/batch",
+        json.dumps(batch[:10]),
+        {"Content-Type": "application/json"},
+    )
+    assert status == 200
+    assert [json.loads(line)["level"] for line in body.splitlines()] == [
+        line["level"] for line in expected[:10]
+    ]
+
+
+def test_keep_alive(server: MIDSServer, connection: http.client.HTTPConnection):
+    for _ in range(3):
+        request(connection, "POST", "/check", json.dumps(records[0]))
+    socket = connection.sock
+    request(connection, "GET", "/health")
+    assert connection.sock is socket
+
+
+def test_errors(connection: http.client.HTTPConnection):
+    assert request(connection, "POST", "/check", b"{nope")[0] == 400
+    assert request(connection, "POST", "/check", b"[]")[0] == 400
+    assert request(connection, "POST", "/check?discipline=nope", b"{}")[0] == 400
+    assert request(connection, "POST", "/nope", b"{}")[0] == 404
+    assert request(connection, "GET", "/nope")[0] == 404
+
+    # an invalid record part way through a batch gets an error line in its place
+    status, _, body = request(connection, "POST", "/check/batch", b'{}\n"x"\n{}\n')
+    assert status == 200
+    lines = list(map(json.loads, body.splitlines()))
+    assert lines[0] == lines[2] == {"level": None}
+    assert lines[1]["record"] == 1
+    assert "error" in lines[1]
+    # and the connection can still be used
+    socket = connection.sock
+    assert request(connection, "GET", "/health")[0] == 200
+    assert connection.sock is socket
+
+
+def test_record_errors(connection: http.client.HTTPConnection):
+    def errors() -> int:
+        return json.loads(request(connection, "GET", "/metrics")[2])["errors"]
+
+    before = errors()
+    # a list value can't be checked
+    bad = {"catalogNumber": ["1"]}
+    for endpoint in ("/check", "/report"):
+        status, _, body = request(connection, "POST", endpoint, json.dumps(bad))
+        assert status == 400
+        assert "error" in json.loads(body)
+    assert errors() == before + 2
+
+    batch = [records[0], bad, records[1], bad]
+    for body, headers in [
+        ("\n".join(map(json.dumps, batch)), {}),
+        (json.dumps(batch), {"Content-Type": "application/json"}),
+    ]:
+        status, _, body = request(connection, "POST", "/check/batch", body, headers)
+        assert status == 200
+        lines = list(map(json.loads, body.splitlines()))
+        assert len(lines) == len(batch)
+        assert "level" in lines[0] and "level" in lines[2]
+        assert lines[1]["record"] == 1
+        assert lines[3]["record"] == 3
+    assert errors() == before + 6
+
+
+def test_metrics(connection: http.client.HTTPConnection):
+    request(connection, "POST", "/check", json.dumps(records[0]))
+    status, _, body = request(connection, "GET", "/metrics")
+    assert status == 200
+    metrics = json.loads(body)
+    assert metrics["requests"]["/check"] >= 1
+    assert metrics["records"] >= 1
+    assert metrics["latency"]["count"] >= 1
+    assert metrics["latency"]["max"] >= metrics["latency"]["p50"] >= 0
@@ -0,0 +1,191 @@
+import csv
+import json
+from pathlib import Path
+
+import pytest
+
+from mids import shard
+from mids.lib import init
+from mids.model import Discipline, MIDSLevel, NO_LEVEL
+from mids.shard import (
+    ColumnSelection,
+    FileFormat,
+    check_file,
+    summarise_file,
+    iter_lines,
+    iter_records,
+    line_presence,
+    read_columns,
+    report_file,
+    scan_presence,
+    shard_ranges,
+)
+
+
+@pytest.fixture
+def ndjson_file(tmp_path: Path, records: list[dict]) -> Path:
+    path = tmp_path / "records.ndjson"
+    with path.open("w") as f:
+        for record in records:
+            f.write(f"{json.dumps(record)}\n")
+    return path
+
+
+@pytest.fixture
+def csv_file(tmp_path: Path, records: list[dict]) -> Path:
+    path = tmp_path / "records.csv"
+    with path.open("w", newline="") as f:
+        writer = csv.DictWriter(f, init(Discipline.biology).plan.terms)
+        writer.writeheader()
+        writer.writerows(records)
+    return path
+
+
+def expected_levels(records: list[dict]) -> list[int]:
+    mids = init(Discipline.biology)
+    return [NO_LEVEL if level is None else level for level in map(mids.check, records)]
+
+
+def test_shard_ranges(ndjson_file: Path, records: list[dict]):
+    for shards in (1, 2, 3, 7, 1000):
+        ranges = shard_ranges(ndjson_file, shards)
+        assert ranges[0][0] == 0
+        assert ranges[-1][1] == ndjson_file.stat().st_size
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            assert end == start
+        read = [
+            record
+            for start, end in ranges
+            for record in iter_records(ndjson_file, FileFormat.ndjson, start, end)
+        ]
+        assert read == records
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_check_file_ndjson(ndjson_file: Path, records: list[dict], workers: int):
+    levels = list(check_file(ndjson_file, FileFormat.ndjson, workers))
+    assert levels == expected_levels(records)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_check_file_csv(csv_file: Path, records: list[dict], workers: int):
+    levels = list(check_file(csv_file, FileFormat.csv, workers))
+    assert levels == expected_levels(records)
+
+
+@pytest.mark.parametrize("file_format", [FileFormat.ndjson, FileFormat.csv])
+def test_check_file_streams(
+    ndjson_file: Path,
+    csv_file: Path,
+    records: list[dict],
+    file_format: FileFormat,
+    monkeypatch,
+):
+    path = ndjson_file if file_format == FileFormat.ndjson else csv_file
+    monkeypatch.setattr(shard, "IN_PROCESS_SHARD_SIZE", 2000)
+    shards = []
+    check_shard = shard._check_shard
+
+    def counting_check_shard(*args):
+        shards.append(args[-1])
+        return check_shard(*args)
+
+    monkeypatch.setattr(shard, "_check_shard", counting_check_shard)
+    levels = check_file(path, file_format)
+    first = next(levels)
+    # only the first shard has been scored when the first result is available
+    assert len(shards) == 1
+    assert [first, *levels] == expected_levels(records)
+    assert len(shards) > 1
+
+
+def test_summarise_file(ndjson_file: Path, records: list[dict]):
+    summary = summarise_file(ndjson_file, FileFormat.ndjson, 2)
+    assert summary.total == len(records)
+    levels = expected_levels(records)
+    for level in [None, *MIDSLevel]:
+        code = NO_LEVEL if level is None else level
+        assert summary.level_count(level) == levels.count(code)
+
+
+def test_report_file(csv_file: Path, records: list[dict]):
+    mids = init(Discipline.biology)
+    for element_bits, record in zip(
+        report_file(csv_file, FileFormat.csv, 2), records, strict=True
+    ):
+        assert mids.results(element_bits) == mids.report(record).results
+
+
+def test_column_selection():
+    plan = init(Discipline.biology).plan
+    header = ["extra", "catalogNumber", "other", "institutionCode"]
+    columns = ColumnSelection.for_plan(plan, header)
+    assert columns.indexes == (1, 3)
+    assert columns.names == ["catalogNumber", "institutionCode"]
+    assert columns.skipped == ["extra", "other"]
+    rows = [["a", "1", "b", "NHMUK"], ["a", "2"], []]
+    assert list(columns.extract(rows)) == [
+        {"catalogNumber": "1", "institutionCode": "NHMUK"},
+        {"catalogNumber": "2"},
+        {},
+    ]
+    single = ColumnSelection.for_plan(plan, ["extra", "catalogNumber"])
+    assert list(single.extract([["a", "1"]])) == [{"catalogNumber": "1"}]
+    assert list(ColumnSelection.for_plan(plan, ["extra"]).extract([["a"]])) == [{}]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_check_file_wide_tsv(tmp_path: Path, records: list[dict], workers: int):
+    terms = init(Discipline.biology).plan.terms
+    header = [f"unused{i}" for i in range(50)] + terms
+    path = tmp_path / "records.tsv"
+    with path.open("w", newline="") as f:
+        writer = csv.DictWriter(
+            f, header, delimiter="\t", quoting=csv.QUOTE_NONE, restval=""
+        )
+        writer.writeheader()
+        writer.writerows(records)
+    columns, _ = read_columns(path, FileFormat.tsv, init(Discipline.biology).plan)
+    assert columns.names == terms
+    assert len(columns.skipped) == 50
+    levels = list(check_file(path, FileFormat.tsv, workers))
+    assert levels == expected_levels(records)
+
+
+def test_scan_presence(tmp_path: Path, records: list[dict]):
+    plan = init(Discipline.biology).plan
+    header = ["unused", *plan.terms[:-2]]
+    lines = ["\t".join(header)]
+    for index, record in enumerate(records):
+        row = ["u", *(record.get(term) or "" for term in header[1:])]
+        # include some short rows, blank lines, whitespace only lines, rows ending in
+        # empty fields and CRLF line endings
+        if index % 7 == 0:
+            row = row[: 1 + index % len(row)]
+        lines.append("\t".join(row))
+        if index % 11 == 0:
+            lines.append("")
+        if index % 13 == 0:
+            lines.append(" \t\t")
+    path = tmp_path / "records.tsv"
+    path.write_bytes(("\r\n".join(lines) + "\r\n").encode("utf-8"))
+
+    columns, start = read_columns(path, FileFormat.tsv, plan)
+    expected = [
+        plan.presence(record)
+        for record in iter_records(
+            path, FileFormat.tsv, start, path.stat().st_size, columns
+        )
+    ]
+    assert len(expected) == len(records)
+    for shards in (1, 3, 10):
+        scanned = [
+            presence
+            for shard_start, shard_end in shard_ranges(path, shards, start)
+            for presence in scan_presence(path, plan, columns, shard_start, shard_end)
+        ]
+        assert scanned == expected
+    # lines scanned on their own give the same results
+    presence = line_presence(FileFormat.tsv, plan, columns)
+    lines = iter_lines(path, start, path.stat().st_size)
+    assert list(map(presence, lines)) == expected
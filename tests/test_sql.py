@@ -0,0 +1,100 @@
+import sqlite3
+
+import pytest
+
+from mids.lib import init
+from mids.model import Discipline
+from mids.sql import ELEMENT_COLUMN_PREFIX, quote, SQLDialect
+
+
+def create_table(records: list[dict], columns: list[str]) -> sqlite3.Connection:
+    connection = sqlite3.connect(":memory:")
+    connection.execute(
+        f"CREATE TABLE records ({', '.join(quote(column) for column in columns)})"
+    )
+    placeholders = ", ".join("?" * len(columns))
+    connection.executemany(
+        f"INSERT INTO records VALUES ({placeholders})",
+        ([record.get(column) for column in columns] for record in records),
+    )
+    return connection
+
+
+def test_quote():
+    assert quote("a") == '"a"'
+    assert quote('a"b') == '"a""b"'
+
+
+def test_sqlite_level(records: list[dict]):
+    mids = init(Discipline.biology)
+    connection = create_table(records, mids.plan.terms)
+    levels = [
+        level
+        for (level,) in connection.execute(
+            f"SELECT {mids.to_sql()} FROM records ORDER BY rowid"
+        )
+    ]
+    assert levels == list(map(mids.check, records))
+
+
+def test_sqlite_select_elements(records: list[dict]):
+    mids = init(Discipline.biology)
+    # leave some of the terms out of the table
+    columns = mids.plan.terms[5:]
+    connection = create_table(records, columns)
+    connection.row_factory = sqlite3.Row
+    sql = mids.to_sql(table="records", elements=True, columns=columns)
+    rows = connection.execute(f"{sql} ORDER BY rowid").fetchall()
+    names = [ELEMENT_COLUMN_PREFIX + element.name for element in mids.plan.elements]
+    # the element columns come after the table's columns and the level column
+    assert rows[0].keys()[len(columns) + 1 :] == names
+    for row, record in zip(rows, records, strict=True):
+        record = {term: value for term, value in record.items() if term in columns}
+        assert row["mids_level"] == mids.check(record)
+        for element, name in zip(mids.plan.elements, names):
+            assert row[name] in (0, 1)
+            assert bool(row[name]) == element.match(record)
+
+
+def test_element_columns_in_view(records: list[dict]):
+    mids = init(Discipline.biology)
+    connection = create_table(records, mids.plan.terms)
+    sql = mids.to_sql(table="records", elements=True)
+    connection.execute(f"CREATE VIEW scored AS {sql}")
+    columns = [row[1] for row in connection.execute("PRAGMA table_info(scored)")]
+    # no column had to be renamed to avoid a clash
+    assert not any(":" in column for column in columns)
+    assert "element_License" in columns and "license" in columns
+
+
+def test_partial_table_requires_columns(records: list[dict]):
+    mids = init(Discipline.biology)
+    connection = create_table(records, mids.plan.terms[5:])
+    # the missing terms aren't read as string literals
+    sql = mids.to_sql(table="records")
+    assert '"records"."catalogNumber"' in sql
+    with pytest.raises(sqlite3.OperationalError, match="no such column"):
+        connection.execute(sql)
+
+
+def test_non_text_columns():
+    mids = init(Discipline.biology)
+    connection = create_table(
+        [{"catalogNumber": 0, "institutionCode": 1}],
+        ["catalogNumber", "institutionCode"],
+    )
+    sql = mids.to_sql(columns=["catalogNumber", "institutionCode"])
+    assert connection.execute(f"SELECT {sql} FROM records").fetchone() == (0,)
+
+
+def test_postgresql():
+    mids = init(Discipline.biology)
+    sql = mids.to_sql(SQLDialect.postgresql, columns=["catalogNumber"])
+    assert '"catalogNumber"::text <> \'\'' in sql
+    assert "FALSE" in sql
+    assert sql.startswith("CASE")
+
+
+def test_elements_require_table():
+    with pytest.raises(ValueError):
+        init(Discipline.biology).to_sql(elements=True)
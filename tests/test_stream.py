@@ -0,0 +1,121 @@
+import csv
+import io
+import json
+
+import pytest
+
+from mids.lib import init
+from mids.model import Discipline
+from mids.shard import FileFormat
+from mids.stream import (
+    check_stream,
+    iter_json_array,
+    iter_stream,
+    OutputFormat,
+    ResultWriter,
+)
+from mids.summary import MIDSSummary
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 65536])
+def test_iter_json_array(chunk_size: int):
+    values = [{"a": "[1, 2]", "b": "}"}, {}, {"c": [{"d": None}]}, 1, "x,]"]
+    # scalars which could be cut short at the end of a chunk
+    values += [123456789, -1.25e-7, True, None, "\u00e9\\"]
+    text = " \n" + json.dumps(values, indent=2) + "\n"
+    assert list(iter_json_array(io.StringIO(text), chunk_size)) == values
+    assert list(iter_json_array(io.StringIO(" [ ] "), chunk_size)) == []
+
+
+@pytest.mark.parametrize("text", ["", "{}", "[{}", "[{} {}]", '[{"a": 1]'])
+def test_iter_json_array_invalid(text: str):
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO(text), 2))
+
+
+class CountingReader(io.StringIO):
+    def __init__(self, text: str):
+        super().__init__(text)
+        self.reads = 0
+
+    def read(self, size: int = -1) -> str:
+        self.reads += 1
+        return super().read(size)
+
+
+def test_iter_json_array_invalid_value_fails_early():
+    # the value is invalid well before its end, so the rest of it isn't read
+    f = CountingReader('[{"a": x, "b": "' + "y" * 100_000 + '"}]')
+    with pytest.raises(ValueError):
+        list(iter_json_array(f, 16))
+    assert f.tell() < 1000
+
+
+def test_iter_json_array_large_value():
+    value = {"a": "x" * 100_000, "b": list(range(10_000))}
+    f = CountingReader(json.dumps([value, value]))
+    assert list(iter_json_array(f, 16)) == [value, value]
+    # the reads grow with the value rather than one being made per chunk
+    assert f.reads < 50
+
+    with pytest.raises(ValueError, match="longer than 1000 characters"):
+        list(iter_json_array(io.StringIO(json.dumps([value])), 16, 1000))
+
+
+def test_iter_stream(records: list[dict]):
+    plan = init(Discipline.biology).plan
+    ndjson = "\n".join(map(json.dumps, records)) + "\n\n"
+    assert list(iter_stream(io.StringIO(ndjson), FileFormat.ndjson, plan)) == records
+    array = json.dumps(records)
+    assert list(iter_stream(io.StringIO(array), "json", plan)) == records
+    with pytest.raises(ValueError):
+        list(iter_stream(io.StringIO("[1]"), "json", plan))
+
+    f = io.StringIO()
+    writer = csv.DictWriter(
+        f, ["id", *plan.terms, "extra"], restval="", extrasaction="ignore"
+    )
+    writer.writeheader()
+    writer.writerows({"id": i, **r, "extra": "x"} for i, r in enumerate(records))
+    f.seek(0)
+    rows = list(iter_stream(f, FileFormat.csv, plan, id_field="id"))
+    assert [row["id"] for row in rows] == [str(i) for i in range(len(records))]
+    # only the referenced columns and the ID are read
+    assert all("extra" not in row for row in rows)
+    f.seek(0)
+    assert all("extra" in row for row in iter_stream(f, "csv", plan, aliases=True))
+
+
+def test_check_stream(records: list[dict]):
+    mids = init(Discipline.biology)
+    plan = mids.plan
+    for index, record in enumerate(records):
+        record["id"] = f"r{index}"
+
+    f = io.StringIO()
+    with ResultWriter(f, OutputFormat.ndjson) as writer:
+        assert check_stream(iter(records), plan, writer) == len(records)
+    lines = [json.loads(line) for line in f.getvalue().splitlines()]
+    assert lines == [
+        {"id": index, "level": mids.check(record)}
+        for index, record in enumerate(records)
+    ]
+
+    f = io.StringIO()
+    summary = MIDSSummary.for_plan(plan)
+    # a tiny buffer makes sure the output is the same however it's chunked
+    with ResultWriter(f, OutputFormat.csv, fails=True, buffer_size=10) as writer:
+        check_stream(iter(records), plan, writer, "id", summary=summary)
+    rows = list(csv.reader(io.StringIO(f.getvalue())))
+    assert rows[0] == ["id", "level", "fails"]
+    for row, record in zip(rows[1:], records):
+        report = mids.report(record)
+        fails = [element.name for result in report for element in result.fails]
+        level = report.level
+        assert row[0] == record["id"]
+        assert row[1] == ("" if level is None else str(int(level)))
+        assert sorted(row[2].split("|") if row[2] else []) == sorted(fails)
+    expected = MIDSSummary.for_plan(plan)
+    for record in records:
+        expected.add_record(plan, record)
+    assert summary.final_levels == expected.final_levels
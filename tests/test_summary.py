@@ -0,0 +1,69 @@
+from pathlib import Path
+
+import pytest
+
+from mids.lib import init
+from mids.model import Discipline, MIDSLevel
+from mids.summary import MIDSSummary
+
+
+def summarise(records: list[dict]) -> MIDSSummary:
+    plan = init(Discipline.biology).plan
+    summary = MIDSSummary.for_plan(plan)
+    for record in records:
+        summary.add_record(plan, record)
+    return summary
+
+
+def test_counts(records: list[dict]):
+    mids = init(Discipline.biology)
+    summary = summarise(records)
+    reports = [mids.report(record) for record in records]
+
+    assert summary.total == len(records)
+    for level in [None, *MIDSLevel]:
+        expected = sum(1 for report in reports if report.level == level)
+        assert summary.level_count(level) == expected
+    for level in MIDSLevel:
+        expected = sum(1 for report in reports if report[level].passed)
+        assert summary.level_passes[level] == expected
+    for index, element in enumerate(mids.plan.elements):
+        expected = sum(
+            1 for report in reports if element in report[element.level].fails
+        )
+        assert summary.element_fails[index] == expected
+
+
+def test_add_count():
+    plan = init(Discipline.biology).plan
+    summary = MIDSSummary.for_plan(plan)
+    summary.add(0, count=3)
+    assert summary.total == 3
+    assert summary.level_count(None) == 3
+    assert summary.element_fails == [3] * len(plan.elements)
+
+
+def test_merge_is_associative(records: list[dict]):
+    a, b, c = (summarise(records[i::3]) for i in range(3))
+    full = summarise(records)
+    assert (a + b) + c == a + (b + c) == full
+    assert MIDSSummary.merge_all([c, a, b]) == full
+    # merging doesn't modify the inputs
+    assert a == summarise(records[0::3])
+
+
+def test_merge_different_elements(records: list[dict]):
+    summary = summarise(records)
+    other = MIDSSummary(["beans"], [0])
+    with pytest.raises(ValueError):
+        summary.merge(other)
+
+
+def test_serialisation(records: list[dict], tmp_path: Path):
+    summary = summarise(records)
+    assert MIDSSummary.from_dict(summary.to_dict()) == summary
+    assert MIDSSummary.from_bytes(summary.to_bytes()) == summary
+
+    for name in ("summary.json", "summary.bin"):
+        summary.save(tmp_path / name)
+        assert MIDSSummary.load(tmp_path / name) == summary
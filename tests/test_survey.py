@@ -0,0 +1,68 @@
+import asyncio
+from pathlib import Path
+
+from helpers.gbif_server import StubGBIFServer
+
+from mids.gbif import GBIFClient
+from mids.lib import init
+from mids.model import Discipline, MIDSLevel
+from mids.summary import MIDSSummary
+from mids.survey import GBIFSurvey
+
+
+def occurrences(count: int) -> dict[int, dict]:
+    # every other occurrence meets MIDS level 0
+    return {
+        gbif_id: {"key": gbif_id, "catalogNumber": str(gbif_id)}
+        | ({"institutionCode": "x"} if gbif_id % 2 else {})
+        for gbif_id in range(count)
+    }
+
+
+def new_survey() -> GBIFSurvey:
+    plan = init(Discipline.biology).plan
+    return GBIFSurvey({"datasetKey": "beans"}, MIDSSummary.for_plan(plan))
+
+
+def run(survey: GBIFSurvey, url: str, **kwargs):
+    async def run_survey():
+        async with GBIFClient(url) as client:
+            await survey.run(client, init(Discipline.biology), **kwargs)
+
+    asyncio.run(run_survey())
+
+
+def test_survey():
+    with StubGBIFServer(occurrences(700)) as server:
+        survey = new_survey()
+        run(survey, server.url)
+        assert server.requests[0].endswith("datasetKey=beans&offset=0&limit=300")
+        assert len(server.requests) == 3
+
+    assert survey.offset == 700
+    summary = survey.summary
+    assert summary.total == 700
+    assert summary.level_count(None) == 350
+    assert summary.level_count(MIDSLevel.mids0) == 350
+    fails = dict(zip(summary.elements, summary.element_fails))
+    assert fails["Organization"] == 350
+    assert fails["PhysicalSpecimenID"] == 0
+    assert fails["Name"] == 700
+
+
+def test_survey_resume(tmp_path: Path):
+    state_path = tmp_path / "state.json"
+    with StubGBIFServer(occurrences(700)) as server:
+        survey = new_survey()
+        run(survey, server.url, state_path=state_path, max_records=300)
+        assert survey.summary.total == 300
+
+        resumed = GBIFSurvey.load(state_path)
+        assert resumed == survey
+        run(resumed, server.url, state_path=state_path)
+
+        full = new_survey()
+        run(full, server.url)
+
+    assert resumed == full
+    assert GBIFSurvey.load(state_path) == full
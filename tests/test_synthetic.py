@@ -0,0 +1,70 @@
+import json
+from collections import Counter
+from pathlib import Path
+
+import pytest
+
+from mids.lib import init
+from mids.model import Discipline, MIDSLevel, NO_LEVEL
+from mids.shard import FileFormat, check_file
+from mids.synthetic import RecordGenerator
+
+
+def test_deterministic():
+    plan = init(Discipline.biology).plan
+    first = list(RecordGenerator(plan, seed=1).records(50))
+    assert first == list(RecordGenerator(plan, seed=1).records(50))
+    assert first != list(RecordGenerator(plan, seed=2).records(50))
+
+
+def test_density_and_width():
+    plan = init(Discipline.biology).plan
+    generator = RecordGenerator(plan, density=1.0, empty_rate=0.0, extra_fields=10)
+    for record in generator.records(10):
+        assert set(record) == set(generator.fields)
+        assert all(record[term] for term in plan.terms)
+
+    generator = RecordGenerator(plan, density=0.0)
+    assert all(record == {} for record in generator.records(10))
+
+    generator = RecordGenerator(plan, density=1.0, empty_rate=1.0)
+    for record in generator.records(10):
+        assert all(record[term] in ("", None) for term in plan.terms)
+
+
+def test_level_pass_rates():
+    mids = init(Discipline.biology)
+    rates = {
+        MIDSLevel.mids0: 0.9,
+        MIDSLevel.mids1: 0.5,
+        MIDSLevel.mids2: 0.5,
+        MIDSLevel.mids3: 0.5,
+    }
+    generator = RecordGenerator(mids.plan, level_pass_rates=rates)
+    count = 4000
+    levels = Counter(map(mids.check, generator.records(count)))
+    expected = {
+        None: 0.1,
+        MIDSLevel.mids0: 0.45,
+        MIDSLevel.mids1: 0.225,
+        MIDSLevel.mids2: 0.1125,
+        MIDSLevel.mids3: 0.1125,
+    }
+    for level, proportion in expected.items():
+        assert levels[level] / count == pytest.approx(proportion, abs=0.03)
+
+
+@pytest.mark.parametrize("file_format", list(FileFormat))
+def test_write(tmp_path: Path, file_format: FileFormat):
+    mids = init(Discipline.biology)
+    generator = RecordGenerator(mids.plan, extra_fields=5)
+    path = tmp_path / f"records.{file_format}"
+    generator.write(path, 100, file_format)
+    expected = [
+        NO_LEVEL if level is None else level
+        for level in map(mids.check, generator.records(100))
+    ]
+    assert list(check_file(path, file_format)) == expected
+    if file_format == FileFormat.ndjson:
+        lines = path.read_text().splitlines()
+        assert json.loads(lines[0]) == next(generator.records(1))